@@ -0,0 +1,164 @@
+"""
+ASGI entry point for the control API:
+
+    uvicorn asgi:app --host 127.0.0.1 --port 5001
+
+Bulk start and stop (POST/DELETE /bots) are served natively on the event loop:
+metadata and prices are fetched with concurrent bulk calls, specs are
+validated concurrently, and blocking work runs in worker threads so other
+requests keep being served. Every other route is the Flask app from main.py,
+run in a worker thread.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from core import console, recorder
+from core.bot import build_bot_data, required_symbols, prefetch_exchange_info, prefetch_prices
+from core.logger import CustomJSONEncoder
+import main
+
+
+async def start_bots(specs):
+    """
+    Async bulk start: the same all-or-nothing semantics as POST /bots in main.py.
+    """
+    for spec in specs:
+        recorder.record_event("start", spec)
+    try:
+        # The registry resolves each spec's quote asset, so it is loaded before the prices
+        await asyncio.to_thread(prefetch_exchange_info)
+        await asyncio.to_thread(prefetch_prices, set().union(*(required_symbols(spec) for spec in specs)))
+    except Exception as e:
+        console.warn(None, "Bulk market data prefetch failed, falling back to per-symbol requests: %s", e)
+
+    instances = await asyncio.gather(*(asyncio.to_thread(build_bot_data, spec) for spec in specs), return_exceptions=True)
+    errors = [{"index": index, "message": str(result)} for index, result in enumerate(instances) if isinstance(result, Exception)]
+    if errors:
+        return main.bulk_start_response([], errors)
+    return main.bulk_start_response(*await asyncio.to_thread(main.start_validated_bots, instances))
+
+
+async def stop_bots(data):
+    if not isinstance(data, dict):
+        return {"message": "Request body must be a JSON object"}, 400
+    bot_names = list(main.bot_registry) if data.get("all") else data.get("bot_names") or []
+    if not isinstance(bot_names, list):
+        return {"message": "bot_names must be a list of bot names"}, 400
+    results = await asyncio.to_thread(main.stop_bots_by_name, bot_names)
+    return {"results": {name: {"status": status, "message": message} for name, (status, message) in results.items()}}, 200
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def send_response(send, status, body, headers):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload, cls=CustomJSONEncoder).encode()
+    await send_response(send, status, body, [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())])
+
+
+def wsgi_environ(scope, body):
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(environ):
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+    chunks = main.app(environ, start_response)
+    try:
+        body = b"".join(chunks)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    return response["status"], body, response["headers"]
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if main.WORKERS:
+                await asyncio.to_thread(main.get_runtime)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.to_thread(main.shutdown_bots)
+            if main.runtime:
+                await asyncio.to_thread(main.runtime.shutdown)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    body = await read_body(receive)
+    if scope["path"] == "/bots" and scope["method"] in ("POST", "DELETE"):
+        try:
+            data = json.loads(body or b"{}") or {}
+        except ValueError:
+            return await send_json(send, {"message": "Request body must be JSON"}, 400)
+        if scope["method"] == "DELETE":
+            payload, status = await stop_bots(data)
+        else:
+            specs = data.get("bots") if isinstance(data, dict) else None
+            if not specs or not isinstance(specs, list):
+                return await send_json(send, {"message": "bots must be a non-empty list of bot specs"}, 400)
+            payload, status = await start_bots(specs)
+        return await send_json(send, payload, status)
+
+    status, response_body, headers = await asyncio.to_thread(call_wsgi, wsgi_environ(scope, body))
+    await send_response(send, status, response_body, headers)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    if os.getenv("TRENDR_RECORD"):
+        recorder.start_recording(os.getenv("TRENDR_RECORD"))
+    uvicorn.run(app, host="127.0.0.1", port=5001)
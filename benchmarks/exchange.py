@@ -0,0 +1,413 @@
+"""
+Local stand-in for the exchange and the websockets a trendr process talks to,
+for soak tests and other offline runs.
+
+StandInExchange answers the python-binance client calls trendr makes
+(server time, exchangeInfo, tickers, klines, depth snapshots, fees, market
+orders). Prices follow a deterministic path per symbol on the stand-in's
+clock, so candles close on time under an accelerated clock and every kline
+request for the same bar returns the same bar. Each symbol also has an order
+book whose snapshots and diff events share one update-id sequence.
+
+StandInServer serves, on one local port, the dashboard log socket (frames
+are counted and dropped) and the combined depth stream
+(SUBSCRIBE/UNSUBSCRIBE and `<symbol>@depth@100ms` events from the
+exchange's books). Point trendr at it with TRENDR_DASHBOARD_URL and
+TRENDR_DEPTH_STREAM_URL before importing it.
+
+Faults can be injected per method with StandInExchange.inject (fixed and
+tail latency, HTTP errors, and orders whose response is lost after they
+executed), e.g. to exercise core.rest.
+
+Usage:
+    python -m benchmarks.exchange [--port 8765]   # serve the websockets until interrupted
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import zlib
+
+from core import wire
+from core.scheduler import interval_seconds
+
+SYMBOLS = {
+    "BTCUSDT": ("BTC", "USDT", 60000.0),
+    "ETHUSDT": ("ETH", "USDT", 3000.0),
+    "SOLUSDT": ("SOL", "USDT", 150.0),
+    "BNBUSDT": ("BNB", "USDT", 550.0),
+    "XRPUSDT": ("XRP", "USDT", 0.6),
+    "ETHBTC": ("ETH", "BTC", 0.05),
+}
+TAKER_FEE_PERCENTAGE = "0.1"
+BOOK_LEVELS = 50        # Levels per side kept around the mid
+TICK_FRACTION = 0.0001  # Level spacing as a fraction of the price
+ORDER_HISTORY = 1000    # Latest orders kept for lookups by client order id
+
+
+def noise(symbol, step):
+    """Deterministic value in [-1, 1) for one symbol and time step."""
+    return (zlib.crc32(f"{symbol}:{step}".encode()) / 2**31) - 1
+
+
+class StandInBook:
+    """Order book of one symbol, re-centred on the path price at every step."""
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = {}
+        self.asks = {}
+        self.update_id = 1
+        self.rng = random.Random(symbol)
+
+    def step(self, mid):
+        """
+        Moves the book to `mid`: levels that crossed it or fell out of range are
+        removed and the levels near the touch get new quantities.
+
+        Returns:
+            dict: The depthUpdate event for the change (U/u continue the update ids).
+        """
+        tick = mid * TICK_FRACTION
+        changes = {"b": [], "a": []}
+        for side, book, sign in (("b", self.bids, -1), ("a", self.asks, 1)):
+            wanted = {round(mid + sign * tick * (index + 1), 10) for index in range(BOOK_LEVELS)}
+            for price in [price for price in book if price not in wanted]:
+                del book[price]
+                changes[side].append([f"{price:.10f}", "0.00000000"])
+            for price in sorted(wanted, key=lambda price: abs(price - mid)):
+                if price not in book or self.rng.random() < 0.2:
+                    book[price] = round(self.rng.uniform(0.1, 5.0), 8)
+                    changes[side].append([f"{price:.10f}", f"{book[price]:.8f}"])
+        first = self.update_id + 1
+        self.update_id += len(changes["b"]) + len(changes["a"]) or 1
+        return {"e": "depthUpdate", "E": int(time.time() * 1000), "s": self.symbol, "U": first, "u": self.update_id, "b": changes["b"], "a": changes["a"]}
+
+    def snapshot(self, limit):
+        bids = sorted(self.bids.items(), reverse=True)[:limit]
+        asks = sorted(self.asks.items())[:limit]
+        return {
+            "lastUpdateId": self.update_id,
+            "bids": [[f"{price:.10f}", f"{quantity:.8f}"] for price, quantity in bids],
+            "asks": [[f"{price:.10f}", f"{quantity:.8f}"] for price, quantity in asks],
+        }
+
+
+class StandInAPIError(Exception):
+    """An error answer, shaped like python-binance's BinanceAPIException."""
+    def __init__(self, status_code, code, message):
+        super().__init__(f"APIError(code={code}): {message}")
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
+class Fault:
+    """Latency and errors injected into the calls of one method."""
+    def __init__(self, delay=0.0, slow_rate=0.0, slow_delay=0.0, error_rate=0.0, lost_rate=0.0):
+        self.delay = delay
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.error_rate = error_rate
+        self.lost_rate = lost_rate
+
+
+class StandInExchange:
+    """
+    Drop-in for the python-binance Client methods trendr uses.
+
+    Args:
+        clock (callable): Epoch seconds, e.g. the accelerated clock the scheduler runs on.
+        symbols (dict): symbol -> (base asset, quote asset, starting price).
+    """
+    def __init__(self, clock=time.time, symbols=SYMBOLS):
+        self.clock = clock
+        self.symbols = symbols
+        self.books = {symbol: StandInBook(symbol) for symbol in symbols}
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.order_ids = itertools.count(1)
+        self.orders = collections.OrderedDict()  # clientOrderId -> order, the latest ORDER_HISTORY
+        self.faults = {}
+        self.rng = random.Random(7)
+
+    def inject(self, method="*", **fault):
+        """
+        Injects faults into the calls to `method` ("*" for every method without its
+        own): a fixed `delay`, `slow_delay` more on a `slow_rate` share of calls,
+        an HTTP 503 on an `error_rate` share and, for orders, a lost response
+        (TimeoutError after the order executed) on a `lost_rate` share. Delays are
+        in real seconds. With no fault arguments, clears the method's faults.
+        """
+        if fault:
+            self.faults[method] = Fault(**fault)
+        else:
+            self.faults.pop(method, None)
+
+    def _count(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        fault = self.faults.get(method) or self.faults.get("*")
+        if fault is None:
+            return None
+        with self.lock:
+            slow, failed = self.rng.random() < fault.slow_rate, self.rng.random() < fault.error_rate
+        delay = fault.delay + (fault.slow_delay if slow else 0.0)
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise StandInAPIError(503, -1001, "Internal error; unable to process your request. Please try again.")
+        return fault
+
+    def price(self, symbol, timestamp=None):
+        """Path price of `symbol` at epoch second `timestamp` (now by default)."""
+        timestamp = self.clock() if timestamp is None else timestamp
+        start = self.symbols[symbol][2]
+        second = int(timestamp)
+        drift = 0.04 * math.sin(second / 5400) + 0.015 * math.sin(second / 610)
+        return start * (1 + drift + 0.002 * noise(symbol, second))
+
+    def _symbol_info(self, symbol):
+        base, quote, _ = self.symbols[symbol]
+        return {
+            "symbol": symbol,
+            "status": "TRADING",
+            "baseAsset": base,
+            "quoteAsset": quote,
+            "filters": [
+                {"filterType": "LOT_SIZE", "minQty": "0.00001000", "maxQty": "9000.00000000", "stepSize": "0.00001000"},
+                {"filterType": "NOTIONAL", "minNotional": "0.00001000" if quote == "BTC" else "1.00000000"},
+            ],
+        }
+
+    # ---- Client API ----
+
+    def get_server_time(self):
+        self._count("get_server_time")
+        return {"serverTime": int(self.clock() * 1000)}
+
+    def get_exchange_info(self):
+        self._count("get_exchange_info")
+        return {"symbols": [self._symbol_info(symbol) for symbol in self.symbols]}
+
+    def get_symbol_info(self, symbol):
+        self._count("get_symbol_info")
+        return self._symbol_info(symbol) if symbol in self.symbols else None
+
+    def get_symbol_ticker(self, symbol):
+        self._count("get_symbol_ticker")
+        return {"symbol": symbol, "price": f"{self.price(symbol):.8f}"}
+
+    def get_all_tickers(self):
+        self._count("get_all_tickers")
+        return [{"symbol": symbol, "price": f"{self.price(symbol):.8f}"} for symbol in self.symbols]
+
+    def get_trade_fee(self, symbol):
+        self._count("get_trade_fee")
+        return [{"symbol": symbol, "makerCommission": TAKER_FEE_PERCENTAGE, "takerCommission": TAKER_FEE_PERCENTAGE}]
+
+    def get_klines(self, symbol, interval, limit=500, startTime=None, endTime=None):
+        """Bars up to and including the one still forming, like the REST endpoint."""
+        self._count("get_klines")
+        step = interval_seconds(interval)
+        now = self.clock()
+        last = int(now // step) * step
+        if endTime is not None:
+            last = min(last, int(endTime / 1000 // step) * step)
+        if startTime is not None:
+            first = -(-startTime // 1000 // step) * step
+            opens = range(int(first), int(min(last, first + (limit - 1) * step)) + 1, step)
+        else:
+            opens = range(int(last - (limit - 1) * step), int(last) + 1, step)
+        klines = []
+        for open_time in opens:
+            close = self.price(symbol, min(open_time + step, now))
+            open_price = self.price(symbol, open_time)
+            high = max(open_price, close) * (1 + 0.0005 * (1 + noise(symbol, -open_time)))
+            low = min(open_price, close) * (1 - 0.0005 * (1 + noise(symbol, -open_time - 1)))
+            klines.append([
+                open_time * 1000, f"{open_price:.8f}", f"{high:.8f}", f"{low:.8f}", f"{close:.8f}", "10.00000000",
+                (open_time + step) * 1000 - 1, f"{10 * close:.8f}", 100, "5.00000000", f"{5 * close:.8f}", "0",
+            ])
+        return klines
+
+    def get_order_book(self, symbol, limit=100):
+        self._count("get_order_book")
+        with self.lock:
+            return self.books[symbol].snapshot(limit)
+
+    def step_book(self, symbol):
+        """Advances the book of `symbol` to the current price; returns the depthUpdate event."""
+        with self.lock:
+            return self.books[symbol].step(self.price(symbol))
+
+    def _order(self, symbol, side, quantity, client_order_id=None):
+        fault = self._count("order_market_" + side.lower())
+        client_order_id = client_order_id or f"standin-{next(self.order_ids)}"
+        with self.lock:
+            if client_order_id in self.orders:
+                raise StandInAPIError(400, -2010, "Duplicate order sent.")
+        quantity = float(quantity)
+        price = self.price(symbol)
+        order = {
+            "symbol": symbol,
+            "orderId": next(self.order_ids),
+            "clientOrderId": client_order_id,
+            "side": side,
+            "type": "MARKET",
+            "status": "FILLED",
+            "transactTime": int(self.clock() * 1000),
+            "executedQty": f"{quantity:.8f}",
+            "cummulativeQuoteQty": f"{quantity * price:.8f}",
+        }
+        with self.lock:
+            self.orders[client_order_id] = order
+            if len(self.orders) > ORDER_HISTORY:
+                self.orders.popitem(last=False)
+            lost = fault is not None and self.rng.random() < fault.lost_rate
+        if lost:
+            raise TimeoutError("Read timed out (stand-in lost the order response)")
+        return order
+
+    def order_market_buy(self, symbol, quantity, newClientOrderId=None, **params):
+        return self._order(symbol, "BUY", quantity, newClientOrderId)
+
+    def order_market_sell(self, symbol, quantity, newClientOrderId=None, **params):
+        return self._order(symbol, "SELL", quantity, newClientOrderId)
+
+    def get_order(self, symbol, origClientOrderId=None, orderId=None, **params):
+        self._count("get_order")
+        with self.lock:
+            order = self.orders.get(origClientOrderId)
+        if order is None or order["symbol"] != symbol:
+            raise StandInAPIError(400, -2013, "Order does not exist.")
+        return order
+
+
+def select_subprotocol(connection, subprotocols):
+    """Dashboard clients get the first framing they offer that trendr speaks; the depth stream offers none."""
+    for subprotocol in subprotocols:
+        if subprotocol in wire.SUBPROTOCOLS:
+            return subprotocol
+    return None
+
+
+class StandInServer:
+    """
+    Dashboard and depth-stream websockets on one local port, served from a
+    background thread.
+
+    Args:
+        exchange (StandInExchange): Source of the depth events.
+        port (int): Port to listen on (0 picks a free one).
+        depth_interval (float): Seconds between depth events per subscribed symbol.
+    """
+    def __init__(self, exchange, host="127.0.0.1", port=0, depth_interval=0.1):
+        self.exchange = exchange
+        self.host = host
+        self.port = port
+        self.depth_interval = depth_interval
+        self.log_frames = 0
+        self.connections = 0
+        self.subscribers = {}  # stream -> set of websockets
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    @property
+    def dashboard_url(self):
+        return f"ws://{self.host}:{self.port}/dashboard"
+
+    @property
+    def depth_stream_url(self):
+        return f"ws://{self.host}:{self.port}/stream"
+
+    def start(self):
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), name="stand-in-server", daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.thread.join(5)
+
+    def _run(self, ready):
+        from websockets.asyncio.server import serve
+
+        async def main():
+            async with serve(self._handle, self.host, self.port, select_subprotocol=select_subprotocol, max_size=None) as server:
+                self.server = server
+                self.port = server.sockets[0].getsockname()[1]
+                pusher = asyncio.create_task(self._push_depth())
+                ready.set()
+                await server.wait_closed()
+                pusher.cancel()
+
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(main())
+        self.loop.close()
+
+    async def _handle(self, websocket):
+        self.connections += 1
+        try:
+            if websocket.request.path.startswith("/stream"):
+                await self._depth_stream(websocket)
+            else:
+                async for _ in websocket:
+                    self.log_frames += 1
+        except Exception:
+            pass  # Clients drop their connections whenever they stop
+        finally:
+            self.connections -= 1
+
+    async def _depth_stream(self, websocket):
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+                for stream in request.get("params", []):
+                    if request.get("method") == "SUBSCRIBE":
+                        self.subscribers.setdefault(stream, set()).add(websocket)
+                    elif request.get("method") == "UNSUBSCRIBE":
+                        self.subscribers.get(stream, set()).discard(websocket)
+                await websocket.send(json.dumps({"result": None, "id": request.get("id")}))
+        finally:
+            for websockets in self.subscribers.values():
+                websockets.discard(websocket)
+
+    async def _push_depth(self):
+        # One book step per symbol and tick, sent to every subscriber, so all connections see the same sequence
+        while True:
+            await asyncio.sleep(self.depth_interval)
+            for stream, websockets in list(self.subscribers.items()):
+                symbol = stream.split("@")[0].upper()
+                if not websockets or symbol not in self.exchange.books:
+                    continue
+                frame = json.dumps({"stream": stream, "data": self.exchange.step_book(symbol)})
+                for websocket in list(websockets):
+                    try:
+                        await websocket.send(frame)
+                    except Exception:
+                        websockets.discard(websocket)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = StandInServer(StandInExchange(), port=args.port).start()
+    print(f"dashboard:    {server.dashboard_url}")
+    print(f"depth stream: {server.depth_stream_url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
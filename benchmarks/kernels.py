@@ -0,0 +1,122 @@
+"""
+Kernel benchmark: checks the loop kernels in core.kernels against the reference
+indicators in strategies/ema_strategy.py (and the compiled kernels against
+their Python versions), then reports candles per second for each.
+
+Usage:
+    python -m benchmarks.kernels [--candles 200000] [--repeat 3]
+"""
+import argparse
+import sys
+import time
+
+# core.kernels is imported before numpy, as in production, so it binds numpy lazily
+from core import kernels
+import numpy as np
+
+from strategies import ema_strategy
+
+RTOL = 1e-9
+
+
+def random_candles(count, seed=7):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    spread = np.abs(rng.normal(0, 0.005, count)) * closes
+    highs = closes + spread
+    lows = closes - spread
+    return highs, lows, closes
+
+
+def check(name, ok, failures):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    if not ok:
+        failures.append(name)
+
+
+def check_references(failures):
+    """Kernels against the strategy reference implementations."""
+    highs, lows, closes = random_candles(500)
+    for window in (5, 20):
+        check(f"weighted_ma[{window}] == calculate_ema",
+              np.isclose(kernels.weighted_ma(closes, window)[-1], ema_strategy.calculate_ema(closes, window), rtol=RTOL),
+              failures)
+    # Wilder RSI/ATR are seeded with the simple averages the references compute
+    window = 14
+    check("wilder_rsi seed == calculate_rsi",
+          np.isclose(kernels.wilder_rsi(closes[:window + 1], window)[-1], ema_strategy.calculate_rsi(closes, window), rtol=RTOL),
+          failures)
+    tail = slice(-(window + 1), None)
+    check("wilder_atr seed == calculate_atr",
+          np.isclose(kernels.wilder_atr(highs[tail], lows[tail], closes[tail], window)[-1],
+                     ema_strategy.calculate_atr(highs[tail], lows[tail], closes[tail], window), rtol=RTOL),
+          failures)
+    # The recursive EMA against a direct evaluation of its definition
+    expected = [closes[:window].mean()]
+    for price in closes[window:]:
+        expected.append(expected[-1] + 2 / (window + 1) * (price - expected[-1]))
+    check("ema == recursive definition", np.allclose(kernels.ema(closes, window)[window - 1:], expected, rtol=RTOL), failures)
+
+
+def kernel_calls(highs, lows, closes):
+    short = kernels.ema(closes, 5)
+    long = kernels.ema(closes, 20)
+    return {
+        kernels.weighted_ma: (closes, 20),
+        kernels.ema: (closes, 20),
+        kernels.wilder_rsi: (closes, 14),
+        kernels.wilder_atr: (highs, lows, closes, 14),
+        kernels.parabolic_sar: (highs, lows, 0.02, 0.2),
+        kernels.ema_crossover_backtest: (closes, short, long, 1.0, 100.0, 10.0, 0.001, 0.0),
+    }
+
+
+def check_jit(failures):
+    """Compiled kernels against the same kernels run as Python."""
+    highs, lows, closes = random_candles(2000)
+    for kernel, args in kernel_calls(highs, lows, closes).items():
+        compiled = kernel(*args)
+        reference = kernel.py_func(*args)
+        if isinstance(compiled, tuple):
+            ok = all(np.allclose(a, b, rtol=RTOL, equal_nan=True) for a, b in zip(compiled, reference))
+        else:
+            ok = np.allclose(compiled, reference, rtol=RTOL, equal_nan=True)
+        check(f"{kernel.__name__}: jit == python", ok, failures)
+
+
+def throughput(candles, repeat):
+    highs, lows, closes = random_candles(candles)
+    for kernel, args in kernel_calls(highs, lows, closes).items():
+        rates = {}
+        for label, function in (("jit" if kernel.jitted else "fallback", kernel), ("python", kernel.py_func)):
+            best = min(timed(function, args) for _ in range(repeat))
+            rates[label] = candles / best
+        print(f"{kernel.__name__:24s} " + " | ".join(f"{label} {rate:,.0f} candles/s" for label, rate in rates.items()))
+
+
+def timed(function, args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--candles", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    kernels.warm_up()
+    print(f"Numba {'enabled' if kernels.jit_available() else 'not available, using fallbacks'} | warm-up {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    failures = []
+    check_references(failures)
+    if kernels.jit_available():
+        check_jit(failures)
+    throughput(args.candles, args.repeat)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Order book benchmark: diff-stream throughput of core.orderbook for many
+symbols in one process, and the cost of an estimate_fill call.
+
+Each symbol starts from a full 1000-level snapshot per side and receives
+depth events shaped like Binance's @depth@100ms stream (tens of level
+changes, mostly near the touch, some removals). Events are applied through
+the same path as the stream thread (JSON decode included), and the books are
+checked against a dict-based reference at the end.
+
+Usage:
+    python -m benchmarks.orderbook [--symbols 50] [--events 400] [--levels 30]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from core.orderbook import OrderBook, OrderBookManager
+
+TICK = 0.01
+# Binance pushes @depth@100ms events at most 10 times per second per symbol
+EVENTS_PER_SECOND = 10
+
+
+def snapshot(mid, depth):
+    bids = {round(mid - TICK * (index + 1), 2): 1.0 for index in range(depth)}
+    asks = {round(mid + TICK * (index + 1), 2): 1.0 for index in range(depth)}
+    return bids, asks
+
+
+def diff_events(symbol, bids, asks, count, levels, rng, first_id):
+    """Depth events (as stream frames) for `symbol`, applied to the reference dicts as they are generated."""
+    mid = (max(bids) + min(asks)) / 2
+    frames = []
+    update_id = first_id
+    for _ in range(count):
+        changes = {"b": [], "a": []}
+        for _ in range(levels):
+            side = rng.choice("ba")
+            distance = int(rng.expovariate(1 / 40)) + 1  # Most changes land near the touch
+            price = round(mid - TICK * distance if side == "b" else mid + TICK * distance, 2)
+            quantity = 0.0 if rng.random() < 0.3 else round(rng.uniform(0.01, 5), 3)
+            book = bids if side == "b" else asks
+            if quantity:
+                book[price] = quantity
+            else:
+                book.pop(price, None)
+            changes[side].append([f"{price:.2f}", f"{quantity:.8f}"])
+        event = {"e": "depthUpdate", "E": 0, "s": symbol, "U": update_id + 1, "u": update_id + levels, "b": changes["b"], "a": changes["a"]}
+        update_id += levels
+        frames.append(json.dumps({"stream": f"{symbol.lower()}@depth@100ms", "data": event}))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--events", type=int, default=400, help="events per symbol")
+    parser.add_argument("--levels", type=int, default=30, help="level changes per event")
+    parser.add_argument("--depth", type=int, default=1000, help="snapshot levels per side")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    manager = OrderBookManager(enabled=False)
+    references = {}
+    streams = []
+    for index in range(args.symbols):
+        symbol = f"SYM{index:03d}USDT"
+        bids, asks = snapshot(100.0 + index, args.depth)
+        book = manager.books[symbol] = OrderBook(symbol)
+        book.load_snapshot({
+            "lastUpdateId": 1000,
+            "bids": [[f"{price:.2f}", "1.0"] for price in bids],
+            "asks": [[f"{price:.2f}", "1.0"] for price in asks],
+        })
+        book.live = True
+        streams.append(diff_events(symbol, bids, asks, args.events, args.levels, rng, 1000))
+        references[symbol] = (bids, asks)
+
+    # Interleave the symbols the way a combined stream delivers them
+    frames = [frame for batch in zip(*streams) for frame in batch]
+    start = time.perf_counter()
+    for frame in frames:
+        manager._on_message(frame)
+    elapsed = time.perf_counter() - start
+
+    events = len(frames)
+    capacity = events / elapsed
+    print(f"{events} events ({events * args.levels} level changes) for {args.symbols} symbols in {elapsed:.2f}s")
+    print(f"{capacity:,.0f} events/s, {capacity * args.levels:,.0f} level changes/s, {elapsed / events * 1e6:.1f} µs/event")
+    print(f"full @depth@100ms rate for {args.symbols} symbols uses {EVENTS_PER_SECOND * args.symbols / capacity:.1%} of one core")
+
+    book = manager.books["SYM000USDT"]
+    calls = 20000
+    start = time.perf_counter()
+    for index in range(calls):
+        book.estimate_fill("BUY" if index % 2 else "SELL", 25.0)
+    print(f"estimate_fill (25 units, ~10 levels): {(time.perf_counter() - start) / calls * 1e6:.2f} µs")
+
+    failures = 0
+    for symbol, (bids, asks) in references.items():
+        book = manager.books[symbol]
+        if not book.live or book.resyncs:
+            failures += 1
+        elif dict(zip(book.ask_keys, book.ask_quantities)) != asks or {-key: quantity for key, quantity in zip(book.bid_keys, book.bid_quantities)} != bids:
+            failures += 1
+    if failures:
+        print(f"FAIL: {failures} books differ from the reference")
+        return 1
+    print("ok   all books match the reference")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
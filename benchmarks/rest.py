@@ -0,0 +1,151 @@
+"""
+REST resilience benchmark: drives core.rest's ResilientClient against the local
+exchange stand-in (benchmarks.exchange) with injected faults and compares it
+with calling the stand-in directly.
+
+    tail latency   get_klines with a slow tail: p50/p95/p99 with and without hedging
+    retries        get_symbol_ticker failing transiently: success rate
+    orders         market orders whose response is lost: every order placed exactly once
+    breaker        get_server_time failing hard: fast failure, then recovery
+    hosts          each python-binance client sends to its own TRENDR_API_HOSTS entry
+
+Usage:
+    python -m benchmarks.rest [--calls 2000] [--threads 8] [--slow-rate 0.03] [--slow-delay 0.25]
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.exchange import StandInExchange
+from config.bot_config import create_binance_clients
+from core import console
+from core.rest import ResilientClient, CircuitOpenError
+
+
+def check(name, ok, failures):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    if not ok:
+        failures.append(name)
+
+
+def run_calls(call, count, threads):
+    """Runs `call()` `count` times on `threads` threads; returns (sorted latencies, errors)."""
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            call()
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, e
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(timed, range(count)))
+    return sorted(latency for latency, _ in results), [error for _, error in results if error is not None]
+
+
+def percentiles(latencies):
+    return {share: latencies[min(len(latencies) - 1, int(share * len(latencies)))] * 1000 for share in (0.5, 0.95, 0.99)}
+
+
+def tail_latency(args, failures):
+    exchange = StandInExchange()
+    exchange.inject("get_klines", delay=0.002, slow_rate=args.slow_rate, slow_delay=args.slow_delay)
+    client = ResilientClient([exchange, exchange])
+    call = lambda: (exchange if direct else client).get_klines(symbol="BTCUSDT", interval="1m", limit=50)
+    rows = {}
+    for direct, label in ((True, "direct"), (False, "hedged")):
+        latencies, errors = run_calls(call, args.calls, args.threads)
+        rows[label] = percentiles(latencies)
+        print(f"get_klines {label:>6}: p50 {rows[label][0.5]:7.1f} ms  p95 {rows[label][0.95]:7.1f} ms  p99 {rows[label][0.99]:7.1f} ms  ({len(errors)} errors)")
+    stats = client.report()["get_klines"]
+    extra = stats["hedges"] / stats["calls"]
+    print(f"           hedge delay {stats['hedge_delay_ms']:.1f} ms, {stats['hedges']} hedges ({extra:.1%} extra requests), {stats['hedge_wins']} won")
+    check("hedging cuts get_klines p99 by half", rows["hedged"][0.99] < rows["direct"][0.99] / 2, failures)
+    check("hedges stay under 10% extra requests", extra < 0.10, failures)
+
+
+def retries(args, failures):
+    exchange = StandInExchange()
+    exchange.inject("get_symbol_ticker", error_rate=0.2)
+    client = ResilientClient([exchange, exchange], breaker_failures=50)
+    count = args.calls // 4
+    rates = {}
+    for label, target in (("direct", exchange), ("retried", client)):
+        _, errors = run_calls(lambda: target.get_symbol_ticker(symbol="ETHUSDT"), count, args.threads)
+        rates[label] = 1 - len(errors) / count
+        print(f"get_symbol_ticker {label:>7} at 20% errors: {rates[label]:.1%} success")
+    check("retries lift the success rate above 98%", rates["retried"] > 0.98, failures)
+
+
+def orders(args, failures):
+    exchange = StandInExchange()
+    exchange.inject("order_market_buy", lost_rate=0.2)
+    client = ResilientClient([exchange, exchange])
+    count = args.calls // 8
+    _, errors = run_calls(lambda: client.order_market_buy(symbol="BTCUSDT", quantity="0.001"), count, args.threads)
+    stats = client.report()["order_market_buy"]
+    placed = len(exchange.orders)
+    print(f"order_market_buy with 20% lost responses: {count} orders, {placed} placed, {stats['recovered_orders']} recovered by client id, {len(errors)} errors")
+    check("every order placed exactly once", placed == count and not errors, failures)
+
+
+def breaker(failures):
+    exchange = StandInExchange()
+    exchange.inject("get_server_time", error_rate=1.0)
+    client = ResilientClient([exchange], retries=0, breaker_failures=5, breaker_seconds=0.5)
+    rejected = 0
+    started = time.perf_counter()
+    for _ in range(50):
+        try:
+            client.get_server_time()
+        except CircuitOpenError:
+            rejected += 1
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - started
+    sent = exchange.calls["get_server_time"]
+    print(f"get_server_time failing: {sent} requests sent, {rejected} failed fast ({elapsed * 1000:.1f} ms for 50 calls)")
+    check("open breaker stops requests after 5 failures", sent == 5 and rejected == 45, failures)
+    exchange.inject("get_server_time")
+    time.sleep(0.5)
+    client.get_server_time()
+    check("breaker closes after a successful trial call", client.report()["get_server_time"]["breaker"] == "closed", failures)
+
+
+def api_hosts(failures):
+    try:
+        import binance  # noqa: F401
+    except ImportError:
+        print("skip python-binance is not installed: API host check")
+        return
+    hosts = ["https://primary.example/api", "https://secondary.example/api"]
+    clients = create_binance_clients(hosts, ping=False)
+    urls = [client._create_api_uri("ping", signed=False) for client in clients]
+    print(f"API hosts: {', '.join(urls)}")
+    check("each client targets its own API host", [url.rsplit("/", 2)[0] for url in urls] == hosts, failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent callers (bots)")
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="share of get_klines calls in the slow tail")
+    parser.add_argument("--slow-delay", type=float, default=0.25, help="seconds the slow tail adds")
+    args = parser.parse_args()
+
+    console.set_level("error")
+    failures = []
+    tail_latency(args, failures)
+    retries(args, failures)
+    orders(args, failures)
+    breaker(failures)
+    api_hosts(failures)
+    if failures:
+        print(f"{len(failures)} checks failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
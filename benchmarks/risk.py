@@ -0,0 +1,168 @@
+"""
+Risk benchmark: checks the vectorized pass of core.risk against a per-bot
+scalar reference on random portfolios, then times one evaluation for
+increasing numbers of bots.
+
+Usage:
+    python -m benchmarks.risk [--bots 2000] [--repeat 50]
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+from core import risk
+from core.risk import PortfolioRisk
+from core.symbols import symbol_registry
+
+ASSETS = ["BTC", "ETH", "SOL", "XRP", "ADA", "DOGE", "BNB", "LTC"]
+
+
+def load_symbols():
+    """Lists every benchmark pair in the symbol registry without calling the exchange."""
+    symbol_registry.load([
+        {"symbol": f"{base}{quote}", "status": "TRADING", "baseAsset": base, "quoteAsset": quote, "filters": []}
+        for base in ASSETS for quote in ("USDT", "BTC") if base != quote
+    ])
+
+
+def random_portfolio(count, rng):
+    engine = PortfolioRisk()
+    engine._start = lambda: None  # No periodic checks: evaluate() is called directly
+    bots = {}
+    for index in range(count):
+        base = rng.choice(ASSETS)
+        quote = "USDT" if rng.random() < 0.8 or base == "BTC" else "BTC"
+        bot_data = {
+            "symbol": f"{base}{quote}",
+            "base_currency": base,
+            "quote_currency": quote,
+            "starting_trade_amount": 100.0,
+            "base_current_currency_quantity": rng.uniform(0, 2) if rng.random() < 0.8 else 0.0,
+            "quote_current_currency_quantity": rng.uniform(0, 50) if quote == "USDT" else rng.uniform(0, 0.001),
+            "highest_market_price": rng.uniform(40, 60),
+            "trailing_stop_loss_percentage": rng.choice([1.5, 2, 3]),
+        }
+        name = f"bot-{index:05d}"
+        engine.register(name, bot_data)
+        bots[name] = bot_data
+    return engine, bots
+
+
+def random_prices(rng):
+    prices = {f"{asset}USDT": rng.uniform(40, 60) for asset in ASSETS}
+    prices.update({f"{asset}BTC": prices[f"{asset}USDT"] / prices["BTCUSDT"] for asset in ASSETS})
+    return prices
+
+
+def reference_exits(bots, prices, caps, max_asset_share, max_drawdown, peak):
+    """Scalar per-bot version of PortfolioRisk.evaluate."""
+    marks = {}
+    for name, bot in bots.items():
+        price = prices[bot["symbol"]]
+        quote_usdt = 1.0 if bot["quote_currency"] == "USDT" else prices[f"{bot['quote_currency']}USDT"]
+        exposure = bot["base_current_currency_quantity"] * price * quote_usdt
+        equity = exposure + bot["quote_current_currency_quantity"] * quote_usdt
+        marks[name] = (price, exposure, equity)
+    total = sum(equity for _, _, equity in marks.values())
+
+    exits = {}
+    peak = max(peak, total)
+    if max_drawdown and (peak - total) / peak * 100 >= max_drawdown:
+        for name, bot in bots.items():
+            if bot["base_current_currency_quantity"] > 0:
+                exits[name] = risk.DRAWDOWN
+    for asset in ASSETS:
+        holders = sorted((name for name, bot in bots.items() if bot["base_currency"] == asset), key=lambda name: -marks[name][1])
+        limit = caps.get(asset, float("inf"))
+        if max_asset_share < 1:
+            limit = min(limit, max_asset_share * total)
+        excess = sum(marks[name][1] for name in holders) - limit
+        removed = 0.0
+        for name in holders:
+            if excess <= 0 or removed >= excess or marks[name][1] <= 0:
+                break
+            exits[name] = risk.EXPOSURE_CAP
+            removed += marks[name][1]
+    for name, bot in bots.items():
+        price, exposure, equity = marks[name]
+        highest = max(bot["highest_market_price"], price)
+        change = (equity - bot["starting_trade_amount"]) / bot["starting_trade_amount"] * 100
+        if bot["base_current_currency_quantity"] > 0 and price < highest * (1 - bot["trailing_stop_loss_percentage"] / 100):
+            exits[name] = risk.TRAILING_STOP
+        if change >= risk.TAKE_PROFIT_PERCENTAGE:
+            exits[name] = risk.TAKE_PROFIT
+        if change <= -risk.STOP_LOSS_PERCENTAGE:
+            exits[name] = risk.STOP_LOSS
+    return exits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bots", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(5)
+    load_symbols()
+
+    failures = 0
+    mismatched_allowances = 0
+    for trial in range(20):
+        engine, bots = random_portfolio(rng.randint(1, 300), rng)
+        prices = random_prices(rng)
+        caps = {asset: rng.uniform(100, 3000) for asset in rng.sample(ASSETS, 3)}
+        for asset, cap in caps.items():
+            engine.set_asset_cap(asset, cap)
+        share = rng.choice([1, 0.4, 0.25])
+        drawdown = rng.choice([0, 1, 20])
+        peak = rng.choice([0, 1e9])
+        engine.peak_equity = peak
+        expected = reference_exits(bots, prices, caps, share, drawdown, peak)
+        actual = engine.evaluate(prices, share, drawdown)
+        if actual != expected:
+            failures += 1
+            print(f"FAIL trial {trial}: {len(set(actual.items()) ^ set(expected.items()))} differing exits")
+        # What the coordinator sends to the shards must match what a local buy check sees
+        allowances, default = engine.allowances(prices, share)
+        for asset in ASSETS:
+            expected_allowance = engine.buy_allowance(asset, prices, share)
+            if not math.isclose(allowances.get(asset, default), expected_allowance, rel_tol=1e-9, abs_tol=1e-6):
+                mismatched_allowances += 1
+    print(f"{'ok  ' if not failures else 'FAIL'} evaluate matches the scalar reference on 20 random portfolios")
+    failures += mismatched_allowances
+    print(f"{'ok  ' if not mismatched_allowances else 'FAIL'} allowances match buy_allowance for every asset")
+
+    # Neither a stopped bot nor a missing price is a portfolio drawdown
+    engine, bots = random_portfolio(4, rng)
+    for (name, bot_data), base in zip(bots.items(), ASSETS[1:]):
+        bot_data.update(symbol=f"{base}USDT", base_currency=base, quote_currency="USDT", base_current_currency_quantity=1.0,
+                        stop_loss_percentage=100, take_profit_percentage=1e9, trailing_stop_loss_percentage=100)
+        engine.unregister(name)
+        engine.register(name, bot_data)
+    prices = random_prices(rng)
+    engine.evaluate(prices, 1, 10)
+    engine.unregister(next(iter(bots)))
+    unpriced = {symbol: price for symbol, price in prices.items() if symbol != f"{ASSETS[2]}USDT"}
+    spurious = [exits for exits in (engine.evaluate(prices, 1, 10), engine.evaluate(unpriced, 1, 10)) if risk.DRAWDOWN in exits.values()]
+    if spurious:
+        failures += 1
+    print(f"{'ok  ' if not spurious else 'FAIL'} no drawdown exit after a bot stops or a price is missing")
+
+    counts = sorted({100, 1000, args.bots})
+    for count in counts:
+        engine, bots = random_portfolio(count, rng)
+        prices = random_prices(rng)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            engine.evaluate(prices, 0.3, 20)
+        vectorized = (time.perf_counter() - start) / args.repeat
+        start = time.perf_counter()
+        reference_exits(bots, prices, {}, 0.3, 20, 0)
+        scalar = time.perf_counter() - start
+        print(f"{count:6d} bots: {vectorized * 1e3:7.3f} ms per evaluation (scalar reference {scalar * 1e3:8.3f} ms)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Screener benchmark: checks the matrix indicators of core.screener against the
+strategy's per-symbol ones, times ranking the whole market, then times a cold
+and an incremental bar refresh against the local exchange stand-in
+(benchmarks.exchange), counts the kline requests each makes and checks that a
+screen never waits for one.
+
+Usage:
+    python -m benchmarks.screener [--pairs 500] [--repeat 20]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.exchange import StandInExchange
+from core import screener as screener_module
+from core.indicators import atr_from_klines
+from core.screener import Screener, weighted_ma_matrix, atr_matrix, rank, SCREENER_BARS
+from strategies.ema_strategy import calculate_ema
+
+RTOL = 1e-9
+
+
+def random_market(pairs, bars, seed=11):
+    """(symbols, highs, lows, closes) random walks with a per-pair drift and volatility."""
+    rng = np.random.default_rng(seed)
+    drift = rng.normal(0, 0.002, (pairs, 1))
+    volatility = rng.uniform(0.002, 0.03, (pairs, 1))
+    closes = rng.uniform(0.01, 1000, (pairs, 1)) * np.exp(np.cumsum(drift + volatility * rng.normal(0, 1, (pairs, bars)), axis=1))
+    spread = np.abs(rng.normal(0, 0.5, (pairs, bars))) * volatility * closes
+    return [f"P{index:04d}USDT" for index in range(pairs)], closes + spread, closes - spread, closes
+
+
+def check(name, ok, failures):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    if not ok:
+        failures.append(name)
+
+
+def check_references(failures):
+    """Matrix indicators against calculate_ema and atr_from_klines, row by row."""
+    _, highs, lows, closes = random_market(8, 120)
+    for window in (5, 20):
+        matrix = weighted_ma_matrix(closes, window)
+        check(f"weighted_ma_matrix[{window}] == calculate_ema",
+              all(np.isclose(matrix[row, -1], calculate_ema(closes[row], window), rtol=RTOL) for row in range(len(closes)))
+              and all(np.isclose(matrix[0, index], calculate_ema(closes[0, :index + 1], window), rtol=RTOL) for index in range(window - 1, 120, 17)),
+              failures)
+    atr = atr_matrix(highs, lows, closes, 14)
+    klines = [[[0, 0, high, low, close] for high, low, close in zip(highs[row], lows[row], closes[row])] for row in range(len(closes))]
+    check("atr_matrix == atr_from_klines", all(np.isclose(atr[row], atr_from_klines(klines[row], 14)[-1], rtol=RTOL) for row in range(len(closes))), failures)
+
+
+def time_rank(pairs, repeat):
+    symbols, highs, lows, closes = random_market(pairs, SCREENER_BARS)
+    store = Screener(client=None, rate=0)
+    for row, symbol in enumerate(symbols):
+        store.bars[(symbol, "1h")] = np.column_stack([np.arange(SCREENER_BARS) * 3600000.0, highs[row], lows[row], closes[row]])
+    rank(*store.matrices(symbols, "1h", SCREENER_BARS))  # Warm up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results, passed = rank(*store.matrices(symbols, "1h", SCREENER_BARS), top=20)
+        timings.append(time.perf_counter() - started)
+    print(f"rank   {pairs:>5} pairs x {SCREENER_BARS} bars: {min(timings) * 1000:7.2f} ms best, "
+          f"{sorted(timings)[len(timings) // 2] * 1000:7.2f} ms median, {passed} passed, best {results[0]['symbol'] if results else '-'}")
+    return min(timings)
+
+
+def time_refresh(pairs, failures):
+    """Cold, same-bar and next-bar refreshes of `pairs` stand-in pairs, and a screen during a refresh."""
+    from config.bot_config import binance_client
+    from core.scheduler import scheduler
+
+    now = [time.time() // 3600 * 3600 + 1800]
+    clock = lambda: now[0]
+    symbols = {f"P{index:04d}USDT": (f"P{index:04d}", "USDT", 1 + index) for index in range(pairs)}
+    exchange = StandInExchange(clock, symbols)
+    binance_client.set_client(exchange)
+    scheduler.set_clock(clock)
+    store = Screener(client=exchange, rate=0)
+    for label, advance in (("cold", 0), ("same bar", 600), ("next bar", 3600)):
+        now[0] += advance
+        requests = store.requests
+        started = time.perf_counter()
+        store.refresh(list(symbols), "1h", SCREENER_BARS)
+        refreshed = time.perf_counter() - started
+        print(f"refresh {label:>8}: {refreshed * 1000:8.1f} ms ({store.requests - requests:>4} kline requests)")
+    print(f"       at TRENDR_SCREENER_RATE={screener_module.SCREENER_RATE:g}/s a cold refresh of {pairs} pairs takes ~{pairs / screener_module.SCREENER_RATE:.0f}s, "
+          "a same-bar refresh makes no request")
+
+    # A cold screen starts the refresh in the background and ranks what is cached
+    throttled = Screener(client=exchange, rate=5)
+    started = time.perf_counter()
+    report = throttled.screen(symbols=list(symbols)[:15])
+    elapsed = time.perf_counter() - started
+    check(f"screen returns in {elapsed * 1000:.1f} ms while a throttled refresh runs", elapsed < 0.5 and report["refreshing"], failures)
+    while throttled.refreshing["1h"]:
+        time.sleep(0.05)
+    report = throttled.screen(symbols=list(symbols)[:15])
+    check(f"the next screen ranks the refreshed bars ({report['ranked']} ranked)", report["ranked"] == 15, failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    failures = []
+    check_references(failures)
+    best = time_rank(args.pairs, args.repeat)
+    check(f"rank of {args.pairs} pairs under 100 ms", best < 0.1, failures)
+    time_refresh(args.pairs, failures)
+    if failures:
+        print(f"{len(failures)} checks failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Soak test: thousands of bot start/stop cycles over hours of accelerated
+candles, against the local exchange and websocket stand-in
+(benchmarks.exchange), failing if any process resource grows without bound.
+
+Every cycle starts a batch of bots through the Flask app (live and paper, on
+several symbols and resampled intervals), lets them trade for a few candles
+on a clock running `--speed` times faster than wall time, then stops them
+all and waits for the process to go idle. Every `--sample-every` cycles, at
+that idle point, it records:
+
+    rss_mb, threads, fds, sockets         process resources (fds/sockets need /proc)
+    bots, loggers, logger_events          bot_registry and core.logger registries
+    log_queue, console_queue              undelivered dashboard frames / console records
+    timers, nodes, books, risk_slots      scheduler heap, indicator graph, order books, risk engines
+    curves, traced_mb                     equity curves, tracemalloc's traced memory
+
+After the warm-up samples, a metric leaks when its median over the last
+third of the run exceeds the median over the first third by more than its
+tolerance while still rising over the last half. The largest tracemalloc
+growth by allocation site is printed at every sample and at the end.
+
+Usage:
+    python -m benchmarks.soak [--cycles 2000] [--bots 6] [--speed 600] [--hold 2] [--sample-every 50]
+                              [--paper-share 0.5] [--no-tracemalloc] [--csv soak.csv]
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+from benchmarks.exchange import StandInExchange, StandInServer
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "ETHBTC"]
+INTERVALS = ["1m", "3m", "5m"]
+
+# metric -> (absolute tolerance, tolerance relative to the early median)
+TOLERANCES = {
+    "rss_mb": (16, 0.10),
+    "threads": (2, 0),
+    "fds": (4, 0),
+    "sockets": (2, 0),
+    "bots": (0, 0),
+    "loggers": (0, 0),
+    "logger_events": (0, 0),
+    "log_queue": (0, 0),
+    "console_queue": (256, 0),
+    "timers": (4, 0),
+    "nodes": (0, 0),
+    "books": (0, 0),
+    "risk_slots": (0, 0),
+    "curves": (0, 0),
+    "traced_mb": (4, 0.10),
+}
+IDLE_TIMEOUT_SECONDS = 10
+
+
+def bot_specs(cycle, count, paper_share):
+    specs = []
+    for index in range(count):
+        spec = {
+            "symbol": SYMBOLS[index % len(SYMBOLS)],
+            "interval": INTERVALS[(index // len(SYMBOLS)) % len(INTERVALS)],
+            "starting_trade_amount": 100 + index,
+            "trade_allocation": 10,
+        }
+        if (index + cycle) % count < paper_share * count:
+            spec.update(paper=True, short_window=3 + index % 4, long_window=13)
+        specs.append(spec)
+    return specs
+
+
+def open_files():
+    """(open file descriptors, open sockets), or (None, None) without /proc."""
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None, None
+    sockets = 0
+    for fd in fds:
+        try:
+            sockets += os.readlink(f"/proc/self/fd/{fd}").startswith("socket:")
+        except OSError:
+            pass  # Closed since the listing
+    return len(fds), sockets
+
+
+def resident_mb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Peak, in KiB on Linux
+
+
+def sample(main):
+    from core import console, logger
+    from core.equity import equity_curves
+    from core.indicators import indicator_engine
+    from core.orderbook import order_books
+    from core.risk import portfolio_risk, paper_risk
+    from core.scheduler import scheduler
+
+    gc.collect()
+    fds, sockets = open_files()
+    return {
+        "rss_mb": resident_mb(),
+        "threads": threading.active_count(),
+        "fds": fds,
+        "sockets": sockets,
+        "bots": len(main.bot_registry),
+        "loggers": len(logger.loggers),
+        "logger_events": len(logger.logger_ready_events),
+        "log_queue": sum(bot_logger.queue.qsize() for bot_logger in list(logger.loggers.values())),
+        "console_queue": console._writer.queue.qsize(),
+        "timers": len(scheduler._heap),
+        "nodes": len(indicator_engine.nodes()),
+        "books": len(order_books.books),
+        "risk_slots": len(portfolio_risk.slots) + len(paper_risk.slots),
+        "curves": len(equity_curves),
+        "traced_mb": tracemalloc.get_traced_memory()[0] / 2**20 if tracemalloc.is_tracing() else None,
+    }
+
+
+def wait_idle(main, timeout=IDLE_TIMEOUT_SECONDS):
+    """Waits until every bot has left the registry; returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    while main.bot_registry:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def find_leaks(samples, warmup):
+    """
+    Returns {metric: (early median, late median)} for every metric that kept
+    growing after the warm-up samples.
+    """
+    steady = samples[warmup:]
+    if len(steady) < 6:
+        return {}
+    third = len(steady) // 3
+    leaks = {}
+    for metric, (absolute, relative) in TOLERANCES.items():
+        values = [row[metric] for row in steady if row[metric] is not None]
+        if len(values) < len(steady):
+            continue
+        early = statistics.median(values[:third])
+        late = statistics.median(values[-third:])
+        half = values[len(values) // 2:]
+        rising = statistics.linear_regression(range(len(half)), half).slope > 0 if len(set(half)) > 1 else False
+        if late - early > max(absolute, relative * early) and rising:
+            leaks[metric] = (early, late)
+    return leaks
+
+
+def top_growth(baseline, limit=5):
+    """Largest allocation-site growth since `baseline` (a tracemalloc snapshot)."""
+    if baseline is None:
+        return []
+    return [stat for stat in tracemalloc.take_snapshot().compare_to(baseline, "lineno")[:limit] if stat.size_diff > 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--bots", type=int, default=6, help="bots started per cycle")
+    parser.add_argument("--speed", type=float, default=600, help="clock speed-up (600: a 1m candle every 0.1s)")
+    parser.add_argument("--hold", type=float, default=2, help="1m candles each batch trades before it is stopped")
+    parser.add_argument("--sample-every", type=int, default=50, help="cycles between samples")
+    parser.add_argument("--warmup", type=int, default=3, help="samples ignored by the leak check")
+    parser.add_argument("--paper-share", type=float, default=0.5, help="share of each batch started as paper bots")
+    parser.add_argument("--no-tracemalloc", action="store_true")
+    parser.add_argument("--csv", help="write every sample to this file")
+    args = parser.parse_args()
+
+    # The stand-in must be listening, and trendr pointed at it, before trendr is imported
+    exchange = StandInExchange()
+    server = StandInServer(exchange).start()
+    os.environ["TRENDR_DASHBOARD_URL"] = server.dashboard_url
+    os.environ["TRENDR_DEPTH_STREAM_URL"] = server.depth_stream_url
+
+    from config.bot_config import binance_client
+    from core import console
+    from core.recorder import ReplayClock
+    from core.scheduler import scheduler
+    import main as app_module
+
+    console.set_level("error")
+    clock = ReplayClock(time.time(), args.speed)
+    exchange.clock = clock
+    binance_client.set_client(exchange)
+    scheduler.set_clock(clock, args.speed)
+    client = app_module.app.test_client()
+
+    if not args.no_tracemalloc:
+        tracemalloc.start(1)
+    samples = []
+    baseline = None
+    errors = 0
+    hold = args.hold * 60 / args.speed
+    started = time.monotonic()
+    columns = list(TOLERANCES)
+    print(f"{'cycle':>6} {'clock h':>7} " + " ".join(f"{name:>13}" for name in columns))
+    for cycle in range(1, args.cycles + 1):
+        response = client.post("/bots", json={"bots": bot_specs(cycle, args.bots, args.paper_share)})
+        if response.status_code != 200:
+            errors += 1
+            print(f"cycle {cycle}: start failed ({response.status_code}): {response.get_json()}")
+        time.sleep(hold)
+        response = client.delete("/bots", json={"all": True})
+        # 404: the bot already exited on its own (stop-loss, take-profit, ...) after the registry was listed
+        failed = {name: result for name, result in response.get_json()["results"].items() if result["status"] not in (200, 404)}
+        if response.status_code != 200 or failed:
+            errors += 1
+            print(f"cycle {cycle}: stop failed: {failed or response.status_code}")
+        if not wait_idle(app_module):
+            errors += 1
+            print(f"cycle {cycle}: {len(app_module.bot_registry)} bots still registered {IDLE_TIMEOUT_SECONDS}s after stop")
+
+        if cycle % args.sample_every == 0 or cycle == args.cycles:
+            row = sample(app_module)
+            row["cycle"] = cycle
+            samples.append(row)
+            hours = (clock() - clock.start) / 3600
+            print(f"{cycle:>6} {hours:>7.1f} " + " ".join(f"{'-' if row[name] is None else round(row[name], 1):>13}" for name in columns))
+            if len(samples) == args.warmup and tracemalloc.is_tracing():
+                baseline = tracemalloc.take_snapshot()
+            for stat in top_growth(baseline, 3):
+                print(f"{'':>15}+{stat.size_diff / 1024:8.1f} KiB {stat.count_diff:+7d} blocks  {stat.traceback}")
+
+    elapsed = time.monotonic() - started
+    print(f"\n{args.cycles} cycles of {args.bots} bots in {elapsed:.0f}s, {(clock() - clock.start) / 3600:.1f} hours of accelerated candles, "
+          f"{server.log_frames} dashboard frames, {sum(exchange.calls.values())} exchange calls")
+    if baseline is not None:
+        print("Top allocation growth since warm-up:")
+        for stat in top_growth(baseline, 10):
+            print(f"  +{stat.size_diff / 1024:8.1f} KiB {stat.count_diff:+7d} blocks  {stat.traceback}")
+
+    if args.csv:
+        with open(args.csv, "w") as output:
+            output.write(",".join(["cycle"] + columns) + "\n")
+            for row in samples:
+                output.write(",".join(str(row[name]) for name in ["cycle"] + columns) + "\n")
+
+    leaks = find_leaks(samples, args.warmup)
+    for metric in columns:
+        if metric in leaks:
+            early, late = leaks[metric]
+            print(f"LEAK {metric}: {early:.1f} -> {late:.1f}")
+    if errors:
+        print(f"FAIL {errors} cycles with start/stop errors")
+    if leaks or errors:
+        return 1
+    print("ok   no resource grew without bound")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
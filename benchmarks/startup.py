@@ -0,0 +1,81 @@
+"""
+Startup benchmark: `import main` must stay fast and must not touch the network.
+
+Each sample runs in a fresh interpreter with outbound sockets disabled, so a
+module that builds the Binance client (or opens any connection) at import time
+fails the benchmark instead of silently paying a round trip.
+
+Usage:
+    python -m benchmarks.startup [--runs 7] [--budget-ms 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy modules that must only be loaded on first use.
+DEFERRED_MODULES = ["binance", "pandas", "numpy", "websockets", "numba"]
+
+CHILD = r"""
+import json, socket, sys, time
+
+def _no_network(*args, **kwargs):
+    raise RuntimeError("network access during import")
+
+socket.socket.connect = _no_network
+socket.socket.connect_ex = _no_network
+socket.create_connection = _no_network
+
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+
+from config.bot_config import binance_client
+loaded = [name for name in DEFERRED if name in sys.modules]
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "client_initialized": binance_client.initialized,
+    "eager_modules": loaded,
+}))
+"""
+
+
+def sample():
+    code = f"DEFERRED = {DEFERRED_MODULES!r}\n" + CHILD
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    timings = [s["import_ms"] for s in samples]
+    median = statistics.median(timings)
+    print(f"import main: median {median:.1f}ms | min {min(timings):.1f}ms | max {max(timings):.1f}ms | budget {args.budget_ms:.0f}ms")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.1f}ms exceeds {args.budget_ms:.0f}ms budget")
+    if any(s["client_initialized"] for s in samples):
+        failures.append("Binance client was constructed during import")
+    eager = sorted({name for s in samples for name in s["eager_modules"]})
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Wire benchmark: bytes on the wire and CPU per message for the bot log
+websocket, legacy JSON text frames against MessagePack frames.
+
+Messages are the "[STORE]" bot_data dumps the trading loop sends on every
+candle. Compressed sizes use one deflate stream per connection, as
+permessage-deflate does with context takeover.
+
+Usage:
+    python -m benchmarks.wire [--messages 5000]
+"""
+import argparse
+import copy
+import sys
+import time
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+
+from config.bot_config import bot_data
+from core import wire
+from core.logger import create_message_data, legacy_frame
+
+
+def sample_messages(count):
+    state = copy.deepcopy(bot_data)
+    state.update({
+        "bot_name": "bot-001-BTCUSDT-1h-S:1000-10%",
+        "symbol": "BTCUSDT",
+        "base_currency": "BTC",
+        "quote_currency": "USDT",
+        "interval": "1h",
+        "trade_window": timedelta(days=2),
+        "starting_trade_amount": Decimal("1000"),
+        "current_trade_amount": Decimal("1000"),
+        "base_starting_currency_quantity": Decimal("0.00512000"),
+        "currency_quantity_precision": Decimal("0.00001000"),
+        "running": True,
+    })
+    messages = []
+    for index in range(count):
+        price = Decimal("97650.12") + Decimal(index % 97) / 10
+        state["previous_market_price"] = price
+        state["base_current_currency_quantity"] = Decimal("0.00512000") + Decimal(index % 13) / 100000
+        state["quote_current_currency_quantity"] = Decimal("500.00076280") - Decimal(index % 11)
+        state["total_profit_loss"] = Decimal(index % 7) - Decimal("3.125")
+        state["total_holds"] = index
+        state["market_price"] = float(price)
+        state["market_timestamp"] = 1735689600.0 + index * 3600
+        messages.append(create_message_data(message=f"[STORE] {state['bot_name']} data", status="log", data=dict(state)))
+    return messages
+
+
+def measure(label, encode, messages):
+    start = time.process_time()
+    frames = [encode(message) for message in messages]
+    cpu = time.process_time() - start
+
+    raw = sum(len(frame.encode() if isinstance(frame, str) else frame) for frame in frames)
+    compressor = zlib.compressobj(wbits=-15)
+    compressed = 0
+    for frame in frames:
+        data = frame.encode() if isinstance(frame, str) else frame
+        compressed += len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4  # permessage-deflate drops the sync tail
+    count = len(messages)
+    print(f"{label:26s} {raw / count:8.1f} B/msg raw | {compressed / count:7.1f} B/msg deflated | {cpu / count * 1e6:7.1f} µs/msg")
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    messages = sample_messages(args.messages)
+    bot_id = messages[0]["data"]["bot_name"]
+
+    measure("json (legacy)", lambda message: legacy_frame(bot_id, message), messages)
+    have_msgpack = bool(wire.msgpack_module())
+    frames = measure(f"msgpack ({'C' if have_msgpack else 'pure Python'})", lambda message: wire.encode(bot_id, message), messages)
+    if have_msgpack:
+        wire._msgpack = False
+        pure = measure("msgpack (pure Python)", lambda message: wire.encode(bot_id, message), messages)
+        wire._msgpack = None
+        if pure != frames:
+            print("FAIL: pure-Python frames differ from msgpack frames")
+            return 1
+        decoded = wire.decode(frames[-1])["log"]["data"]
+        if decoded["quote_current_currency_quantity"] != messages[-1]["data"]["quote_current_currency_quantity"]:
+            print("FAIL: Decimal did not round-trip exactly")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,10 @@
 from decimal import Decimal
-from dotenv import load_dotenv
-from binance.client import Client
 import os
-
-load_dotenv()
+import threading
 
 bot_data = {
     "running": False,
+    "bot_name": None,
     "symbol": None,
     "fiat_stablecoin": 'USDT',
     "base_currency": None,
@@ -46,10 +44,88 @@ bot_data = {
 
 # Initialize Binance client
 
-BINANCE_API_KEY = os.getenv("BINANCE_API_KEY_TESTNET")
-BINANCE_API_SECRET = os.getenv("BINANCE_API_SECRET_TESTNET")
-binance_client = Client(api_key=BINANCE_API_KEY, api_secret=BINANCE_API_SECRET, testnet=True)
-binance_client.API_URL = 'https://testnet.binance.vision/api'
+BINANCE_API_URL = 'https://testnet.binance.vision/api'
+# API hosts to spread requests over, primary first (hedged market-data calls go to the next one)
+API_HOSTS = [host.strip() for host in os.getenv("TRENDR_API_HOSTS", BINANCE_API_URL).split(",") if host.strip()]
+
+def create_binance_clients(hosts, ping=True):
+    """
+    Builds one python-binance testnet Client per API host. A testnet Client
+    sends every request to its API_TESTNET_URL, so that is what points it at
+    its host. Only the first client pings the exchange (once its host is set).
+    With a single host, a second client on the same host carries the hedges.
+    """
+    from dotenv import load_dotenv
+    from binance.client import Client  # Deferred: python-binance is slow to import
+    from core.rest import REST_TIMEOUT_SECONDS
+
+    load_dotenv()
+    api_key = os.getenv("BINANCE_API_KEY_TESTNET")
+    api_secret = os.getenv("BINANCE_API_SECRET_TESTNET")
+    clients = []
+    for host in hosts if len(hosts) > 1 else hosts * 2:
+        client = Client(api_key=api_key, api_secret=api_secret, requests_params={"timeout": REST_TIMEOUT_SECONDS}, testnet=True, ping=False)
+        client.API_URL = client.API_TESTNET_URL = host
+        clients.append(client)
+    if ping:
+        clients[0].ping()
+    return clients
+
+def create_binance_client():
+    """
+    Builds the testnet Binance client: a Client per API host (TRENDR_API_HOSTS)
+    behind core.rest's hedging, retries and circuit breakers, built the first
+    time the client is actually used.
+    """
+    from core.rest import resilient_client
+
+    return resilient_client(create_binance_clients(API_HOSTS))
+
+class BinanceClientProvider:
+    """
+    Lazily initialized, injectable stand-in for the Binance client.
+
+    Attribute access is forwarded to the real client, which is built by `factory`
+    on first use. `set_client` swaps in any object with the same interface
+    (a fake exchange, a recorder, ...) without touching the importing modules.
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+                client = self._client
+        return client
+
+    def set_client(self, client):
+        self._client = client
+
+    def set_factory(self, factory):
+        """Replaces the factory and drops any client it already built."""
+        with self._lock:
+            self._factory = factory
+            self._client = None
+
+    @property
+    def initialized(self):
+        return self._client is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get_client(), name)
+
+binance_client = BinanceClientProvider(create_binance_client)
+
+def get_binance_client():
+    return binance_client.get_client()
+
+def set_binance_client(client):
+    binance_client.set_client(client)
 
 # Reset color
 COLOR_RESET = "\033[0m"
@@ -114,7 +190,3 @@ COLORS = {
     "BCH": COLOR_BCH,                       # BCH - Bitcoin Cash
     "EOS": COLOR_EOS                        # EOS - EOS
 }
-
-known_currencies = {
-    'BTC', 'ETH', 'XRP', 'ADA', 'SOL', 'LTC', 'BNB', 'DOGE', 'MATIC', 'USDT', 'XMR', 'BCH', 'EOS'
-}
\ No newline at end of file
@@ -0,0 +1,518 @@
+"""
+Portfolio backtest: many EMA crossover bots replayed together on one shared
+quote balance.
+
+Candles come in as columns per symbol ({"open_time", "high", "low", "close"}
+arrays, typically 1m) and are resampled per bot interval with NumPy. Each
+bot's indicators and signals (the strategy's EMAs and ATR, the ATR filter,
+crossover zones and ATR-adjusted trailing stop) are computed for the whole
+series up front. The replay then walks every bot's candle closes in time
+order, merged with a heap holding one entry per bot, and applies what the
+trading loop would do at each close:
+
+- the risk engine's exits: stop-loss / take-profit on the bot's equity
+  against its starting amount, the trailing stop below the highest close,
+  the per-asset exposure cap (the largest holders of an asset over
+  max_asset_share of total equity exit until the rest fit) and the portfolio
+  drawdown (an exiting bot sells its whole position and stops);
+- buys and sells sized and filtered like buy_crypto / sell_crypto (lot size,
+  minimum notional, taker fee). Buys are sized from the bot's own quote share
+  but paid from the shared balance, and refused when it cannot pay for them
+  or when they would take the base asset over max_asset_share of total equity.
+
+Where this deliberately differs from live trading:
+
+- Fees: buy_crypto / sell_crypto charge the taker fee to current_trade_amount
+  only, leaving the bot's quote quantity at the gross trade value. Here the
+  fee is also taken out of the bot's quote share and the shared balance,
+  since the exchange does take it, so reported equity and P&L are net of fees.
+- Risk timing: the live engine checks every bot each TRENDR_RISK_INTERVAL
+  seconds on ticker prices. Here a bot's stops, and the exposure cap of its
+  base asset, are checked at its own candle closes and filled at the close.
+  The cap is a share of the shared balance plus every position (the engine
+  sums the bots' own equity), and absolute caps (set_asset_cap) are not modeled.
+- Fills: there is no order book, netting or slippage. Every order fills at
+  the close, without the slippage cap or the headroom buy_crypto keeps for it.
+
+As in build_bot_data, each bot starts with half of its starting amount in
+the base asset, bought at its first close without fees. Starting amounts may
+add up to more than the capital, in which case the bots compete for the
+shared balance. All symbols must be quoted in the same asset; equity is
+reported in it.
+
+Usage:
+    python -m core.backtest candles.npz [--interval 1h] [--capital 10000] [--allocation 10]
+    python -m core.backtest candles.npz --fetch BTCUSDT,ETHUSDT --days 30   # download 1m candles first
+"""
+import heapq
+import math
+import time
+from core.bot import strategy_params
+from core.indicators import KLINE_LIMIT
+from core.risk import STOP_LOSS, TAKE_PROFIT, TRAILING_STOP, EXPOSURE_CAP, DRAWDOWN, STOP_LOSS_PERCENTAGE, TAKE_PROFIT_PERCENTAGE, MAX_DRAWDOWN_PERCENTAGE
+from core.scheduler import interval_seconds
+from core.symbols import symbol_registry
+from core.utils import lazy_import
+from core import kernels
+
+np = lazy_import("numpy")
+
+DEFAULT_FEE_RATE = 0.001
+# Seconds between equity samples in the report
+RECORD_EVERY_SECONDS = 3600
+# atr_filter defaults, and the trailing stop before the first candle that passes it
+ATR_THRESHOLD_LOW = 10
+ATR_THRESHOLD_HIGH = 50
+TRAILING_STOP_PERCENTAGE = 2
+ATR_WINDOW = 14
+# Per-candle action codes: crossover zone, or a candle the ATR filter skips
+BUY_ZONE = 1
+SELL_ZONE = -1
+SKIP = 2
+
+
+# ---- Candle columns ----
+
+def klines_to_columns(klines):
+    """Columns of REST klines ([open time, open, high, low, close, ...])."""
+    return {
+        "open_time": np.array([int(kline[0]) for kline in klines], dtype=np.int64),
+        "high": np.array([float(kline[2]) for kline in klines]),
+        "low": np.array([float(kline[3]) for kline in klines]),
+        "close": np.array([float(kline[4]) for kline in klines]),
+    }
+
+
+def resample(columns, interval):
+    """
+    Bars of `interval` built from finer, epoch-aligned columns, like
+    core.candles.IntervalBars: a bar closes when the next bucket starts, and
+    the last one only if its final candle is present.
+    """
+    open_time = columns["open_time"]
+    if not len(open_time):
+        return columns
+    step_ms = interval_seconds(interval) * 1000
+    source_ms = int(np.min(np.diff(open_time))) if len(open_time) > 1 else step_ms
+    if source_ms == step_ms:
+        return columns
+    buckets = open_time - open_time % step_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(open_time)] - 1
+    complete = len(starts) - (open_time[-1] + source_ms < buckets[-1] + step_ms)  # Last bucket may still be forming
+    return {
+        "open_time": buckets[starts][:complete],
+        "high": np.maximum.reduceat(columns["high"], starts)[:complete],
+        "low": np.minimum.reduceat(columns["low"], starts)[:complete],
+        "close": columns["close"][ends][:complete],
+    }
+
+
+def rolling_atr(highs, lows, closes, window):
+    """atr_from_klines over a whole series: mean true range of the last `window` candles."""
+    previous = np.r_[closes[0], closes[:-1]]
+    true_range = np.maximum(highs - lows, np.maximum(np.abs(highs - previous), np.abs(lows - previous)))
+    true_range[0] = 0
+    out = np.full(len(closes), np.nan)
+    if len(closes) >= window:
+        total = np.cumsum(true_range)
+        out[window - 1:] = (total[window - 1:] - np.r_[0.0, total[:-window]]) / window
+    return out
+
+
+def load_columns(path):
+    """{symbol: columns} from an .npz written by save_columns."""
+    columns = {}
+    with np.load(path) as data:
+        for key in data.files:
+            symbol, column = key.rsplit(".", 1)
+            columns.setdefault(symbol, {})[column] = data[key]
+    return columns
+
+
+def save_columns(path, columns):
+    np.savez(path, **{f"{symbol}.{name}": values for symbol, symbol_columns in columns.items() for name, values in symbol_columns.items()})
+
+
+def fetch_columns(client, symbol, interval, start_ms, end_ms):
+    """Closed klines of [start_ms, end_ms) as columns, 1000 per request."""
+    klines = []
+    cursor = start_ms
+    step_ms = interval_seconds(interval) * 1000
+    while cursor < end_ms:
+        batch = client.get_klines(symbol=symbol, interval=interval, startTime=cursor, endTime=end_ms - 1, limit=1000)
+        klines.extend(kline for kline in batch if kline[6] < end_ms)
+        if len(batch) < 1000:
+            break
+        cursor = int(batch[-1][0]) + step_ms
+    return klines_to_columns(klines)
+
+
+# ---- Bots ----
+
+def prepare_bot(spec, columns):
+    """
+    Validated settings and precomputed per-candle arrays of one bot.
+
+    Parameters:
+        spec (dict): symbol, interval, trade_allocation, starting_trade_amount and any of
+            STRATEGY_PARAMS, atr_threshold_low / atr_threshold_high.
+        columns (dict): The symbol's candle columns.
+
+    Raises:
+        ValueError: If the spec is invalid.
+    """
+    symbol = spec.get("symbol")
+    if symbol not in columns:
+        raise ValueError(f"No candles for {symbol}")
+    interval = spec.get("interval", "1h")
+    params = strategy_params(spec)
+    bars = resample(columns[symbol], interval)
+    closes = kernels.as_array(bars["close"])
+    short_window, long_window = params.get("short_window", 5), params.get("long_window", 20)
+    threshold = params.get("crossover_threshold", 0) / 100
+    atr_low = float(spec.get("atr_threshold_low", ATR_THRESHOLD_LOW))
+    atr_high = float(spec.get("atr_threshold_high", ATR_THRESHOLD_HIGH))
+
+    short_ema = kernels.weighted_ma(closes, short_window)
+    long_ema = kernels.weighted_ma(closes, long_window)
+    atr = rolling_atr(kernels.as_array(bars["high"]), kernels.as_array(bars["low"]), closes, ATR_WINDOW)
+    code = np.zeros(len(closes), dtype=np.int8)
+    with np.errstate(invalid="ignore"):
+        code[short_ema > long_ema * (1 + threshold)] = BUY_ZONE
+        code[short_ema < long_ema * (1 - threshold)] = SELL_ZONE
+        code[~((atr >= atr_low) & (atr <= atr_high))] = SKIP
+    # Live bots start with KLINE_LIMIT closed candles of history
+    code[:min(len(code), max(long_window, KLINE_LIMIT) - 1)] = SKIP
+
+    entry = symbol_registry.get(symbol)
+    return {
+        "name": spec.get("name") or f"{symbol}-{interval}",
+        "symbol": symbol,
+        "interval": interval,
+        "quote": entry.quote,
+        "base": entry.base,
+        "params": params,
+        "trade_allocation": float(spec.get("trade_allocation", 10)),
+        "starting_trade_amount": float(spec.get("starting_trade_amount", 0) or 0),
+        "stop_loss": float(params.get("stop_loss_percentage", STOP_LOSS_PERCENTAGE)),
+        "take_profit": float(params.get("take_profit_percentage", TAKE_PROFIT_PERCENTAGE)),
+        "min_qty": float(entry.min_qty),
+        "step_size": float(entry.step_size),
+        "min_notional": float(entry.min_notional),
+        # Within the ATR band trailing_stop_percentage returns the base percentage
+        "trailing_stop": float(params.get("base_trailing_stop_loss_percentage", TRAILING_STOP_PERCENTAGE)),
+        "open_time": np.ascontiguousarray(bars["open_time"], dtype=np.int64),
+        "close_offset": interval_seconds(interval) * 1000 - 1,
+        "close": closes,
+        "code": code,
+    }
+
+
+def adjust_quantity(quantity, min_qty, step_size):
+    """core.utils.adjust_quantity on floats."""
+    quantity = max(min_qty, quantity)
+    return math.floor(quantity / step_size + 1e-9) * step_size if step_size > 0 else quantity
+
+
+# ---- Replay ----
+
+def run_backtest(specs, columns, capital=None, fee_rate=DEFAULT_FEE_RATE, max_drawdown=MAX_DRAWDOWN_PERCENTAGE,
+                 max_asset_share=1.0, record_every=RECORD_EVERY_SECONDS):
+    """
+    Replays every bot in `specs` on the shared balance.
+
+    Parameters:
+        specs (list): Bot specs (see prepare_bot); starting_trade_amount defaults to an
+            equal share of `capital`.
+        columns (dict): symbol -> candle columns.
+        capital (float): Shared starting balance (defaults to the sum of starting amounts).
+        fee_rate (float or dict): Taker fee as a fraction, or symbol -> fee.
+        max_drawdown (float): Portfolio drawdown (percent) that exits every bot holding
+            a position (0 disables it).
+        max_asset_share (float): Largest share of total equity one base asset may take:
+            buys past it are refused and its largest holders exit (1 disables it).
+        record_every (float): Seconds between equity samples.
+
+    Returns:
+        dict: "times" (ms) and aggregate "equity" sample arrays, "bots" (one report each,
+            with its equity samples in "curve"), "final_equity", "max_drawdown", "events"
+            and "seconds".
+
+    Raises:
+        ValueError: If a spec is invalid, the symbols do not share one quote asset or
+            the capital does not cover the starting positions.
+    """
+    started = time.perf_counter()
+    if not specs:
+        raise ValueError("specs must be a non-empty list of bot specs")
+    bots = [prepare_bot(spec, columns) for spec in specs]
+    quote_assets = {bot["quote"] for bot in bots}
+    if len(quote_assets) > 1:
+        raise ValueError(f"All symbols must share one quote asset, got {sorted(quote_assets)}")
+    unassigned = [bot for bot in bots if bot["starting_trade_amount"] <= 0]
+    if unassigned:
+        if capital is None:
+            raise ValueError("starting_trade_amount is required without capital")
+        share = (capital - sum(bot["starting_trade_amount"] for bot in bots)) / len(unassigned)
+        for bot in unassigned:
+            bot["starting_trade_amount"] = share
+    if capital is None:
+        capital = sum(bot["starting_trade_amount"] for bot in bots)
+    count = len(bots)
+
+    # Per-bot state in flat lists, indexed by bot
+    fees = [fee_rate.get(bot["symbol"], DEFAULT_FEE_RATE) if isinstance(fee_rate, dict) else fee_rate for bot in bots]
+    base = [0.0] * count
+    quote = [0.0] * count            # The bot's share of the balance
+    trade_amount = [0.0] * count     # current_trade_amount
+    mark = [0.0] * count
+    highest = [0.0] * count
+    trailing = [TRAILING_STOP_PERCENTAGE] * count
+    stats = [{"buys": 0, "sells": 0, "failed": 0, "fees": 0.0, "exit": None} for _ in bots]
+    assets = {}
+    asset_of = [assets.setdefault(bot["base"], len(assets)) for bot in bots]
+    exposure = [0.0] * len(assets)
+    cash = capital
+    for index, bot in enumerate(bots):
+        if not len(bot["close"]):
+            continue
+        price = float(bot["close"][0])
+        half = bot["starting_trade_amount"] / 2
+        base[index] = adjust_quantity(half / price, bot["min_qty"], bot["step_size"])
+        cost = base[index] * price
+        quote[index] = bot["starting_trade_amount"] - cost
+        trade_amount[index] = bot["starting_trade_amount"]
+        cash -= cost
+        mark[index] = price  # highest stays 0 until the first candle past the ATR filter, as in trading_loop
+        exposure[asset_of[index]] += cost
+    if cash < 0:
+        raise ValueError(f"capital {capital} does not cover the starting positions ({capital - cash:.2f})")
+    marked = sum(exposure)
+    peak = cash + marked
+    worst = 0.0
+
+    # Hot-loop inputs: memoryviews index to plain Python numbers
+    opens_of = [memoryview(bot["open_time"]) for bot in bots]
+    offsets = [bot["close_offset"] for bot in bots]
+    closes_of = [memoryview(bot["close"]) for bot in bots]
+    codes_of = [memoryview(bot["code"]) for bot in bots]
+    trailing_stop_of = [bot["trailing_stop"] for bot in bots]
+    starting_of = [bot["starting_trade_amount"] for bot in bots]
+    stop_loss_of = [bot["stop_loss"] for bot in bots]
+    take_profit_of = [bot["take_profit"] for bot in bots]
+    lengths = [len(bot["close"]) for bot in bots]
+    cursor = [0] * count
+    heap = [(opens_of[index][0] + offsets[index], index) for index in range(count) if lengths[index]]
+    heapq.heapify(heap)
+
+    step_ms = int(record_every * 1000)
+    first_time = heap[0][0] if heap else 0
+    last_time = max((opens_of[index][lengths[index] - 1] + offsets[index] for index in range(count) if lengths[index]), default=first_time)
+    samples = (last_time - first_time) // step_ms + 2
+    sample_times = np.empty(samples, dtype=np.int64)
+    sample_equity = np.empty(samples)
+    bot_equity = np.empty((count, samples))
+    sample = 0
+    next_sample = first_time
+
+    def record(at):
+        sample_times[sample] = at
+        sample_equity[sample] = cash + marked
+        for index in range(count):
+            bot_equity[index, sample] = quote[index] + base[index] * mark[index]
+
+    def sell(index, quantity, price):
+        """sell_crypto's fill of `quantity` (already adjusted); returns False if filtered out."""
+        nonlocal cash, marked
+        bot = bots[index]
+        if quantity <= 0 or base[index] < quantity - 1e-12 or quantity * price < bot["min_notional"]:
+            stats[index]["failed"] += 1
+            return False
+        value = quantity * price
+        fee = value * fees[index]
+        base[index] = max(0.0, base[index] - quantity)
+        quote[index] += value - fee
+        trade_amount[index] += value - fee
+        cash += value - fee
+        marked -= value
+        exposure[asset_of[index]] -= value
+        stats[index]["sells"] += 1
+        stats[index]["fees"] += fee
+        return True
+
+    def exit_bot(index, price, reason):
+        bot = bots[index]
+        quantity = math.floor(base[index] / bot["step_size"] + 1e-9) * bot["step_size"] if bot["step_size"] > 0 else base[index]
+        if quantity >= bot["min_qty"]:
+            sell(index, quantity, price)
+        stats[index]["exit"] = reason
+
+    events = 0
+    while heap:
+        at, index = heap[0]
+        while at >= next_sample and sample < samples:
+            record(next_sample)
+            sample += 1
+            next_sample += step_ms
+        position = cursor[index]
+        price = closes_of[index][position]
+        events += 1
+
+        # Mark to market
+        held = base[index]
+        if held:
+            change = held * (price - mark[index])
+            marked += change
+            exposure[asset_of[index]] += change
+        mark[index] = price
+
+        # Risk engine exits: the bot sells out and stops
+        reason = None
+        starting = starting_of[index]
+        pnl = (quote[index] + held * price - starting) / starting * 100 if starting > 0 else 0.0
+        if pnl <= -stop_loss_of[index]:
+            reason = STOP_LOSS
+        elif pnl >= take_profit_of[index]:
+            reason = TAKE_PROFIT
+        elif held > 0 and price < highest[index] * (1 - trailing[index] / 100):
+            reason = TRAILING_STOP
+        equity = cash + marked
+        if equity > peak:
+            peak = equity
+        drawdown = (peak - equity) / peak * 100 if peak > 0 else 0.0
+        if drawdown > worst:
+            worst = drawdown
+        if reason is None and max_drawdown and drawdown >= max_drawdown:
+            # Bots without a position stop too: check_ema_threshold never buys without base
+            for _, other in heap:
+                exit_bot(other, mark[other], DRAWDOWN)
+            heap.clear()
+            break
+        if reason is not None:
+            exit_bot(index, price, reason)
+            heapq.heappop(heap)
+            continue
+        if max_asset_share < 1:
+            # Exposure cap: the asset's largest holders exit until the rest fit, as in PortfolioRisk.evaluate
+            asset = asset_of[index]
+            excess = exposure[asset] - max_asset_share * equity
+            if excess > 0:
+                holders = sorted((other for _, other in heap if asset_of[other] == asset and base[other] > 0), key=lambda other: -base[other] * mark[other])
+                exited = set()
+                for other in holders:
+                    if excess <= 0:
+                        break
+                    excess -= base[other] * mark[other]
+                    exit_bot(other, mark[other], EXPOSURE_CAP)
+                    exited.add(other)
+                heap[:] = [entry for entry in heap if entry[1] not in exited]
+                heapq.heapify(heap)  # The current bot's entry stays the smallest
+                if index in exited:
+                    continue
+
+        # Trading loop: ATR filter, trailing stop, then check_ema_threshold
+        code = codes_of[index][position]
+        if code != SKIP:
+            trailing[index] = trailing_stop_of[index]
+            if price > highest[index]:
+                highest[index] = price
+            if code == BUY_ZONE and held > 0 and quote[index] > 0:
+                bot = bots[index]
+                quantity = adjust_quantity(quote[index] * bot["trade_allocation"] / 100 / price, bot["min_qty"], bot["step_size"])
+                if quantity * price < bot["min_notional"]:
+                    quantity = adjust_quantity(bot["min_notional"] / price, bot["min_qty"], bot["step_size"])
+                cost = quantity * price
+                fee = cost * fees[index]
+                if quote[index] < cost or cash < cost + fee or (max_asset_share < 1 and exposure[asset_of[index]] + cost > max_asset_share * (cash + marked)):
+                    stats[index]["failed"] += 1
+                else:
+                    base[index] += quantity
+                    quote[index] -= cost + fee
+                    trade_amount[index] -= cost + fee
+                    cash -= cost + fee
+                    marked += cost
+                    exposure[asset_of[index]] += cost
+                    stats[index]["buys"] += 1
+                    stats[index]["fees"] += fee
+            elif code == SELL_ZONE and held > 0:
+                bot = bots[index]
+                quantity = adjust_quantity(min(trade_amount[index] * bot["trade_allocation"] / 100 / price, held), bot["min_qty"], bot["step_size"])
+                sell(index, quantity, price)
+
+        position += 1
+        cursor[index] = position
+        if position < lengths[index]:
+            heapq.heapreplace(heap, (opens_of[index][position] + offsets[index], index))
+        else:
+            heapq.heappop(heap)
+    if sample < samples:
+        record(at if events else first_time)
+        sample += 1
+
+    final_equity = cash + sum(base[index] * mark[index] for index in range(count))
+    reports = []
+    for index, bot in enumerate(bots):
+        equity = quote[index] + base[index] * mark[index]
+        starting = bot["starting_trade_amount"]
+        reports.append({
+            "name": bot["name"],
+            "symbol": bot["symbol"],
+            "interval": bot["interval"],
+            "params": bot["params"],
+            "starting_value": starting,
+            "equity": equity,
+            "pnl": equity - starting,
+            "pnl_percentage": (equity - starting) / starting * 100 if starting else 0.0,
+            "base_quantity": base[index],
+            "candles": lengths[index],
+            **stats[index],
+            "curve": bot_equity[index, :sample],
+        })
+    return {
+        "quote": bots[0]["quote"],
+        "capital": capital,
+        "final_equity": final_equity,
+        "pnl_percentage": (final_equity - capital) / capital * 100 if capital else 0.0,
+        "max_drawdown": worst,
+        "cash": cash,
+        "times": sample_times[:sample],
+        "equity": sample_equity[:sample],
+        "bots": reports,
+        "events": events,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    import argparse
+    from config.bot_config import binance_client
+
+    parser = argparse.ArgumentParser(description="Backtest EMA crossover bots on one shared balance.")
+    parser.add_argument("path", help=".npz of candle columns (see save_columns)")
+    parser.add_argument("--fetch", help="comma-separated symbols to download 1m candles for into `path` first")
+    parser.add_argument("--days", type=float, default=30, help="days of candles to download")
+    parser.add_argument("--interval", default="1h", help="interval every bot trades on")
+    parser.add_argument("--capital", type=float, default=10000)
+    parser.add_argument("--allocation", type=float, default=10, help="trade_allocation of every bot")
+    parser.add_argument("--fee", type=float, default=DEFAULT_FEE_RATE)
+    args = parser.parse_args()
+
+    if args.fetch:
+        end_ms = int(time.time() // 60 * 60000)
+        save_columns(args.path, {symbol: fetch_columns(binance_client, symbol, "1m", end_ms - int(args.days * 86400000), end_ms) for symbol in args.fetch.split(",")})
+    columns = load_columns(args.path)
+    if not symbol_registry.loaded:
+        symbol_registry.refresh()
+    specs = [{"symbol": symbol, "interval": args.interval, "trade_allocation": args.allocation} for symbol in sorted(columns)]
+    report = run_backtest(specs, columns, capital=args.capital, fee_rate=args.fee)
+    for bot in sorted(report["bots"], key=lambda bot: bot["pnl"], reverse=True):
+        print(f"{bot['name']:24s} {bot['pnl']:+12.2f} {report['quote']} ({bot['pnl_percentage']:+7.2f}%)  "
+              f"{bot['buys']:5d} buys {bot['sells']:5d} sells  fees {bot['fees']:9.2f}  {bot['exit'] or ''}")
+    print(f"{len(report['bots'])} bots, {report['events']:,} candles in {report['seconds']:.1f}s: "
+          f"{report['capital']:.2f} -> {report['final_equity']:.2f} {report['quote']} ({report['pnl_percentage']:+.2f}%), "
+          f"max drawdown {report['max_drawdown']:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import itertools
+import threading
+from decimal import Decimal, InvalidOperation
+from config.bot_config import bot_data, binance_client
+from core.market_data import get_price, update_price
+from core.scheduler import interval_seconds
+from core.symbols import symbol_registry, TRADING
+from core.utils import adjust_quantity, get_quantity_precision, parse_trade_window
+
+# Bot ids are never reused, so a name stays unique after other bots stop
+_bot_ids = itertools.count(1)
+
+# Strategy parameters a start request may override (variants), with their types; bot_data
+# only carries the ones given, the trading loop falls back to its defaults for the rest
+STRATEGY_PARAMS = {
+    "short_window": int,
+    "long_window": int,
+    "crossover_threshold": float,
+    "stop_loss_percentage": float,
+    "take_profit_percentage": float,
+    "base_trailing_stop_loss_percentage": float,
+}
+
+
+def next_bot_name(bot_data_instance):
+    prefix = "paper" if bot_data_instance.get("paper") else "bot"
+    return f"{prefix}-{next(_bot_ids):03d}-{bot_data_instance['symbol']}-{bot_data_instance['interval']}-S:{bot_data_instance['starting_trade_amount']}-{bot_data_instance['trade_allocation']}%"
+
+
+def duplicate_key(bot_data_instance):
+    """Configuration two running bots may not share."""
+    return (
+        bot_data_instance["symbol"],
+        bot_data_instance["interval"],
+        bot_data_instance["starting_trade_amount"],
+        bot_data_instance["trade_allocation"],
+        bool(bot_data_instance.get("paper")),
+        tuple((name, bot_data_instance[name]) for name in STRATEGY_PARAMS if name in bot_data_instance),
+    )
+
+
+class BotRegistry(dict):
+    """
+    bot_name -> {"data": bot_data, "thread": ..., ...}, with a hashed index of
+    the running configurations so duplicate checks do not scan every bot.
+    """
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.RLock()
+        self._keys = {}    # bot_name -> duplicate key
+        self._by_key = {}  # duplicate key -> bot_name
+
+    def __setitem__(self, bot_name, entry):
+        with self.lock:
+            self._unindex(bot_name)
+            super().__setitem__(bot_name, entry)
+            key = duplicate_key(entry["data"])
+            self._keys[bot_name] = key
+            self._by_key[key] = bot_name
+
+    def __delitem__(self, bot_name):
+        with self.lock:
+            super().__delitem__(bot_name)
+            self._unindex(bot_name)
+
+    def pop(self, bot_name, *default):
+        with self.lock:
+            self._unindex(bot_name)
+            return super().pop(bot_name, *default)
+
+    # The other mutators go through the two above so the index stays in sync
+
+    def update(self, *args, **kwargs):
+        with self.lock:
+            for bot_name, entry in dict(*args, **kwargs).items():
+                self[bot_name] = entry
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, bot_name, entry=None):
+        with self.lock:
+            if bot_name not in self:
+                self[bot_name] = entry
+            return self[bot_name]
+
+    def popitem(self):
+        with self.lock:
+            bot_name, entry = super().popitem()
+            self._unindex(bot_name)
+            return bot_name, entry
+
+    def clear(self):
+        with self.lock:
+            super().clear()
+            self._keys.clear()
+            self._by_key.clear()
+
+    def _unindex(self, bot_name):
+        key = self._keys.pop(bot_name, None)
+        if key is not None and self._by_key.get(key) == bot_name:
+            del self._by_key[key]
+
+    def find_duplicate(self, bot_data_instance):
+        """Name of the running bot with the same configuration, if any."""
+        return self._by_key.get(duplicate_key(bot_data_instance))
+
+
+def required_symbols(spec):
+    """Symbols whose metadata and price a bot spec needs before it can start."""
+    symbol = spec.get("symbol")
+    if not symbol:
+        return set()
+    symbol_id = symbol_registry.ids.get(symbol)
+    if symbol_id is None:
+        return {symbol}  # Not listed, or listed since the last refresh: build_bot_data looks it up on its own
+    quote = symbol_registry.by_id(symbol_id).quote
+    return {symbol} if quote == "USDT" else {symbol, f"{quote}USDT"}
+
+
+def prefetch_market_data(specs):
+    """
+    Loads exchange filters and prices for the bots in `specs` with one bulk
+    call each (exchangeInfo and the all-symbols ticker) instead of several
+    calls per bot.
+    """
+    prefetch_exchange_info()
+    prefetch_prices(set().union(*(required_symbols(spec) for spec in specs)))
+
+
+def prefetch_exchange_info():
+    """Loads the symbol registry once; after that its periodic refresh keeps it current."""
+    if not symbol_registry.loaded:
+        symbol_registry.refresh()
+
+
+def prefetch_prices(symbols):
+    symbols = set(symbols)
+    for ticker in binance_client.get_all_tickers():
+        if ticker["symbol"] in symbols:
+            update_price(ticker["symbol"], ticker["price"])
+
+
+def build_bot_data(spec):
+    """
+    Builds the bot_data of a new bot from a start request.
+
+    Parameters:
+        spec (dict): symbol, interval, starting_trade_amount, trade_allocation, trade_window,
+            optionally "paper": true (simulated fills) and any of STRATEGY_PARAMS.
+
+    Returns:
+        dict: The bot's bot_data, without a name and not yet running.
+
+    Raises:
+        ValueError: If the spec is invalid.
+    """
+    symbol = spec.get("symbol")
+    if not symbol:
+        raise ValueError("symbol is required")
+    symbol_info = symbol_registry.get(symbol)  # Raises ValueError for pairs the exchange does not list
+    if symbol_info.status != TRADING:
+        raise ValueError(f"{symbol} is not trading (status {symbol_info.status})")
+    base, quote = symbol_info.base, symbol_info.quote
+    try:
+        trade_allocation = Decimal(spec.get("trade_allocation", 0))
+        starting_trade_amount = Decimal(spec.get("starting_trade_amount", 0.0))
+    except (InvalidOperation, TypeError):
+        raise ValueError("trade_allocation and starting_trade_amount must be numbers")
+    if starting_trade_amount <= 0:
+        raise ValueError("starting_trade_amount must be positive")
+    interval_seconds(spec.get("interval", "1h"))  # Raises ValueError for unsupported intervals
+    params = strategy_params(spec)
+
+    bot_data_instance = bot_data.copy()
+    bot_data_instance["symbol"] = symbol
+    bot_data_instance["trade_allocation"] = trade_allocation
+    split_funds = True
+    bot_data_instance["base_currency"] = base
+    bot_data_instance["quote_currency"] = quote
+    bot_data_instance["interval"] = spec.get("interval", "1h")
+    bot_data_instance["starting_trade_amount"] = starting_trade_amount
+    bot_data_instance["current_trade_amount"] = bot_data_instance["starting_trade_amount"]
+
+    # Fetch price and calculate initial quantity
+    current_price = get_price(symbol)
+    min_qty, step_size = get_quantity_precision(symbol)
+
+    if (split_funds):
+        starting_trade_amount = starting_trade_amount / 2
+         # Calculate the quantity of the base currency
+        bot_data_instance["base_starting_currency_quantity"] = adjust_quantity(starting_trade_amount / current_price, min_qty, step_size)
+        bot_data_instance["base_current_currency_quantity"] = bot_data_instance["base_starting_currency_quantity"]
+
+        if quote == "USDT":
+            # If the quote currency is USDT, we can directly assign the value
+            bot_data_instance["quote_current_currency_quantity"] = adjust_quantity(starting_trade_amount, min_qty, step_size)
+        else:
+            # Fetch the price of the quote currency in terms of USDT
+            quote_price = get_price(f"{quote}USDT")
+            bot_data_instance["quote_current_currency_quantity"] = adjust_quantity(starting_trade_amount / quote_price, min_qty, step_size)
+
+    else:
+        # If not splitting funds, use the entire amount for base currency
+        bot_data_instance["base_starting_currency_quantity"] = adjust_quantity(starting_trade_amount / current_price, min_qty, step_size)
+        bot_data_instance["base_current_currency_quantity"] = bot_data_instance["base_starting_currency_quantity"]
+
+    bot_data_instance["currency_quantity_precision"] = step_size
+    bot_data_instance["previous_market_price"] = current_price
+    bot_data_instance["trade_window"] = parse_trade_window(spec.get('trade_window'))
+    bot_data_instance["paper"] = bool(spec.get("paper"))
+    bot_data_instance.update(params)
+    return bot_data_instance
+
+
+def strategy_params(spec):
+    """
+    Strategy parameter overrides of a start request, validated.
+
+    Raises:
+        ValueError: If a parameter is not a number or the EMA windows are out of range.
+    """
+    from core.indicators import KLINE_LIMIT
+    params = {}
+    for name, kind in STRATEGY_PARAMS.items():
+        if spec.get(name) is None:
+            continue
+        try:
+            params[name] = kind(spec[name])
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+    short_window = params.get("short_window", 5)
+    long_window = params.get("long_window", 20)
+    if not 2 <= short_window < long_window <= KLINE_LIMIT:
+        raise ValueError(f"EMA windows must satisfy 2 <= short_window < long_window <= {KLINE_LIMIT}")
+    return params
@@ -0,0 +1,190 @@
+"""
+Higher-interval klines resampled locally from one 1m stream per symbol.
+
+Every interval from 3m to 1d is a whole number of minutes aligned to UTC
+epoch boundaries, so its bars can be built from 1m candles. Each symbol keeps
+its recent 1m candles and, per interval in use, a bounded history of closed
+bars plus the partial current bar. Each new 1m candle updates every interval in
+O(1): extend the partial bar, and close it on the bucket's last minute. Each
+interval is backfilled from REST once, when it is first requested. After that,
+every bot on the symbol, whatever its interval, is served from one incremental
+1m fetch per candle close.
+
+Intervals that cannot be derived from 1m candles (1s, 3d, 1w, 1M) and requests
+for more history than is kept go straight to REST.
+"""
+import collections
+import os
+import threading
+from config.bot_config import binance_client
+from core.market_data import fetch_closed_klines
+from core.scheduler import scheduler, interval_seconds
+
+MINUTE_MS = 60000
+BINANCE_KLINE_LIMIT = 1000
+
+# 1m candles kept per symbol; one day covers the partial bar of every resampled interval
+MINUTE_HISTORY = 1440
+# Closed bars kept per resampled interval
+BAR_HISTORY = 500
+
+RESAMPLING_ENABLED = os.getenv("TRENDR_RESAMPLE", "1") != "0"
+
+
+def resampled(interval):
+    """True when `interval` bars are built from the 1m stream."""
+    seconds = interval_seconds(interval)
+    return seconds % 60 == 0 and 60 <= seconds <= 86400
+
+
+def normalize_kline(kline):
+    """
+    Converts a REST kline to [open time, open, high, low, close, volume, close time,
+    quote volume, trades, taker base volume, taker quote volume, "0"] with numbers.
+    """
+    kline = list(kline) + [0] * (12 - len(kline))
+    return [
+        int(kline[0]), float(kline[1]), float(kline[2]), float(kline[3]), float(kline[4]), float(kline[5]),
+        int(kline[6]), float(kline[7]), int(kline[8]), float(kline[9]), float(kline[10]), "0",
+    ]
+
+
+class IntervalBars:
+    """Closed bars and the partial current bar of one interval."""
+    def __init__(self, interval):
+        self.interval = interval
+        self.step_ms = interval_seconds(interval) * 1000
+        self.closed = collections.deque(maxlen=BAR_HISTORY)
+        self.partial = None
+
+    def add_minute(self, minute):
+        open_time = minute[0] - minute[0] % self.step_ms
+        partial = self.partial
+        if partial is not None and partial[0] != open_time:
+            # The bucket's last minute never arrived; the bar is complete anyway
+            self.closed.append(partial)
+            partial = None
+        if partial is None:
+            partial = self.partial = [
+                open_time, minute[1], minute[2], minute[3], minute[4], minute[5],
+                open_time + self.step_ms - 1, minute[7], minute[8], minute[9], minute[10], "0",
+            ]
+        else:
+            partial[2] = max(partial[2], minute[2])
+            partial[3] = min(partial[3], minute[3])
+            partial[4] = minute[4]
+            partial[5] += minute[5]
+            partial[7] += minute[7]
+            partial[8] += minute[8]
+            partial[9] += minute[9]
+            partial[10] += minute[10]
+        if minute[6] >= partial[6]:
+            self.closed.append(partial)
+            self.partial = None
+
+
+class SymbolCandles:
+    """The 1m stream of one symbol and the intervals resampled from it."""
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.minutes = collections.deque(maxlen=MINUTE_HISTORY)
+        self.cursor = None  # Open time (ms) of the next 1m candle to ingest
+        self.intervals = {}
+        self.lock = threading.Lock()
+
+
+class CandleAggregator:
+    """
+    Serves closed klines of any resampled interval from one 1m stream per symbol.
+    """
+    def __init__(self, client=binance_client, fetch_klines=fetch_closed_klines):
+        self.client = client
+        self.fetch_klines = fetch_klines
+        self.symbols = {}
+        self.lock = threading.Lock()
+        self.minute_requests = 0  # REST calls made for the 1m streams, for monitoring
+
+    def _symbol(self, symbol):
+        with self.lock:
+            state = self.symbols.get(symbol)
+            if state is None:
+                state = self.symbols[symbol] = SymbolCandles(symbol)
+            return state
+
+    def _sync(self, state):
+        """
+        Ingests every 1m candle closed since the last sync. A new symbol, or one
+        that fell more than MINUTE_HISTORY behind, is reloaded from a day back.
+        """
+        now_ms = scheduler.server_time_ms()
+        if state.cursor is None or now_ms - state.cursor > MINUTE_HISTORY * MINUTE_MS:
+            state.minutes.clear()
+            state.intervals.clear()
+            state.cursor = now_ms - now_ms % MINUTE_MS - MINUTE_HISTORY * MINUTE_MS
+        while state.cursor + MINUTE_MS <= now_ms:
+            klines = self.client.get_klines(symbol=state.symbol, interval="1m", startTime=state.cursor, limit=BINANCE_KLINE_LIMIT)
+            self.minute_requests += 1
+            closed = [normalize_kline(kline) for kline in klines if kline[6] < now_ms]
+            for minute in closed:
+                if minute[0] < state.cursor:
+                    continue
+                state.minutes.append(minute)
+                for bars in state.intervals.values():
+                    bars.add_minute(minute)
+                state.cursor = minute[0] + MINUTE_MS
+            if not closed or len(klines) < BINANCE_KLINE_LIMIT:
+                break
+
+    def _bars(self, state, interval):
+        bars = state.intervals.get(interval)
+        if bars is None:
+            bars = state.intervals[interval] = IntervalBars(interval)
+            # Closed bars come from REST, up to the last one whose minutes were all ingested;
+            # the bars after it (including the partial one) are rebuilt from the local 1m candles
+            backfill = [normalize_kline(kline) for kline in self.fetch_klines(state.symbol, interval, BAR_HISTORY)]
+            bars.closed.extend(bar for bar in backfill if bar[6] < state.cursor)
+            first_minute = state.minutes[0][0] if state.minutes else state.cursor
+            start = first_minute - first_minute % bars.step_ms
+            if start < first_minute:
+                start += bars.step_ms
+            if bars.closed:
+                start = max(start, bars.closed[-1][0] + bars.step_ms)
+            for minute in state.minutes:
+                if minute[0] >= start:
+                    bars.add_minute(minute)
+        return bars
+
+    def get_closed_klines(self, symbol, interval, limit):
+        """
+        Returns the last `limit` closed klines of `interval`, like fetch_closed_klines.
+        """
+        if not resampled(interval) or limit > (MINUTE_HISTORY if interval == "1m" else BAR_HISTORY):
+            return self.fetch_klines(symbol, interval, limit)
+        state = self._symbol(symbol)
+        with state.lock:
+            self._sync(state)
+            if interval == "1m":
+                klines = state.minutes
+            else:
+                klines = self._bars(state, interval).closed
+            return list(klines)[-limit:]
+
+    def current_bar(self, symbol, interval):
+        """The partial bar of `interval` as of the last ingested 1m candle, or None."""
+        state = self._symbol(symbol)
+        with state.lock:
+            bars = state.intervals.get(interval)
+            return list(bars.partial) if bars and bars.partial else None
+
+
+candle_aggregator = CandleAggregator()
+
+
+def get_closed_klines(symbol, interval, limit):
+    """
+    Fetches the last `limit` closed klines, resampled from the symbol's 1m stream
+    where possible (TRENDR_RESAMPLE=0 fetches every interval from REST).
+    """
+    if RESAMPLING_ENABLED:
+        return candle_aggregator.get_closed_klines(symbol, interval, limit)
+    return fetch_closed_klines(symbol, interval, limit)
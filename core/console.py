@@ -0,0 +1,198 @@
+import json
+import queue
+import sys
+import threading
+import time
+from config.bot_config import COLORS
+
+# Console log levels
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARN: "WARN", ERROR: "ERROR"}
+LEVELS = {"debug": DEBUG, "info": INFO, "warn": WARN, "warning": WARN, "error": ERROR}
+
+# Line color used when a record does not ask for one
+LEVEL_COLORS = {WARN: "hold", ERROR: "error"}
+
+
+def parse_level(level):
+    """
+    Converts a level name ("debug", "info", "warn", "error") or number to a level number.
+    """
+    if isinstance(level, int):
+        return level
+    try:
+        return LEVELS[str(level).lower()]
+    except KeyError:
+        raise ValueError(f"Invalid log level: {level}. Use one of {', '.join(LEVELS)}.")
+
+
+class ConsoleWriter:
+    """
+    Renders console log records on a single background thread.
+
+    Records are enqueued as unformatted tuples by the bot threads; the writer
+    drains the queue in batches, formats each record (colorized text or JSON
+    lines) and writes the whole batch with one call, so output from different
+    bots never interleaves mid-line.
+    """
+    def __init__(self, stream=None, fmt="color", batch_size=256):
+        self.stream = stream
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="console-writer", daemon=True)
+                self.thread.start()
+
+    def enqueue(self, record):
+        if self.thread is None:
+            self.start()
+        self.queue.put(record)
+
+    def flush(self, timeout=None):
+        """
+        Blocks until every record enqueued so far has been written. Returns False on timeout.
+        """
+        if self.thread is None:
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            markers = [record for record in batch if isinstance(record, threading.Event)]
+            records = [record for record in batch if not isinstance(record, threading.Event)]
+            try:
+                stream = self.stream or sys.stdout
+                stream.write("".join(self.render(record) for record in records))
+                stream.flush()
+            except Exception:
+                pass  # Console output must never take down the writer
+            for marker in markers:
+                marker.set()
+
+    def render(self, record):
+        timestamp, level, bot_name, message, args, color, fields = record
+        try:
+            text = message % args if args else str(message)
+        except Exception:
+            text = f"{message!r} % {args!r}"
+
+        if self.fmt == "json":
+            from core.logger import CustomJSONEncoder
+            entry = {
+                "ts": timestamp,
+                "level": LEVEL_NAMES.get(level, str(level)),
+                "bot": bot_name,
+                "msg": text,
+            }
+            entry.update(fields)
+            try:
+                return json.dumps(entry, cls=CustomJSONEncoder) + "\n"
+            except TypeError:
+                return json.dumps(entry, default=str) + "\n"
+
+        clock = time.strftime("%H:%M:%S", time.localtime(timestamp))
+        prefix = f"{clock} {COLORS['botname']}{bot_name}{COLORS['reset']} " if bot_name else f"{clock} "
+        color = color or LEVEL_COLORS.get(level)
+        if color in COLORS:
+            text = f"{COLORS[color]}{text}{COLORS['reset']}"
+        return f"{prefix}{text}\n"
+
+
+_writer = ConsoleWriter()
+_default_level = INFO
+_bot_levels = {}
+
+
+def log(bot_name, level, message, *args, color=None, **fields):
+    """
+    Queues a console log record for `bot_name` (None for process-wide messages).
+
+    The level check happens before anything else, and `message % args` is only
+    evaluated on the writer thread, so disabled levels cost one dict lookup.
+
+    Args:
+        bot_name (str): The bot the record belongs to.
+        level (int): DEBUG, INFO, WARN or ERROR.
+        message (str): %-style format string.
+        *args: Values for the format string.
+        color (str): Optional key in COLORS for the whole line.
+        **fields: Extra structured fields (included in JSON output).
+    """
+    if level < _bot_levels.get(bot_name, _default_level):
+        return
+    _writer.enqueue((time.time(), level, bot_name, message, args, color, fields))
+
+
+def debug(bot_name, message, *args, **kwargs):
+    log(bot_name, DEBUG, message, *args, **kwargs)
+
+
+def info(bot_name, message, *args, **kwargs):
+    log(bot_name, INFO, message, *args, **kwargs)
+
+
+def warn(bot_name, message, *args, **kwargs):
+    log(bot_name, WARN, message, *args, **kwargs)
+
+
+def error(bot_name, message, *args, **kwargs):
+    log(bot_name, ERROR, message, *args, **kwargs)
+
+
+def is_enabled(bot_name, level):
+    return level >= _bot_levels.get(bot_name, _default_level)
+
+
+def set_level(level, bot_name=None):
+    """
+    Sets the console level for one bot, or the default level when `bot_name` is None.
+    """
+    global _default_level
+    level = parse_level(level)
+    if bot_name is None:
+        _default_level = level
+    else:
+        _bot_levels[bot_name] = level
+    return level
+
+
+def get_level(bot_name=None):
+    return _bot_levels.get(bot_name, _default_level)
+
+
+def clear_level(bot_name):
+    """Drops a bot's level override (called when the bot is removed)."""
+    _bot_levels.pop(bot_name, None)
+
+
+def set_format(fmt):
+    """Switches console output between "color" and "json" lines."""
+    if fmt not in {"color", "json"}:
+        raise ValueError(f"Invalid console format: {fmt}. Use 'color' or 'json'.")
+    _writer.fmt = fmt
+
+
+def get_format():
+    return _writer.fmt
+
+
+def flush(timeout=None):
+    return _writer.flush(timeout)
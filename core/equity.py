@@ -0,0 +1,119 @@
+import os
+import threading
+from core.utils import lazy_import
+
+np = lazy_import("numpy")
+
+# Samples kept per bot; the oldest are overwritten once the ring is full
+EQUITY_CAPACITY = int(os.getenv("TRENDR_EQUITY_CAPACITY", "4096"))
+DEFAULT_POINTS = 500
+
+COLUMNS = ["timestamp", "price", "base_quantity", "quote_quantity", "equity"]
+
+# bot_name -> EquityRing for every bot running in this process
+equity_curves = {}
+equity_curves_lock = threading.Lock()
+
+
+class EquityRing:
+    """
+    Fixed-capacity ring of (timestamp, price, base qty, quote qty, equity) rows.
+
+    Backed by one preallocated float64 array, so a bot's history costs
+    capacity * 40 bytes no matter how long it runs.
+    """
+    def __init__(self, capacity=EQUITY_CAPACITY):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, len(COLUMNS)))
+        self.count = 0  # Total rows ever written
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, price, base_quantity, quote_quantity, equity):
+        with self.lock:
+            self.data[self.count % self.capacity] = (timestamp, price, base_quantity, quote_quantity, equity)
+            self.count += 1
+
+    def snapshot(self):
+        """
+        Returns a copy of the stored rows, oldest first.
+        """
+        with self.lock:
+            if self.count <= self.capacity:
+                return self.data[:self.count].copy()
+            start = self.count % self.capacity
+            return np.concatenate((self.data[start:], self.data[:start]))
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Parameters:
+        x (ndarray): Increasing x values (timestamps).
+        y (ndarray): Values to preserve the visual shape of.
+        threshold (int): Number of points to keep.
+
+    Returns:
+        ndarray: Indices of the selected points, first and last always included.
+    """
+    length = len(x)
+    if threshold >= length:
+        return np.arange(length)
+    if threshold < 3:
+        return np.array([0, length - 1][:max(threshold, 0)], dtype=int)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = length - 1
+    # Bucket edges over the points between the first and the last one
+    edges = np.linspace(1, length - 1, threshold - 1).astype(int)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else length
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+        # Pick the point forming the largest triangle with the previous pick and the next average
+        areas = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def get_curve(bot_name, create=False):
+    with equity_curves_lock:
+        curve = equity_curves.get(bot_name)
+        if curve is None and create:
+            curve = equity_curves[bot_name] = EquityRing()
+        return curve
+
+
+def record_equity(bot_name, timestamp, price, base_quantity, quote_quantity, equity):
+    """Appends one sample to the bot's equity curve."""
+    get_curve(bot_name, create=True).append(timestamp, float(price), float(base_quantity), float(quote_quantity), float(equity))
+
+
+def drop_curve(bot_name):
+    with equity_curves_lock:
+        equity_curves.pop(bot_name, None)
+
+
+def equity_series(bot_name, points=DEFAULT_POINTS):
+    """
+    Returns the bot's equity curve downsampled to at most `points` rows (as
+    lists in COLUMNS order), or None when the bot has no curve.
+    """
+    curve = get_curve(bot_name)
+    if curve is None:
+        return None
+    rows = curve.snapshot()
+    if len(rows):
+        rows = rows[lttb(rows[:, 0], rows[:, 4], points)]
+    return rows.tolist()
@@ -0,0 +1,201 @@
+import os
+import threading
+from decimal import Decimal
+from config.bot_config import binance_client
+from core import console
+from core.utils import get_notional_limit, get_quantity_precision
+
+BUY = "BUY"
+SELL = "SELL"
+
+# Orders for the same symbol submitted within this many seconds are netted (0 disables batching)
+NETTING_WINDOW_SECONDS = float(os.getenv("TRENDR_NETTING_WINDOW", "0.2"))
+FILL_TIMEOUT_SECONDS = 30
+
+
+class Fill:
+    """
+    A bot's share of a netted batch.
+
+    Attributes:
+        quantity (Decimal): Base quantity filled for the bot.
+        price (Decimal): Average execution price of the batch.
+        exchange_quantity (Decimal): Part of `quantity` that went through the exchange
+            (the rest was crossed internally against opposing bots and pays no fee).
+        order (dict): Exchange order response, or a synthetic one for fully netted batches.
+    """
+    def __init__(self, quantity, price, exchange_quantity, order):
+        self.quantity = quantity
+        self.price = price
+        self.exchange_quantity = exchange_quantity
+        self.order = order
+
+
+class PendingOrder:
+    def __init__(self, bot_name, side, quantity):
+        self.bot_name = bot_name
+        self.side = side
+        self.quantity = quantity
+        self.done = threading.Event()
+        self.fill = None
+        self.error = None
+
+
+class OrderAggregator:
+    """
+    Nets market orders from bots trading the same symbol.
+
+    The first order for a symbol opens a batching window; every order submitted
+    for that symbol before it closes joins the batch. Opposing quantities are
+    crossed internally at the batch price, one market order is sent for the
+    residual, and the exchange fill is allocated back to the bots on the
+    residual side pro rata. If that order fails, the crossed quantities are
+    still filled and only bots left with nothing get the exchange error.
+    """
+    def __init__(self, client=binance_client, window=NETTING_WINDOW_SECONDS):
+        self.client = client
+        self.window = window
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def submit(self, symbol, side, quantity, reference_price, bot_name=None):
+        """
+        Queues a market order and blocks until its batch has executed.
+
+        An order still queued after FILL_TIMEOUT_SECONDS is withdrawn from its batch
+        and raises TimeoutError. Once its batch is executing the exchange order may
+        fill at any moment, so the call waits for the outcome however long it takes.
+
+        Args:
+            symbol (str): Market pair, e.g. "BTCUSDT".
+            side (str): BUY or SELL.
+            quantity (Decimal): Base quantity, already adjusted to the lot size.
+            reference_price (Decimal): Last known price, used for internal crosses when
+                nothing is sent to the exchange.
+            bot_name (str): Submitting bot, for logging.
+
+        Returns:
+            Fill: The bot's share of the executed batch.
+        """
+        order = PendingOrder(bot_name, side, quantity)
+        with self._lock:
+            batch = self._batches.get(symbol)
+            if batch is None:
+                batch = self._batches[symbol] = {"orders": [], "price": reference_price}
+                if self.window > 0:
+                    timer = threading.Timer(self.window, self._execute, args=(symbol,))
+                    timer.daemon = True
+                    timer.start()
+            batch["orders"].append(order)
+            batch["price"] = reference_price
+        if self.window <= 0:
+            self._execute(symbol)
+        if not order.done.wait(FILL_TIMEOUT_SECONDS):
+            with self._lock:
+                batch = self._batches.get(symbol)
+                queued = batch is not None and order in batch["orders"]
+                if queued:
+                    batch["orders"].remove(order)
+                    if not batch["orders"]:
+                        del self._batches[symbol]
+            if queued:
+                raise TimeoutError(f"Timed out waiting for {side} {symbol} batch to execute")
+            order.done.wait()
+        if order.error:
+            raise order.error
+        return order.fill
+
+    def _execute(self, symbol):
+        with self._lock:
+            batch = self._batches.pop(symbol, None)
+        if not batch:
+            return
+        orders = batch["orders"]
+        try:
+            self._settle(symbol, orders, batch["price"])
+        except Exception as e:
+            for order in orders:
+                order.error = e
+        finally:
+            for order in orders:
+                order.done.set()
+
+    def _settle(self, symbol, orders, reference_price):
+        buys = [order for order in orders if order.side == BUY]
+        sells = [order for order in orders if order.side == SELL]
+        buy_total = sum((order.quantity for order in buys), Decimal('0'))
+        sell_total = sum((order.quantity for order in sells), Decimal('0'))
+        residual = buy_total - sell_total
+        side = BUY if residual > 0 else SELL
+        majority, minority = (buys, sells) if side == BUY else (sells, buys)
+        crossed = min(buy_total, sell_total)
+
+        min_qty, step_size = get_quantity_precision(symbol)
+        residual = abs(residual)
+        residual -= residual % step_size
+
+        exchange_order = None
+        exchange_error = None
+        executed = Decimal('0')
+        price = reference_price
+        if residual > 0 and residual * reference_price >= get_notional_limit(symbol):
+            try:
+                if side == BUY:
+                    exchange_order = self.client.order_market_buy(symbol=symbol, quantity=f"{residual:.8f}")
+                else:
+                    exchange_order = self.client.order_market_sell(symbol=symbol, quantity=f"{residual:.8f}")
+                executed, price = execution_summary(exchange_order, residual, reference_price)
+            except Exception as e:
+                # Only the residual depended on the exchange: the crossed quantities still fill
+                exchange_error = e
+                if crossed > 0:
+                    console.warn(None, "Netted %s %s order for %s failed, filling the %s crossed internally only: %s", side, symbol, residual, crossed, e)
+        elif residual > 0:
+            console.warn(None, "Netted %s %s residual %s is below the minimum notional; crossing internally only", side, symbol, residual)
+
+        if len(orders) > 1:
+            console.info(None, "Netted %s orders on %s: %s crossed internally, %s %s sent to the exchange", len(orders), symbol, crossed, side, executed)
+
+        synthetic = {"symbol": symbol, "status": "FILLED", "netted": True, "price": str(price)}
+
+        # The minority side is fully crossed against the majority side
+        for order in minority:
+            order.fill = Fill(order.quantity, price, Decimal('0'), exchange_order or dict(synthetic, side=order.side, executedQty=str(order.quantity)))
+
+        # The majority side shares the crossed quantity plus whatever the exchange filled, pro rata
+        majority_total = buy_total if side == BUY else sell_total
+        available = crossed + executed
+        allocated = Decimal('0')
+        allocated_exchange = Decimal('0')
+        for index, order in enumerate(majority):
+            if index == len(majority) - 1:
+                quantity = available - allocated
+                exchange_quantity = executed - allocated_exchange
+            else:
+                share = order.quantity / majority_total if majority_total else Decimal('0')
+                quantity = available * share
+                quantity -= quantity % step_size
+                exchange_quantity = executed * share
+                exchange_quantity -= exchange_quantity % step_size
+            quantity = min(quantity, order.quantity)
+            allocated += quantity
+            allocated_exchange += exchange_quantity
+            if exchange_error is not None and quantity <= 0:
+                order.error = exchange_error
+                continue
+            order.fill = Fill(quantity, price, exchange_quantity, exchange_order or dict(synthetic, side=order.side, executedQty=str(quantity)))
+
+
+def execution_summary(order, requested_quantity, reference_price):
+    """
+    Returns (executed quantity, average price) from a market order response,
+    falling back to the request when the response carries no fill details.
+    """
+    executed = Decimal(str(order.get("executedQty", requested_quantity))) if isinstance(order, dict) else requested_quantity
+    quote = order.get("cummulativeQuoteQty") if isinstance(order, dict) else None
+    if executed > 0 and quote is not None and Decimal(str(quote)) > 0:
+        return executed, Decimal(str(quote)) / executed
+    return executed, reference_price
+
+
+aggregator = OrderAggregator()
@@ -0,0 +1,159 @@
+import collections
+import threading
+from core.candles import get_closed_klines
+from core.utils import lazy_import
+from core import kernels
+from strategies.ema_strategy import calculate_ema
+
+np = lazy_import("numpy")
+
+# Number of closed klines every source node keeps
+KLINE_LIMIT = 50
+
+IndicatorKey = collections.namedtuple("IndicatorKey", ["symbol", "interval", "indicator", "params"])
+
+
+def indicator_key(symbol, interval, indicator, **params):
+    """
+    Builds a hashable key for an indicator instance, e.g.
+    indicator_key("BTCUSDT", "1h", "ema", window=5).
+    """
+    return IndicatorKey(symbol, interval, indicator, tuple(sorted(params.items())))
+
+
+def atr_from_klines(klines, window):
+    """
+    Average True Range series (NaN until the window is full) from raw klines.
+    """
+    highs = np.array([float(kline[2]) for kline in klines])
+    lows = np.array([float(kline[3]) for kline in klines])
+    closes = np.array([float(kline[4]) for kline in klines])
+
+    # Calculate True Range (TR)
+    tr = np.maximum(
+        highs - lows,
+        np.maximum(
+            abs(highs - np.roll(closes, shift=1)),  # Use np.roll to shift the closes array
+            abs(lows - np.roll(closes, shift=1))
+        )
+    )
+
+    # The first TR value is undefined due to lack of a previous close, set it to 0
+    tr[0] = 0
+
+    # Calculate Average True Range (ATR) using rolling window (NaN until the window is full)
+    atr = np.full(len(tr), np.nan)
+    if len(tr) >= window:
+        atr[window - 1:] = np.convolve(tr, np.ones(window) / window, mode='valid')
+    return atr
+
+
+# Indicator name -> function(source, **params), where source holds the node's
+# "klines" and the "close" prices derived from them once
+INDICATORS = {
+    "close": lambda source: source["close"],
+    "ema": lambda source, window: calculate_ema(source["close"], window),
+    "atr": lambda source, window: atr_from_klines(source["klines"], window)[-1],
+    "rsi": lambda source, window: kernels.wilder_rsi(kernels.as_array(source["close"]), window)[-1],
+    "sar": lambda source, step=0.02, max_step=0.2: kernels.parabolic_sar(
+        kernels.as_array([float(kline[2]) for kline in source["klines"]]),
+        kernels.as_array([float(kline[3]) for kline in source["klines"]]),
+        step, max_step,
+    )[-1],
+}
+
+
+class IndicatorEngine:
+    """
+    Deduplicated indicator graph shared by every bot in the process.
+
+    Bots subscribe with the IndicatorKeys their strategy needs. Keys with the
+    same (symbol, interval) hang off one kline source node; each node is
+    computed once per candle close, by whichever subscribed bot asks first, and
+    every other bot reads the memoized value. Cost and memory follow the number
+    of unique indicator instances, not the number of bots.
+    """
+    def __init__(self, fetch_klines=get_closed_klines):
+        self.fetch_klines = fetch_klines
+        self._refcounts = collections.Counter()
+        self._subscriptions = {}
+        self._values = {}  # node key -> (close_time, value)
+        self._source_locks = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, bot_name, keys):
+        keys = [IndicatorKey(*key) for key in keys]
+        for key in keys:
+            if key.indicator not in INDICATORS:
+                raise ValueError(f"Unknown indicator: {key.indicator}")
+        with self._lock:
+            self.unsubscribe(bot_name, locked=True)
+            self._subscriptions[bot_name] = keys
+            for key in keys:
+                self._refcounts[key] += 1
+                self._source_locks.setdefault((key.symbol, key.interval), threading.Lock())
+
+    def unsubscribe(self, bot_name, locked=False):
+        if not locked:
+            with self._lock:
+                return self.unsubscribe(bot_name, locked=True)
+        for key in self._subscriptions.pop(bot_name, []):
+            self._refcounts[key] -= 1
+            if self._refcounts[key] <= 0:
+                del self._refcounts[key]
+                self._values.pop(key, None)
+        live_sources = {(key.symbol, key.interval) for key in self._refcounts}
+        for source in list(self._source_locks):
+            if source not in live_sources:
+                self._source_locks.pop(source, None)
+                self._values.pop(source, None)
+
+    def nodes(self):
+        """Unique indicator instances currently subscribed."""
+        return list(self._refcounts)
+
+    def evaluate(self, keys, close_time):
+        """
+        Returns {key: value} for `keys` as of the candle that closed at `close_time`.
+        """
+        results = {}
+        for key in keys:
+            key = IndicatorKey(*key)
+            cached = self._values.get(key)
+            if cached and cached[0] == close_time:
+                results[key] = cached[1]
+                continue
+            results[key] = self._compute_source(key.symbol, key.interval, close_time, key)[key]
+        return results
+
+    def _compute_source(self, symbol, interval, close_time, requested):
+        """
+        Fetches the klines of one source node and computes every subscribed
+        indicator hanging off it, once per close.
+        """
+        source = (symbol, interval)
+        lock = self._source_locks.get(source) or threading.Lock()
+        with lock:
+            with self._lock:
+                keys = {key for key in self._refcounts if (key.symbol, key.interval) == source}
+            keys.add(IndicatorKey(*requested))
+            cached = self._values.get(source)
+            if cached and cached[0] == close_time:
+                data = cached[1]
+            else:
+                klines = self.fetch_klines(symbol, interval, KLINE_LIMIT)
+                data = {"klines": klines, "close": [float(kline[4]) for kline in klines]}
+                self._values[source] = (close_time, data)
+            values = {}
+            for key in keys:
+                cached = self._values.get(key)
+                if cached and cached[0] == close_time:
+                    values[key] = cached[1]
+                    continue
+                value = INDICATORS[key.indicator](data, **dict(key.params))
+                self._values[key] = (close_time, value)
+                values[key] = value
+            return values
+
+
+indicator_engine = IndicatorEngine()
@@ -0,0 +1,300 @@
+"""
+Loop kernels for recursive indicators and backtests.
+
+These are written as plain loops over float64 arrays in the subset of Python
+that Numba compiles. When Numba is installed each kernel is compiled on first
+call (with the machine code cached on disk, so later processes skip the
+compile); otherwise the same function runs as ordinary Python, or a NumPy
+equivalent where one exists. Set TRENDR_JIT=0 to force the fallbacks.
+"""
+import importlib
+import importlib.util
+import os
+import threading
+from core import console
+from core.utils import lazy_import
+
+np = lazy_import("numpy")
+
+JIT_ENABLED = os.getenv("TRENDR_JIT", "1") != "0"
+
+# Backtest actions
+HOLD = 0
+BUY = 1
+SELL = -1
+
+
+def jit_available():
+    return JIT_ENABLED and importlib.util.find_spec("numba") is not None
+
+
+class Kernel:
+    """
+    A loop function that is compiled with Numba on first call when possible.
+
+    Attributes:
+        py_func (function): The kernel as plain Python.
+        fallback (function): What runs without Numba (py_func unless a NumPy version is given).
+    """
+    def __init__(self, py_func, fallback=None):
+        self.py_func = py_func
+        self.fallback = fallback or py_func
+        self.__name__ = py_func.__name__
+        self.__doc__ = py_func.__doc__
+        self._implementation = None
+        self._compile_errors = ()
+        self._lock = threading.Lock()
+
+    @property
+    def jitted(self):
+        return self.implementation() is not self.fallback
+
+    def implementation(self):
+        if self._implementation is None:
+            with self._lock:
+                if self._implementation is None:
+                    implementation = self.fallback
+                    if jit_available():
+                        import numba
+                        from numba.core.errors import NumbaError
+
+                        # Numba cannot type the lazy stand-in, so the kernels' globals get the real module
+                        self.py_func.__globals__["np"] = importlib.import_module("numpy")
+                        try:
+                            implementation = numba.njit(cache=True, nogil=True)(self.py_func)
+                            self._compile_errors = NumbaError
+                        except Exception as e:
+                            console.warn(None, "Could not compile %s, using the uncompiled version: %s", self.__name__, e)
+                    self._implementation = implementation
+        return self._implementation
+
+    def __call__(self, *args):
+        implementation = self.implementation()
+        if implementation is self.fallback:
+            return implementation(*args)
+        try:
+            return implementation(*args)
+        except self._compile_errors as e:
+            # Numba compiles on the first call for each argument types
+            console.warn(None, "Could not compile %s, using the uncompiled version: %s", self.__name__, e)
+            self._implementation = self.fallback
+            return self.fallback(*args)
+
+
+def kernel(fallback=None):
+    """Decorator turning a loop function into a Kernel."""
+    def wrap(py_func):
+        return Kernel(py_func, fallback)
+    return wrap
+
+
+def as_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+# ---- Indicators ----
+
+def _weighted_ma_numpy(prices, window):
+    weights = np.exp(np.linspace(-1., 0., window))
+    weights /= weights.sum()
+    out = np.full(len(prices), np.nan)
+    if len(prices) >= window:
+        out[window - 1:] = np.convolve(prices, weights, mode='valid')
+    return out
+
+
+@kernel(fallback=_weighted_ma_numpy)
+def weighted_ma(prices, window):
+    """
+    Exponentially weighted moving average series, matching calculate_ema in
+    strategies/ema_strategy.py (NaN until the window is full).
+    """
+    n = len(prices)
+    out = np.full(n, np.nan)
+    weights = np.exp(np.linspace(-1., 0., window))
+    weights /= weights.sum()
+    for i in range(window - 1, n):
+        total = 0.0
+        # np.convolve flips the kernel: the newest price gets weights[0]
+        for j in range(window):
+            total += prices[i - j] * weights[j]
+        out[i] = total
+    return out
+
+
+@kernel()
+def ema(prices, window):
+    """
+    Recursive EMA series with alpha = 2 / (window + 1), seeded with the SMA of
+    the first `window` prices (NaN before that).
+    """
+    n = len(prices)
+    out = np.full(n, np.nan)
+    if n < window:
+        return out
+    alpha = 2.0 / (window + 1)
+    value = 0.0
+    for i in range(window):
+        value += prices[i]
+    value /= window
+    out[window - 1] = value
+    for i in range(window, n):
+        value += alpha * (prices[i] - value)
+        out[i] = value
+    return out
+
+
+@kernel()
+def wilder_rsi(prices, window):
+    """
+    Wilder RSI series. The first value (at index `window`) uses simple average
+    gains and losses, like calculate_rsi; later values use Wilder smoothing.
+    """
+    n = len(prices)
+    out = np.full(n, np.nan)
+    if n < window + 1:
+        return out
+    gain = 0.0
+    loss = 0.0
+    for i in range(1, window + 1):
+        delta = prices[i] - prices[i - 1]
+        if delta > 0:
+            gain += delta
+        else:
+            loss -= delta
+    gain /= window
+    loss /= window
+    for i in range(window, n):
+        if i > window:
+            delta = prices[i] - prices[i - 1]
+            gain = (gain * (window - 1) + (delta if delta > 0 else 0.0)) / window
+            loss = (loss * (window - 1) + (-delta if delta < 0 else 0.0)) / window
+        if loss == 0:
+            out[i] = 100.0 if gain > 0 else 0.0
+        else:
+            out[i] = 100.0 - 100.0 / (1.0 + gain / loss)
+    return out
+
+
+@kernel()
+def wilder_atr(highs, lows, closes, window):
+    """
+    Wilder ATR series. The first value (at index `window`) is the mean true
+    range of candles 1..window, like calculate_atr; later values use Wilder smoothing.
+    """
+    n = len(closes)
+    out = np.full(n, np.nan)
+    if n < window + 1:
+        return out
+    value = 0.0
+    for i in range(1, n):
+        true_range = max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1]))
+        if i <= window:
+            value += true_range
+            if i == window:
+                value /= window
+                out[i] = value
+        else:
+            value = (value * (window - 1) + true_range) / window
+            out[i] = value
+    return out
+
+
+@kernel()
+def parabolic_sar(highs, lows, step, max_step):
+    """
+    Full Parabolic SAR series (Wilder), starting in an uptrend on the second candle.
+    """
+    n = len(highs)
+    out = np.full(n, np.nan)
+    if n < 2:
+        return out
+    rising = True
+    acceleration = step
+    extreme = highs[0]
+    sar = lows[0]
+    for i in range(1, n):
+        sar = sar + acceleration * (extreme - sar)
+        if rising:
+            # SAR may not move above the previous two lows
+            sar = min(sar, lows[i - 1], lows[i - 2] if i > 1 else lows[i - 1])
+            if lows[i] < sar:
+                rising = False
+                sar = extreme
+                extreme = lows[i]
+                acceleration = step
+            elif highs[i] > extreme:
+                extreme = highs[i]
+                acceleration = min(acceleration + step, max_step)
+        else:
+            sar = max(sar, highs[i - 1], highs[i - 2] if i > 1 else highs[i - 1])
+            if highs[i] > sar:
+                rising = True
+                sar = extreme
+                extreme = highs[i]
+                acceleration = step
+            elif lows[i] < extreme:
+                extreme = lows[i]
+                acceleration = min(acceleration + step, max_step)
+        out[i] = sar
+    return out
+
+
+# ---- Backtest ----
+
+@kernel()
+def ema_crossover_backtest(closes, short_ema, long_ema, base, quote, allocation, fee_rate, threshold):
+    """
+    Per-candle decision loop of the EMA crossover strategy (check_ema_threshold)
+    on float balances.
+
+    Parameters:
+        closes (ndarray): Close prices.
+        short_ema, long_ema (ndarray): Indicator series aligned with closes (NaN = not ready).
+        base, quote (float): Starting balances.
+        allocation (float): Percent of the quote balance spent per buy / of the
+            portfolio value sold per sell.
+        fee_rate (float): Taker fee as a fraction.
+        threshold (float): Crossover buffer in percent.
+
+    Returns:
+        tuple: (actions int8 array of BUY/SELL/HOLD, equity array in quote currency).
+    """
+    n = len(closes)
+    actions = np.zeros(n, dtype=np.int8)
+    equity = np.empty(n)
+    fraction = allocation / 100.0
+    for i in range(n):
+        price = closes[i]
+        short_value = short_ema[i]
+        long_value = long_ema[i]
+        if not (np.isnan(short_value) or np.isnan(long_value)):
+            if base > 0 and quote > 0 and short_value > long_value * (1 + threshold / 100):
+                cost = quote * fraction
+                base += cost / price
+                quote -= cost * (1 + fee_rate)
+                actions[i] = BUY
+            elif base > 0 and short_value < long_value * (1 - threshold / 100):
+                quantity = min((base * price + quote) * fraction / price, base)
+                base -= quantity
+                quote += quantity * price * (1 - fee_rate)
+                actions[i] = SELL
+        equity[i] = base * price + quote
+    return actions, equity
+
+
+KERNELS = [weighted_ma, ema, wilder_rsi, wilder_atr, parabolic_sar, ema_crossover_backtest]
+
+
+def warm_up():
+    """
+    Compiles (or loads from the on-disk cache) every kernel on a tiny input,
+    so the first real call does not pay for it.
+    """
+    data = np.linspace(1.0, 2.0, 32)
+    weighted_ma(data, 5)
+    ema(data, 5)
+    wilder_rsi(data, 5)
+    wilder_atr(data + 0.1, data - 0.1, data, 5)
+    parabolic_sar(data + 0.1, data - 0.1, 0.02, 0.2)
+    ema_crossover_backtest(data, ema(data, 3), ema(data, 5), 1.0, 1.0, 10.0, 0.001, 0.0)
@@ -0,0 +1,98 @@
+"""
+Stopping bots within a deadline.
+
+A stop marks a bot as not running and interrupts its candle clock, so its
+trading loop exits right away instead of at its next candle close (which may
+be hours off on a long interval). On its way out the loop sends its last state
+to the dashboard and drains its logger for up to TRENDR_LOG_DRAIN seconds.
+
+A bulk stop tells every bot to stop before it waits for any of them, then
+waits for all of them against one deadline (TRENDR_SHUTDOWN_SECONDS, default
+5), so stopping the whole fleet takes about as long as stopping one bot. Bots
+still busy at the deadline (e.g. inside an order request) are reported and
+exit on their own.
+"""
+import json
+import os
+import time
+from core.logger import CustomJSONEncoder
+
+# Longest a bulk stop waits for the bots' threads, logger drains included
+SHUTDOWN_SECONDS = float(os.getenv("TRENDR_SHUTDOWN_SECONDS", "5"))
+# Where shutdown writes the final state of the bots ("" to skip it)
+STATE_FILE = os.getenv("TRENDR_STATE_FILE", "trendr_state.json")
+
+# bot_name -> callable that wakes the bot's trading loop out of its candle wait
+wakers = {}
+
+
+def register(bot_name, wake):
+    wakers[bot_name] = wake
+
+
+def unregister(bot_name):
+    wakers.pop(bot_name, None)
+
+
+def request_stop(bot_name, bot_data):
+    """
+    Marks a bot as not running and wakes it; does not wait for it to exit.
+    """
+    bot_data["running"] = False
+    # A bot that registers its clock after this sees running == False before it waits
+    wake = wakers.get(bot_name)
+    if wake:
+        wake()
+
+
+def stop_bots(bots, timeout=SHUTDOWN_SECONDS):
+    """
+    Stops bots concurrently and waits for their threads against one deadline.
+
+    Parameters:
+        bots (dict): bot_name -> {"data": bot_data, "thread": Thread or None}.
+        timeout (float): Longest wait for all of them together.
+
+    Returns:
+        list: Names of the bots whose thread was still running at the deadline.
+    """
+    bots = dict(bots)
+    for bot_name, bot in bots.items():
+        request_stop(bot_name, bot["data"])
+
+    deadline = time.monotonic() + timeout
+    still_running = []
+    for bot_name, bot in bots.items():
+        thread = bot.get("thread")
+        if thread is None or not thread.is_alive():
+            continue  # Not started yet (it will see running == False) or already gone
+        thread.join(max(deadline - time.monotonic(), 0))
+        if thread.is_alive():
+            still_running.append(bot_name)
+    return still_running
+
+
+def save_state(states, path=STATE_FILE):
+    """
+    Writes the final state of stopped bots to `path`, replacing it atomically.
+
+    Parameters:
+        states (dict): bot_name -> bot_data.
+        path (str): JSON file to write; nothing is written if empty.
+
+    Returns:
+        str: The path written, or None.
+    """
+    if not path:
+        return None
+    from core.sharding import serializable_bot_data
+
+    document = {
+        "saved_at": time.time(),
+        "bots": {bot_name: serializable_bot_data(bot_data) for bot_name, bot_data in states.items()},
+    }
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as output:
+        json.dump(document, output, cls=CustomJSONEncoder)
+    os.replace(temporary, path)
+    return path
@@ -1,9 +1,21 @@
-import asyncio
-import websockets
 import json
+import os
 from datetime import datetime, timedelta
 from decimal import Decimal
 import threading
+from core.utils import lazy_import
+from core import console
+from core import wire
+
+asyncio = lazy_import("asyncio")
+websockets = lazy_import("websockets")
+
+# Dashboard websocket the bots' loggers report to
+DASHBOARD_URL = os.getenv("TRENDR_DASHBOARD_URL", "ws://localhost:8080")
+# Longest a stopping bot waits for its queued dashboard messages to be sent
+LOG_DRAIN_SECONDS = float(os.getenv("TRENDR_LOG_DRAIN", "2"))
+# Longest the closing handshake of a drained logger's connection may take
+CLOSE_SECONDS = 1
 
 # Global registry for loggers
 loggers = {}
@@ -16,7 +28,10 @@ class ThreadSafeLogger:
         self.websocket = None
         self.loop = loop
         self.connection_successful = False
+        self.subprotocol = None  # Framing negotiated with the server (None = legacy JSON text)
         self.reconnect_interval = reconnect_interval  # Interval to wait before reconnecting
+        self.worker = None  # log_worker task, ended by drain()
+        self.thread = None
 
     async def connect(self):
         """
@@ -24,61 +39,99 @@ class ThreadSafeLogger:
         """
         while not self.connection_successful:
             try:
-                print("Attempting to connect to WebSocket...")
-                self.websocket = await websockets.connect('ws://localhost:8080')
+                console.debug(self.bot_id, "Attempting to connect to WebSocket...")
+                self.websocket = await websockets.connect(DASHBOARD_URL, subprotocols=wire.SUBPROTOCOLS, compression="deflate")
+                self.subprotocol = self.websocket.subprotocol
                 self.connection_successful = True
-                print("WebSocket connection established.")
+                console.info(self.bot_id, "WebSocket connection established (%s framing).", self.subprotocol or "json")
             except Exception as e:
-                print(f"Failed to connect to WebSocket: {e}. Retrying in {self.reconnect_interval} seconds...")
+                console.warn(self.bot_id, "Failed to connect to WebSocket: %s. Retrying in %s seconds...", e, self.reconnect_interval)
                 await asyncio.sleep(self.reconnect_interval)
 
     async def log_worker(self):
         """
         Continuously process log messages and attempt to reconnect if necessary.
         """
+        await self.connect()  # The dashboard sees the bot as soon as it starts
         while True:
-            message = await self.queue.get()
+            frames = await self.queue.get()
             while True:  # Retry loop for sending the message
                 try:
                     await self.connect()  # Ensure a connection exists
                     if self.connection_successful:
-                        await self.websocket.send(json.dumps({"bot_id": self.bot_id, "log": message}))
+                        # The framing is only known once connected, and may change on a reconnect
+                        await self.websocket.send(frames[1] if self.subprotocol == wire.MSGPACK else frames[0])
                         break  # Exit the retry loop after a successful send
                 except websockets.ConnectionClosedError:
-                    print("WebSocket connection closed. Attempting to reconnect...")
+                    console.warn(self.bot_id, "WebSocket connection closed. Attempting to reconnect...")
                     self.connection_successful = False
                     await asyncio.sleep(self.reconnect_interval)  # Wait before retrying
                 except Exception as e:
-                    print(f"Failed to send log: {e}. Retrying...")
+                    console.warn(self.bot_id, "Failed to send log: %s. Retrying...", e)
                     await asyncio.sleep(self.reconnect_interval)  # Wait before retrying
                 # No `finally` block here; the message stays in the retry loop until sent
             self.queue.task_done()
 
+    def encode(self, message):
+        """
+        Serializes a message in the caller's thread, so later changes to
+        bot_data cannot race the send. It is encoded for both framings, since
+        the connection may not have negotiated one yet, or may reconnect to a
+        server that picks the other before the message is sent.
+
+        Returns:
+            tuple: (legacy JSON text frame, MessagePack binary frame).
+        """
+        return legacy_frame(self.bot_id, message), wire.encode(self.bot_id, message)
+
     def log(self, message):
         """
         Add a message to the log queue to be processed by the worker.
         """
-        asyncio.run_coroutine_threadsafe(self.queue.put(message), self.loop)
+        asyncio.run_coroutine_threadsafe(self.queue.put(self.encode(message)), self.loop)
 
-    async def close(self):
+    async def drain(self, timeout):
         """
-        Close the logger gracefully.
+        Waits up to `timeout` seconds for the queued messages to be sent, then
+        closes the connection and ends the worker.
+
+        Returns:
+            bool: False if messages were left unsent.
         """
-        await self.queue.join()  # Wait until all messages are processed
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+            drained = True
+        except asyncio.TimeoutError:
+            drained = False
+            console.warn(self.bot_id, "%s dashboard messages not sent within %ss, dropping them.", self.queue.qsize(), timeout)
         if self.websocket:
-            await self.websocket.close()
+            try:
+                await asyncio.wait_for(self.websocket.close(), CLOSE_SECONDS)
+            except Exception:
+                self.websocket.transport.abort()  # No closing handshake in time; drop the connection
+        self.worker.cancel()
+        return drained
+
+
 def logger_thread(bot_name, ready_event):
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     logger = ThreadSafeLogger(bot_name, loop)
+    logger.thread = threading.current_thread()
+    logger.worker = loop.create_task(logger.log_worker())
     loggers[bot_name] = logger  # Store the logger in the global registry
     ready_event.set()  # Signal that the logger is ready
     try:
-        loop.run_until_complete(logger.log_worker())
+        loop.run_until_complete(asyncio.gather(logger.worker, return_exceptions=True))
     finally:
-        loop.run_until_complete(logger.close())
+        # Whatever is still scheduled (e.g. handing drain()'s result back) runs before the loop closes
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
         loop.close()
-        del loggers[bot_name]  # Remove the logger from the registry on shutdown
+        if loggers.get(bot_name) is logger:
+            del loggers[bot_name]  # Remove the logger from the registry on shutdown
 
 def start_logger(bot_name):
     """
@@ -98,15 +151,28 @@ def start_logger(bot_name):
     ready_event.wait()
     return loggers[bot_name]
 
-def stop_logger(bot_name):
+def stop_logger(bot_name, timeout=LOG_DRAIN_SECONDS):
     """
-    Stops the logger thread and closes the logger gracefully.
+    Sends what is left in a logger's queue, for up to `timeout` seconds, then
+    closes its connection and ends its thread. The drain runs on the logger's
+    own event loop, so this can be called from any thread.
+
+    Returns:
+        bool: False if messages were dropped or the logger did not stop in time.
     """
-    logger = loggers.get(bot_name)
-    if logger:
-        asyncio.run(logger.close())  # Close the logger
-        loggers.pop(bot_name, None)  # Remove the logger from the registry
     logger_ready_events.pop(bot_name, None)  # Remove the ready event if present
+    logger = loggers.pop(bot_name, None)  # A bot started under the same name gets a new logger
+    if logger is None:
+        return True
+    future = asyncio.run_coroutine_threadsafe(logger.drain(timeout), logger.loop)
+    try:
+        drained = future.result(timeout + CLOSE_SECONDS)
+    except Exception as e:
+        console.warn(bot_name, "Logger did not stop cleanly: %r", e)
+        future.cancel()
+        drained = False
+    logger.thread.join(CLOSE_SECONDS)
+    return drained and not logger.thread.is_alive()
     
 
 def create_message_data(message, status="log", data=None):
@@ -138,6 +204,16 @@ class CustomJSONEncoder(json.JSONEncoder):
             return obj.isoformat()  # Convert datetime to ISO 8601 string
         return super().default(obj)
 
+
+def legacy_frame(bot_id, message):
+    """
+    Text frame for servers that did not negotiate a binary framing: the message
+    as a JSON string inside the {"bot_id", "log"} envelope.
+    """
+    if not isinstance(message, str):
+        message = json.dumps(message, cls=CustomJSONEncoder)
+    return json.dumps({"bot_id": bot_id, "log": message})
+
     
 def wsprint(logger, message, action="both"):
     """
@@ -152,13 +228,8 @@ def wsprint(logger, message, action="both"):
     if action not in {"both", "log", "print"}:
         raise ValueError(f"Invalid action: {action}. Use 'both', 'log', or 'print'.")
     
-    # If the message is a dictionary or object, serialize it to JSON
-    if isinstance(message, (dict, list)):
-        serialized_message = json.dumps(message, cls=CustomJSONEncoder)
-    else:
-        serialized_message = message  # Assume it's already a string
-
+    # The logger serializes the message once, for the framing its connection negotiated
     if action in {"both", "log"} and logger:
-        logger.log(serialized_message)
+        logger.log(message)
     # if action in {"both", "print"}:
     #     print(message)  # Print the original message, not the serialized one
@@ -0,0 +1,53 @@
+import threading
+from decimal import Decimal
+from config.bot_config import binance_client
+from core.scheduler import scheduler
+
+# Latest known price per symbol: symbol -> (timestamp, Decimal price)
+price_board = {}
+price_board_lock = threading.Lock()
+
+# Prices older than this are refreshed from the REST ticker
+PRICE_MAX_AGE_SECONDS = 5
+
+
+def update_price(symbol, price, timestamp=None):
+    """
+    Records the latest price for a symbol on the process-wide price board.
+    """
+    if not isinstance(price, Decimal):
+        price = Decimal(str(price))
+    with price_board_lock:
+        price_board[symbol] = (timestamp if timestamp is not None else scheduler.clock(), price)
+
+
+def get_price(symbol, max_age=PRICE_MAX_AGE_SECONDS):
+    """
+    Returns the current price of a symbol as a Decimal.
+
+    Uses the price board when it holds a fresh enough entry (published by the
+    shard coordinator or a previous lookup) and falls back to the REST ticker.
+    """
+    entry = price_board.get(symbol)
+    if entry and scheduler.clock() - entry[0] <= max_age:
+        return entry[1]
+    price = Decimal(binance_client.get_symbol_ticker(symbol=symbol)["price"])
+    update_price(symbol, price)
+    return price
+
+
+def get_usdt_price(currency):
+    """Price of one unit of `currency` in USDT."""
+    if currency == "USDT":
+        return Decimal('1.0')
+    return get_price(f"{currency}USDT")
+
+
+def fetch_closed_klines(symbol, interval, limit):
+    """
+    Fetches the last `limit` closed klines from REST, dropping the candle still forming.
+    """
+    klines = binance_client.get_klines(symbol=symbol, interval=interval, limit=limit + 1)
+    if klines and klines[-1][6] >= scheduler.server_time_ms():  # Close time still in the future
+        klines = klines[:-1]
+    return klines[-limit:]
@@ -0,0 +1,389 @@
+"""
+Local order books for pre-trade fill estimates.
+
+Each traded symbol keeps a book built from a REST depth snapshot and kept
+current from the `<symbol>@depth@100ms` diff stream, following Binance's
+procedure: events are buffered while the snapshot loads, events the snapshot
+already covers are dropped, the first applied event must straddle the
+snapshot's lastUpdateId and every later one must start right after the
+previous one (U == previous u + 1). A gap resyncs the book from a new
+snapshot; until it is live again estimates are unavailable.
+
+Price levels are kept in sorted arrays (bids negated so both sides ascend
+from the touch), so a diff level is a bisect plus an in-place update and a
+fill estimate walks levels from index 0. All symbols share one combined
+stream connection on one thread.
+"""
+import bisect
+import json
+import os
+import threading
+from decimal import Decimal
+from config.bot_config import binance_client
+from core import console
+from core.execution import BUY
+from core.utils import lazy_import, adjust_quantity
+
+asyncio = lazy_import("asyncio")
+websockets = lazy_import("websockets")
+
+DEPTH_STREAM_URL = os.getenv("TRENDR_DEPTH_STREAM_URL", "wss://stream.testnet.binance.vision/stream")
+SNAPSHOT_LIMIT = 1000
+RECONNECT_SECONDS = 5
+
+ORDER_BOOKS_ENABLED = os.getenv("TRENDR_ORDER_BOOK", "1") != "0"
+# Market orders are capped to the quantity that fills within this many basis points of the touch
+MAX_SLIPPAGE_BPS = float(os.getenv("TRENDR_MAX_SLIPPAGE_BPS", "50"))
+
+
+class FillEstimate:
+    """
+    Expected execution of a market order against the local book.
+
+    Attributes:
+        side (str): BUY or SELL.
+        quantity (float): Requested base quantity.
+        filled (float): Base quantity the visible book can fill (less than `quantity` when it is too thin).
+        price (float): Average fill price of `filled`.
+        worst_price (float): Price of the deepest level touched.
+        best_price (float): Touch price on the side being taken.
+    """
+    def __init__(self, side, quantity, filled, price, worst_price, best_price):
+        self.side = side
+        self.quantity = quantity
+        self.filled = filled
+        self.price = price
+        self.worst_price = worst_price
+        self.best_price = best_price
+
+    @property
+    def complete(self):
+        return self.filled >= self.quantity
+
+    @property
+    def slippage_bps(self):
+        """Average price beyond the touch, in basis points (always >= 0)."""
+        if not self.best_price:
+            return 0.0
+        return abs(self.price - self.best_price) / self.best_price * 10000
+
+    def __repr__(self):
+        return f"FillEstimate({self.side} {self.filled}/{self.quantity} @ {self.price:.8f}, {self.slippage_bps:.1f}bps)"
+
+
+class OrderBook:
+    """
+    One symbol's book: ascending level keys (ask prices, negated bid prices)
+    with parallel quantity arrays.
+    """
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.lock = threading.Lock()
+        self.bid_keys = []
+        self.bid_quantities = []
+        self.ask_keys = []
+        self.ask_quantities = []
+        self.last_update_id = None  # u of the last applied event (lastUpdateId of the snapshot before any)
+        self.live = False
+        self.bridged = False  # True once an event straddling the snapshot has been applied
+        self.buffer = []  # Diff events received while the snapshot is loading
+        self.generation = 0  # Bumped on every reset, so a snapshot fetched before one is discarded
+        self.loading = False
+        self.resyncs = 0
+
+    def reset(self):
+        with self.lock:
+            self.live = False
+            self.bridged = False
+            self.last_update_id = None
+            self.buffer = []
+            self.generation += 1
+
+    def load_snapshot(self, snapshot):
+        """Replaces the book with a REST depth snapshot."""
+        bids = sorted((-float(price), float(quantity)) for price, quantity in snapshot["bids"] if float(quantity))
+        asks = sorted((float(price), float(quantity)) for price, quantity in snapshot["asks"] if float(quantity))
+        with self.lock:
+            self.bid_keys = [key for key, _ in bids]
+            self.bid_quantities = [quantity for _, quantity in bids]
+            self.ask_keys = [key for key, _ in asks]
+            self.ask_quantities = [quantity for _, quantity in asks]
+            self.last_update_id = snapshot["lastUpdateId"]
+            self.bridged = False
+
+    def apply_diff(self, event):
+        """
+        Applies one depth diff event.
+
+        Returns:
+            bool: False when the event does not continue the book's sequence
+                (the book must be resynced), True otherwise.
+        """
+        first, last = event["U"], event["u"]
+        with self.lock:
+            if last <= self.last_update_id:
+                return True  # Already in the snapshot
+            if self.bridged:
+                if first != self.last_update_id + 1:
+                    return False
+            elif not first <= self.last_update_id + 1 <= last:
+                return False
+            _apply_levels(self.bid_keys, self.bid_quantities, event["b"], -1.0)
+            _apply_levels(self.ask_keys, self.ask_quantities, event["a"], 1.0)
+            self.last_update_id = last
+            self.bridged = True
+            return True
+
+    def best_bid(self):
+        return -self.bid_keys[0] if self.bid_keys else None
+
+    def best_ask(self):
+        return self.ask_keys[0] if self.ask_keys else None
+
+    def estimate_fill(self, side, quantity):
+        """
+        Walks the opposite side of the book for a market order of `quantity`.
+
+        Args:
+            side (str): BUY (takes asks) or SELL (takes bids).
+            quantity (float): Base quantity.
+
+        Returns:
+            FillEstimate: None when that side of the book is empty.
+        """
+        quantity = float(quantity)
+        with self.lock:
+            keys, quantities = (self.ask_keys, self.ask_quantities) if side == BUY else (self.bid_keys, self.bid_quantities)
+            if not keys:
+                return None
+            remaining = quantity
+            cost = 0.0
+            index = 0
+            levels = len(keys)
+            while remaining > 0 and index < levels:
+                take = quantities[index] if quantities[index] < remaining else remaining
+                cost += take * keys[index]
+                remaining -= take
+                index += 1
+            best = keys[0]
+            worst = keys[index - 1] if index else best
+        filled = quantity - remaining
+        sign = 1.0 if side == BUY else -1.0
+        price = cost / filled * sign if filled else best * sign
+        return FillEstimate(side, quantity, filled, price, worst * sign, best * sign)
+
+    def quantity_within(self, side, limit_price):
+        """Base quantity a market order can take at prices no worse than `limit_price`."""
+        with self.lock:
+            if side == BUY:
+                end = bisect.bisect_right(self.ask_keys, limit_price)
+                return sum(self.ask_quantities[:end])
+            end = bisect.bisect_right(self.bid_keys, -limit_price)
+            return sum(self.bid_quantities[:end])
+
+
+def _apply_levels(keys, quantities, levels, sign):
+    for price, quantity in levels:
+        key = float(price) * sign
+        quantity = float(quantity)
+        index = bisect.bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            if quantity:
+                quantities[index] = quantity
+            else:
+                del keys[index]
+                del quantities[index]
+        elif quantity:
+            keys.insert(index, key)
+            quantities.insert(index, quantity)
+
+
+class OrderBookManager:
+    """
+    Maintains a live book for every tracked symbol over one combined depth
+    stream. Bots track the symbol they trade for as long as they run.
+    """
+    def __init__(self, client=binance_client, url=DEPTH_STREAM_URL, enabled=ORDER_BOOKS_ENABLED):
+        self.client = client
+        self.url = url
+        self.enabled = enabled
+        self.books = {}
+        self.refcounts = {}
+        self.lock = threading.Lock()
+        self.loop = None
+        self.websocket = None
+        self.thread = None
+        self._request_ids = 0
+
+    def track(self, symbol):
+        """Starts (or joins) maintaining the book of `symbol`."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.refcounts[symbol] = self.refcounts.get(symbol, 0) + 1
+            if symbol in self.books:
+                return
+            self.books[symbol] = OrderBook(symbol)
+            if self.thread is None:
+                ready = threading.Event()
+                self.thread = threading.Thread(target=self._run, args=(ready,), name="order-books", daemon=True)
+                self.thread.start()
+                ready.wait()
+        self._call(self._subscribe, [symbol])
+
+    def untrack(self, symbol):
+        """Drops one bot's interest in `symbol`; the book is discarded with the last one."""
+        if not self.enabled:
+            return
+        with self.lock:
+            count = self.refcounts.get(symbol, 0) - 1
+            if count > 0:
+                self.refcounts[symbol] = count
+                return
+            self.refcounts.pop(symbol, None)
+            if self.books.pop(symbol, None) is None:
+                return
+        self._call(self._send, "UNSUBSCRIBE", [stream_name(symbol)])
+
+    def get_book(self, symbol):
+        """The live book of `symbol`, or None."""
+        book = self.books.get(symbol)
+        return book if book is not None and book.live else None
+
+    def estimate_fill(self, symbol, side, quantity):
+        """
+        Expected fill of a market order on `symbol`.
+
+        Returns:
+            FillEstimate: None when no live book is available (not tracked, still
+                syncing, or disconnected); callers then fall back to the ticker price.
+        """
+        book = self.get_book(symbol)
+        return book.estimate_fill(side, quantity) if book else None
+
+    # ---- Stream thread ----
+
+    def _call(self, coroutine_function, *args):
+        asyncio.run_coroutine_threadsafe(coroutine_function(*args), self.loop)
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        ready.set()
+        self.loop.run_until_complete(self._stream())
+
+    async def _stream(self):
+        while True:
+            try:
+                async with websockets.connect(self.url, max_size=None, ping_interval=None) as websocket:
+                    self.websocket = websocket
+                    await self._subscribe(list(self.books))
+                    async for message in websocket:
+                        self._on_message(message)
+            except Exception as e:
+                console.warn(None, "Depth stream disconnected: %s. Reconnecting in %s seconds...", e, RECONNECT_SECONDS)
+            self.websocket = None
+            for book in list(self.books.values()):
+                book.reset()
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def _send(self, method, params):
+        if self.websocket is None or not params:
+            return  # Subscriptions are (re)sent when the connection opens
+        self._request_ids += 1
+        await self.websocket.send(json.dumps({"method": method, "params": params, "id": self._request_ids}))
+
+    async def _subscribe(self, symbols):
+        for symbol in symbols:
+            book = self.books.get(symbol)
+            if book is not None:
+                book.reset()
+        await self._send("SUBSCRIBE", [stream_name(symbol) for symbol in symbols])
+        for symbol in symbols:
+            if symbol in self.books:
+                self.loop.create_task(self._load_snapshot(symbol))
+
+    async def _load_snapshot(self, symbol):
+        book = self.books.get(symbol)
+        if book is None or book.loading:
+            return
+        book.loading = True
+        try:
+            while self.books.get(symbol) is book and self.websocket is not None and not book.live:
+                generation = book.generation
+                # Give the subscription a moment so the snapshot does not predate the buffered stream
+                for _ in range(20):
+                    if book.buffer:
+                        break
+                    await asyncio.sleep(0.05)
+                try:
+                    snapshot = await asyncio.to_thread(self.client.get_order_book, symbol=symbol, limit=SNAPSHOT_LIMIT)
+                except Exception as e:
+                    console.warn(None, "Depth snapshot for %s failed: %s", symbol, e)
+                    await asyncio.sleep(RECONNECT_SECONDS)
+                    continue
+                if book.generation != generation or (book.buffer and snapshot["lastUpdateId"] + 1 < book.buffer[0]["U"]):
+                    continue  # The book was reset meanwhile, or the snapshot is older than the buffered stream
+                book.load_snapshot(snapshot)
+                buffered, book.buffer = book.buffer, []
+                if all(book.apply_diff(event) for event in buffered):
+                    book.live = True
+                else:
+                    book.reset()
+        finally:
+            book.loading = False
+
+    def _on_message(self, message):
+        event = json.loads(message).get("data")
+        if not event or event.get("e") != "depthUpdate":
+            return
+        book = self.books.get(event["s"])
+        if book is None:
+            return
+        if not book.live:
+            book.buffer.append(event)
+        elif not book.apply_diff(event):
+            book.resyncs += 1
+            console.warn(None, "Depth stream gap on %s (U=%s after u=%s); resyncing", book.symbol, event["U"], book.last_update_id)
+            book.reset()
+            book.buffer.append(event)
+            self.loop.create_task(self._load_snapshot(book.symbol))
+
+
+def stream_name(symbol):
+    return f"{symbol.lower()}@depth@100ms"
+
+
+def limit_slippage(symbol, side, quantity, min_qty, step_size, max_slippage_bps=MAX_SLIPPAGE_BPS):
+    """
+    Caps a market order to what the local book fills within `max_slippage_bps`
+    of the touch.
+
+    Args:
+        symbol (str): Market pair.
+        side (str): BUY or SELL.
+        quantity (Decimal): Base quantity, already adjusted to the lot size.
+        min_qty (Decimal): Lot size minimum.
+        step_size (Decimal): Lot size step.
+        max_slippage_bps (float): Largest accepted distance of the worst level from the touch.
+
+    Returns:
+        tuple: (quantity, estimated average price). The price is None (and the
+            quantity unchanged) when no live book is available.
+    """
+    book = order_books.get_book(symbol)
+    estimate = book.estimate_fill(side, quantity) if book else None
+    if estimate is None:
+        return quantity, None
+    if not estimate.complete or estimate.slippage_bps > max_slippage_bps:
+        bound = max_slippage_bps / 10000
+        limit_price = estimate.best_price * (1 + bound if side == BUY else 1 - bound)
+        capped = adjust_quantity(Decimal(str(book.quantity_within(side, limit_price))), min_qty, step_size)
+        if capped < quantity:
+            console.warn(None, "%s %s %s would fill at %s; capped to %s within %sbps", side, quantity, symbol, estimate, capped, max_slippage_bps)
+            quantity = max(capped, Decimal('0'))
+            estimate = book.estimate_fill(side, quantity)
+    return quantity, Decimal(str(estimate.price))
+
+
+order_books = OrderBookManager()
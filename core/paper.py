@@ -0,0 +1,114 @@
+"""
+Paper trading: bots started with "paper": true run the same trading loop on
+the same shared candles, indicators and price board as live bots, but their
+market orders are filled in-process instead of being sent to the exchange.
+
+A paper order walks the local order book when one is live for the symbol and
+otherwise fills at the reference price plus half a simulated spread. Either
+way it pays the symbol's taker fee like a live order, so many strategy
+variants can run next to a live bot and be compared on the same footing
+(see pnl_report).
+"""
+import os
+import threading
+from decimal import Decimal
+from core.bot import STRATEGY_PARAMS
+from core.execution import BUY, Fill
+from core.market_data import get_price, get_usdt_price
+from core.orderbook import order_books
+
+# Spread assumed when no local order book is available, in basis points
+PAPER_SPREAD_BPS = Decimal(os.getenv("TRENDR_PAPER_SPREAD_BPS", "2"))
+
+
+class PaperExchange:
+    """
+    In-process fills for paper bots, with the same submit() interface as the
+    order aggregator.
+    """
+    def __init__(self, spread_bps=PAPER_SPREAD_BPS):
+        self.spread_bps = spread_bps
+        self.fills = 0
+        self._lock = threading.Lock()
+
+    def submit(self, symbol, side, quantity, reference_price, bot_name=None):
+        """
+        Fills a market order immediately.
+
+        Args:
+            symbol (str): Market pair, e.g. "BTCUSDT".
+            side (str): BUY or SELL.
+            quantity (Decimal): Base quantity, already adjusted to the lot size.
+            reference_price (Decimal): Last known price.
+            bot_name (str): Submitting bot.
+
+        Returns:
+            Fill: The whole quantity at the simulated price, all of it fee-paying.
+        """
+        estimate = order_books.estimate_fill(symbol, side, quantity)
+        if estimate is not None and estimate.complete:
+            price = Decimal(str(estimate.price))
+        else:
+            half_spread = reference_price * self.spread_bps / Decimal('20000')
+            price = reference_price + half_spread if side == BUY else reference_price - half_spread
+        with self._lock:
+            self.fills += 1
+        order = {
+            "symbol": symbol,
+            "side": side,
+            "status": "FILLED",
+            "paper": True,
+            "executedQty": str(quantity),
+            "cummulativeQuoteQty": str(quantity * price),
+        }
+        return Fill(quantity, price, quantity, order)
+
+
+def bot_pnl(bot_name, bot_data):
+    """
+    Marked-to-market P&L of one bot, in USDT.
+
+    Returns:
+        dict: bot_name, mode, params, starting value, equity, pnl, pnl_percentage and trade counts.
+    """
+    price = get_price(bot_data["symbol"])
+    quote_usdt = get_usdt_price(bot_data["quote_currency"])
+    equity = (Decimal(bot_data["base_current_currency_quantity"]) * price + Decimal(bot_data["quote_current_currency_quantity"])) * quote_usdt
+    starting = Decimal(bot_data["starting_trade_amount"])
+    pnl = equity - starting
+    return {
+        "bot_name": bot_name,
+        "mode": "paper" if bot_data.get("paper") else "live",
+        "params": {name: bot_data[name] for name in STRATEGY_PARAMS if name in bot_data},
+        "trade_allocation": bot_data["trade_allocation"],
+        "starting_value": starting,
+        "equity": equity,
+        "pnl": pnl,
+        "pnl_percentage": pnl / starting * 100 if starting else Decimal('0'),
+        "trades": bot_data.get("successful_trades", 0),
+        "failed_trades": bot_data.get("failed_trades", 0),
+    }
+
+
+def pnl_report(bots):
+    """
+    P&L of live and paper bots side by side, grouped by market and interval.
+
+    Parameters:
+        bots (dict): bot_name -> bot_data.
+
+    Returns:
+        list: One {"symbol", "interval", "bots": [...]} group per market/interval,
+            bots ordered by P&L (best first).
+    """
+    groups = {}
+    for bot_name, bot_data in bots.items():
+        key = (bot_data["symbol"], bot_data["interval"])
+        groups.setdefault(key, []).append(bot_pnl(bot_name, bot_data))
+    return [
+        {"symbol": symbol, "interval": interval, "bots": sorted(rows, key=lambda row: row["pnl"], reverse=True)}
+        for (symbol, interval), rows in sorted(groups.items())
+    ]
+
+
+paper_exchange = PaperExchange()
@@ -0,0 +1,200 @@
+"""
+On-demand stack sampling of running bots, without restarting them.
+
+A profile samples the Python stacks of the chosen threads (one bot's, or
+every thread in the process) with sys._current_frames() for a few seconds,
+from the requesting thread; nothing runs between profiles. The pause between
+samples stretches so that sampling never takes more than
+TRENDR_PROFILE_OVERHEAD of the process (default 2%): with many threads the
+rate drops instead of the overhead rising.
+
+Bot stacks are rooted at trading_loop and attributed to the loop phase they
+are in, i.e. the function trading_loop is currently calling (waiting for the
+candle, indicators, orders, equity, dashboard logging...). Results are
+collapsed stacks ("root;frame;frame count" lines, for flamegraph tools) or a
+speedscope JSON document.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+
+PROFILE_HZ = float(os.getenv("TRENDR_PROFILE_HZ", "100"))
+# Largest share of wall time the sampler may spend taking samples
+PROFILE_OVERHEAD = float(os.getenv("TRENDR_PROFILE_OVERHEAD", "0.02"))
+MAX_PROFILE_SECONDS = 120
+
+# Function called from trading_loop -> loop phase
+PHASES = {
+    "wait": "candle wait",
+    "evaluate": "indicators",
+    "record_equity": "equity",
+    "get_usdt_price": "prices",
+    "atr_filter": "signals",
+    "dynamic_trade_allocation": "signals",
+    "trailing_stop_percentage": "signals",
+    "check_ema_threshold": "signals",
+    "update": "risk",
+    "buy_crypto": "buy",
+    "sell_crypto": "sell",
+    "exit_position": "risk exit",
+    "wsprint": "dashboard log",
+    "create_message_data": "dashboard log",
+    "info": "console",
+    "debug": "console",
+    "warn": "console",
+    "error": "console",
+}
+LOOP_FUNCTION = "trading_loop"
+
+# One profile at a time: concurrent samplers would only add up their overhead
+profile_lock = threading.Lock()
+_labels = {}  # code object -> frame label
+
+
+def frame_label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for path in sys.path:
+            if path and filename.startswith(path + os.sep):
+                filename = filename[len(path) + 1:]
+                break
+        label = _labels[code] = f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+def stack_of(frame, root):
+    """
+    Collapsed stack of one thread, root first: (root, "[phase]", trading_loop, ...) for
+    a bot thread, (root, outermost frame, ...) for any other thread.
+    """
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    for index, code in enumerate(codes):
+        if code.co_name == LOOP_FUNCTION:
+            callee = codes[index + 1].co_name if index + 1 < len(codes) else None
+            phase = PHASES.get(callee, callee) if callee else "loop"
+            return (root, f"[{phase}]") + tuple(frame_label(code) for code in codes[index:])
+    return (root,) + tuple(frame_label(code) for code in codes)
+
+
+def sample_stacks(seconds, threads=None, labels=None, hz=PROFILE_HZ, max_overhead=PROFILE_OVERHEAD):
+    """
+    Samples thread stacks for `seconds`.
+
+    Parameters:
+        seconds (float): How long to sample.
+        threads (dict): thread ident -> root label of the threads to sample; None
+            samples every other thread.
+        labels (dict): thread ident -> root label when sampling every thread
+            (e.g. bot names, see bot_threads); other threads go by their name.
+        hz (float): Highest sampling rate.
+        max_overhead (float): Largest share of the time spent sampling.
+
+    Returns:
+        dict: {"stacks": Counter of stack tuple -> samples, "samples", "interval", "overhead"}.
+
+    Raises:
+        RuntimeError: If another profile is running.
+    """
+    if not profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        own = threading.get_ident()
+        stacks = collections.Counter()
+        ticks = 0
+        busy = 0.0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            before = time.perf_counter()
+            if before >= deadline:
+                break
+            frames = sys._current_frames()
+            if threads is None:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                roots = {ident: (labels or {}).get(ident) or names.get(ident, f"thread-{ident}") for ident in frames}
+            else:
+                roots = threads
+            for ident, root in roots.items():
+                frame = frames.get(ident)
+                if frame is not None and ident != own:
+                    stacks[stack_of(frame, root)] += 1
+            del frames
+            ticks += 1
+            spent = time.perf_counter() - before
+            busy += spent
+            time.sleep(max(1 / hz - spent, spent / max_overhead - spent))
+        elapsed = time.perf_counter() - started
+        return {"stacks": stacks, "samples": ticks, "interval": elapsed / ticks if ticks else 0.0, "overhead": busy / elapsed if elapsed else 0.0}
+    finally:
+        profile_lock.release()
+
+
+def bot_threads(bots):
+    """thread ident -> bot name for the bots of a registry ({bot_name: {"thread": ...}})."""
+    return {bot["thread"].ident: bot_name for bot_name, bot in list(bots.items()) if bot.get("thread") is not None and bot["thread"].ident}
+
+
+def merge_profiles(profiles):
+    """
+    Combines profiles taken over the same period (e.g. one per shard), keyed by a
+    prefix that is added to their roots.
+    """
+    stacks = collections.Counter()
+    samples, interval, overhead = 0, 0.0, 0.0
+    for prefix, profile in profiles.items():
+        for stack, count in profile["stacks"].items():
+            stacks[(f"{prefix}{stack[0]}",) + tuple(stack[1:])] += count
+        samples = max(samples, profile["samples"])
+        interval = max(interval, profile["interval"])
+        overhead = max(overhead, profile["overhead"])
+    return {"stacks": stacks, "samples": samples, "interval": interval, "overhead": overhead}
+
+
+def collapsed(profile):
+    """Collapsed-stack text: one "frame;frame;... count" line per stack, most samples first."""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in profile["stacks"].most_common())
+
+
+def speedscope(profile, name="trendr"):
+    """
+    speedscope JSON document (https://www.speedscope.app/file-format-schema.json)
+    with one sampled profile per root (bot or thread), weighted in seconds.
+    """
+    frames = []
+    frame_ids = {}
+    by_root = collections.defaultdict(list)
+    for stack, count in profile["stacks"].most_common():
+        indices = []
+        for label in stack[1:]:
+            index = frame_ids.get(label)
+            if index is None:
+                index = frame_ids[label] = len(frames)
+                frames.append({"name": label})
+            indices.append(index)
+        by_root[stack[0]].append((indices, count * profile["interval"]))
+    profiles = []
+    for root, samples in sorted(by_root.items()):
+        total = sum(weight for _, weight in samples)
+        profiles.append({
+            "type": "sampled",
+            "name": root,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": total,
+            "samples": [indices for indices, _ in samples],
+            "weights": [weight for _, weight in samples],
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "name": name,
+        "exporter": "trendr",
+    }
@@ -0,0 +1,320 @@
+"""
+Record/replay of Binance client traffic.
+
+Recording wraps the client so every call is written, with its timestamp and
+duration, to a gzip-compressed stream of pickled frames. Replay serves those
+responses back without network, in recorded order per (method, arguments),
+on a virtual clock running at wall speed or faster. A call that was never
+recorded fails with ReplayMiss, or in lenient mode gets the recorded response
+of the same method whose arguments match best (the same symbol first). Bot
+starts are recorded too, so a whole session can be re-run offline (e.g. under
+cProfile); the command exits non-zero if any call was not recorded:
+
+    TRENDR_RECORD=session.rec python main.py
+    python -m core.recorder session.rec --speed 60 --profile session.prof [--lenient]
+"""
+import atexit
+import collections
+import gzip
+import pickle
+import sys
+import threading
+import time
+from config.bot_config import binance_client
+from core import console
+from core.scheduler import scheduler
+from core.orderbook import order_books
+
+MAGIC = "trendr-recording"
+VERSION = 1
+
+# Frame kinds
+CALL = "call"
+EVENT = "event"
+
+# Recorder of the running session, if recording is on
+active_recorder = None
+
+
+def call_key(method, args, kwargs):
+    return method, repr(args), repr(sorted(kwargs.items()))
+
+
+def argument_match(args, kwargs, recorded_args, recorded_kwargs):
+    """
+    How closely a recorded call's arguments match a new call's, as a sort key:
+    (same symbol, number of equal arguments).
+    """
+    equal = sum(1 for value, recorded in zip(args, recorded_args) if value == recorded)
+    equal += sum(1 for name, value in kwargs.items() if name in recorded_kwargs and recorded_kwargs[name] == value)
+    return kwargs.get("symbol") == recorded_kwargs.get("symbol"), equal
+
+
+class RecordedError(Exception):
+    """Raised in replay where the recorded call raised; carries the original type name."""
+    def __init__(self, error_type, message):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+
+
+class SessionRecorder:
+    """
+    Append-only writer for a recording file. Thread-safe.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = gzip.open(path, "wb", compresslevel=6)
+        self.lock = threading.Lock()
+        self.closed = False
+        self._write({"magic": MAGIC, "version": VERSION, "started": time.time()})
+        atexit.register(self.close)
+
+    def _write(self, frame):
+        data = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            if not self.closed:
+                self.file.write(data)
+
+    def record_call(self, started, duration, method, args, kwargs, ok, payload):
+        self._write((CALL, started, duration, method, args, kwargs, ok, payload))
+
+    def record_event(self, name, data):
+        self._write((EVENT, time.time(), 0.0, name, (), data, True, None))
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.file.close()
+
+
+class RecordingClient:
+    """
+    Forwards every method call to `client` and records it with `recorder`.
+    """
+    def __init__(self, client, recorder):
+        self._client = client
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def recorded(*args, **kwargs):
+            started = time.time()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as e:
+                self._recorder.record_call(started, time.time() - started, name, args, kwargs, False, (type(e).__name__, str(e)))
+                raise
+            self._recorder.record_call(started, time.time() - started, name, args, kwargs, True, result)
+            return result
+
+        return recorded
+
+
+def read_frames(path):
+    """
+    Yields the frames of a recording file, header first.
+    """
+    with gzip.open(path, "rb") as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+class ReplayClock:
+    """
+    Virtual wall clock that starts at `start` and runs `speed` times faster than real time.
+    """
+    def __init__(self, start, speed=1.0):
+        self.start = start
+        self.speed = speed
+        self.real_start = time.monotonic()
+
+    def __call__(self):
+        return self.start + (time.monotonic() - self.real_start) * self.speed
+
+    def sleep_until(self, timestamp):
+        delay = (timestamp - self()) / self.speed
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ReplayClient:
+    """
+    Serves recorded responses in place of the Binance client.
+
+    Calls are matched on (method, arguments) and answered in recorded order, so a
+    deterministic trading loop makes the same decisions it made live. A response
+    is not returned before its recorded completion time on the replay clock.
+
+    An unmatched call raises RecordedError("ReplayMiss", ...), or without
+    `strict` is answered with the best argument match among the recorded calls
+    of its method (the latest one already finished on the replay clock).
+    """
+    def __init__(self, path, speed=1.0, strict=True):
+        frames = read_frames(path)
+        header = next(frames)
+        if not isinstance(header, dict) or header.get("magic") != MAGIC:
+            raise ValueError(f"{path} is not a trendr recording")
+        self.calls = collections.defaultdict(collections.deque)
+        self.by_method = collections.defaultdict(list)
+        self.events = []
+        first = None
+        for kind, started, duration, method, args, kwargs, ok, payload in frames:
+            first = started if first is None else min(first, started)
+            if kind == EVENT:
+                self.events.append((started, method, kwargs))
+                continue
+            record = (started + duration, ok, payload)
+            self.calls[call_key(method, args, kwargs)].append(record)
+            self.by_method[method].append((args, kwargs, record))
+        self.clock = ReplayClock(first if first is not None else header["started"], speed)
+        self.strict = strict
+        self.lock = threading.Lock()
+        self.misses = collections.Counter()
+        self.missed_calls = set()
+
+    def _next(self, method, args, kwargs):
+        with self.lock:
+            queue = self.calls.get(call_key(method, args, kwargs))
+            if queue:
+                return queue.popleft()
+            self.misses[method] += 1
+            first_miss = call_key(method, args, kwargs) not in self.missed_calls
+            self.missed_calls.add(call_key(method, args, kwargs))
+        candidates = self.by_method.get(method)
+        if self.strict or not candidates:
+            raise RecordedError("ReplayMiss", f"no recorded call to {method}{args or kwargs}")
+        if first_miss:
+            console.warn(None, "Replay miss for %s%s; using the closest recorded response", method, args or kwargs)
+
+        # Unmatched call: the recorded calls with the closest arguments, latest finished first
+        best = max(argument_match(args, kwargs, recorded_args, recorded_kwargs) for recorded_args, recorded_kwargs, _ in candidates)
+        matches = [record for recorded_args, recorded_kwargs, record in candidates
+                   if argument_match(args, kwargs, recorded_args, recorded_kwargs) == best]
+        now = self.clock()
+        earlier = [record for record in matches if record[0] <= now]
+        return earlier[-1] if earlier else matches[0]
+
+    def __getattr__(self, name):
+        def replayed(*args, **kwargs):
+            finished, ok, payload = self._next(name, args, kwargs)
+            self.clock.sleep_until(finished)
+            if not ok:
+                raise RecordedError(*payload)
+            return payload
+
+        return replayed
+
+
+def start_recording(path):
+    """
+    Wraps the current Binance client so all traffic is recorded to `path`.
+    """
+    global active_recorder
+    recorder = active_recorder = SessionRecorder(path)
+    binance_client.set_client(RecordingClient(binance_client.get_client(), recorder))
+    console.info(None, "Recording exchange traffic to %s", path)
+    return recorder
+
+
+def start_replay(path, speed=1.0, strict=True):
+    """
+    Replaces the Binance client with a replay of `path` and moves the scheduler
+    onto the replay clock. Must run before any bot starts.
+    """
+    client = ReplayClient(path, speed, strict)
+    binance_client.set_client(client)
+    scheduler.set_clock(client.clock, speed)
+    order_books.enabled = False  # The depth stream is not recorded; orders are priced from the ticker
+    console.info(None, "Replaying %s at %sx", path, speed)
+    return client
+
+
+def replay_session(path, speed=1.0, duration=None, strict=True):
+    """
+    Replays a recorded session: re-issues each recorded bot start through the
+    Flask app at its recorded time and runs until the recording ends (or for
+    `duration` replay-clock seconds).
+
+    Returns:
+        ReplayClient: The replay, whose `misses` count the calls that were not recorded.
+    """
+    import main
+
+    client = start_replay(path, speed, strict)
+    app = main.app.test_client()
+    starts = [(started, data) for started, name, data in client.events if name == "start"]
+    if not starts:
+        console.warn(None, "No bot starts in %s", path)
+    for started, data in sorted(starts, key=lambda start: start[0]):
+        client.clock.sleep_until(started)
+        response = app.post("/start", json=data)
+        console.info(None, "Replayed /start: %s", (response.get_json(silent=True) or {}).get("message", response.status))
+
+    last = max((record[0] for records in client.by_method.values() for _, _, record in records), default=client.clock())
+    end = client.clock.start + duration if duration else last
+    client.clock.sleep_until(end)
+    for bot_name in list(main.bot_registry):
+        main.bot_registry[bot_name]["data"]["running"] = False
+    if client.misses:
+        console.error(None, "Replay finished with unmatched calls: %s (%d distinct)", dict(client.misses), len(client.missed_calls))
+    else:
+        console.info(None, "Replay finished. Every call was recorded")
+    console.flush(1)
+    return client
+
+
+def record_event(name, data):
+    """Records a control-plane event (e.g. a bot start) when recording is on."""
+    if active_recorder:
+        active_recorder.record_event(name, data)
+
+
+def profile_all_threads(target, path):
+    """
+    Runs `target()` under cProfile and writes the stats to `path`.
+
+    Since Python 3.12 cProfile is built on sys.monitoring, so a single profiler
+    covers the bot, logger and scheduler threads as well as the calling thread.
+    """
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return target()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        console.info(None, "Profile written to %s", path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay a recorded trendr session offline.")
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay clock speed (1 = wall time)")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many recorded seconds")
+    parser.add_argument("--profile", default=None, help="write cProfile stats to this file")
+    parser.add_argument("--lenient", action="store_true", help="answer calls that were not recorded with the closest match instead of failing them")
+    args = parser.parse_args()
+
+    strict = not args.lenient
+    if args.profile:
+        client = profile_all_threads(lambda: replay_session(args.path, args.speed, args.duration, strict), args.profile)
+        console.flush(1)
+    else:
+        client = replay_session(args.path, args.speed, args.duration, strict)
+    # A replay that left the recording is not the recorded session, lenient or not
+    return 1 if client.misses else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
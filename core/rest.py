@@ -0,0 +1,325 @@
+"""
+Resilient REST layer in front of the Binance client.
+
+ResilientClient forwards the client calls trendr makes to one client per API
+host (TRENDR_API_HOSTS) and adds, per endpoint (client method):
+
+- hedging: an idempotent market-data call that has not answered within the
+  endpoint's recent p95 latency is sent again to the next host, and the first
+  answer wins. About one call in twenty is hedged, so the extra load is ~5%.
+- bounded retry: reads that fail transiently (connection errors, timeouts,
+  HTTP 5xx and 429) are retried up to TRENDR_REST_RETRIES times, after an
+  exponential backoff with full jitter.
+- order idempotency: every order is given a newClientOrderId before it is
+  sent. When an order call fails without an answer, the order is looked up by
+  that id before it is sent again with the same id, so a lost response never
+  places an order twice.
+- circuit breaking: after TRENDR_BREAKER_FAILURES consecutive transient
+  failures an endpoint fails fast (CircuitOpenError) for TRENDR_BREAKER_SECONDS,
+  then lets a single trial call through and closes again if it succeeds.
+
+Latency percentiles, success rate, retries, hedges and breaker state of every
+endpoint are reported by report() (GET /latency).
+"""
+import collections
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from core import console
+
+REST_TIMEOUT_SECONDS = float(os.getenv("TRENDR_REST_TIMEOUT", "10"))
+REST_RETRIES = int(os.getenv("TRENDR_REST_RETRIES", "2"))
+RETRY_BASE_SECONDS = 0.2
+RETRY_MAX_SECONDS = 2.0
+# Hedgeable calls in flight at once; beyond that calls run unhedged on the caller's thread
+HEDGE_SLOTS = int(os.getenv("TRENDR_HEDGE_SLOTS", "16"))
+# Calls to an endpoint before its p95 is trusted as the hedge delay
+HEDGE_MIN_SAMPLES = 20
+LATENCY_SAMPLES = 1024
+BREAKER_FAILURES = int(os.getenv("TRENDR_BREAKER_FAILURES", "5"))
+BREAKER_SECONDS = float(os.getenv("TRENDR_BREAKER_SECONDS", "30"))
+
+# Idempotent public market-data calls, safe to send to two hosts at once
+HEDGED_METHODS = {
+    "get_server_time", "get_exchange_info", "get_symbol_info", "get_symbol_ticker", "get_all_tickers",
+    "get_orderbook_ticker", "get_avg_price", "get_ticker", "get_klines", "get_order_book",
+}
+ORDER_METHODS = {
+    "create_order", "order_market", "order_market_buy", "order_market_sell",
+    "order_limit", "order_limit_buy", "order_limit_sell",
+}
+# Binance error code for a lookup of an order that does not exist
+UNKNOWN_ORDER_CODE = -2013
+
+# The client built by create_binance_client, for report()
+active_client = None
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+def transient(error):
+    """
+    True for failures worth retrying: no answer (connection errors and
+    timeouts, which requests raises as OSErrors), HTTP 5xx and 429.
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status >= 500 or status == 429
+    return isinstance(error, OSError)
+
+
+def percentile(ordered, share):
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))] if ordered else None
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failures` consecutive transient failures; open -> half-open
+    (one trial call) after `seconds`; half-open -> closed on success, open on failure.
+    """
+    def __init__(self, failures=BREAKER_FAILURES, seconds=BREAKER_SECONDS):
+        self.threshold = failures
+        self.seconds = seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+
+    def allow(self, now):
+        if self.state == "closed":
+            return True
+        if self.state == "open" and now - self.opened_at >= self.seconds:
+            self.state = "half-open"
+            return True
+        return False  # Open, or half-open with the trial call in flight
+
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def failure(self, now):
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self.opened_at = now
+
+
+class EndpointStats:
+    """Counters and recent latencies of one endpoint."""
+    def __init__(self):
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)  # Seen by the caller, hedges and retries included
+        self.attempts = collections.deque(maxlen=LATENCY_SAMPLES)  # Single requests to one host
+        self.calls = 0
+        self.successes = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0  # Failed fast by the open breaker
+        self.recovered_orders = 0  # Orders found by their client id after a lost response
+        self._hedge_delay = None
+        self._stale = 0
+
+    def hedge_delay(self):
+        """p95 of recent single requests, refreshed every 32 of them; None until there are enough."""
+        if self._stale >= 32 or (self._hedge_delay is None and len(self.attempts) >= HEDGE_MIN_SAMPLES):
+            self._hedge_delay = percentile(sorted(self.attempts), 0.95)
+            self._stale = 0
+        return self._hedge_delay
+
+    def report(self):
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "success_rate": self.successes / self.calls if self.calls else None,
+            "p50_ms": percentile(ordered, 0.50) * 1000 if ordered else None,
+            "p95_ms": percentile(ordered, 0.95) * 1000 if ordered else None,
+            "p99_ms": percentile(ordered, 0.99) * 1000 if ordered else None,
+            "max_ms": ordered[-1] * 1000 if ordered else None,
+            "hedge_delay_ms": self._hedge_delay * 1000 if self._hedge_delay is not None else None,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+            "recovered_orders": self.recovered_orders,
+        }
+
+
+class ResilientClient:
+    """
+    Forwards Binance client calls to `clients` (one per API host, the first is the
+    primary) with hedging, retries, order idempotency and circuit breaking.
+    """
+    def __init__(self, clients, retries=REST_RETRIES, breaker_failures=BREAKER_FAILURES, breaker_seconds=BREAKER_SECONDS,
+                 hedge_slots=HEDGE_SLOTS):
+        self.clients = list(clients)
+        self.retries = retries
+        self.breaker_failures = breaker_failures
+        self.breaker_seconds = breaker_seconds
+        self.lock = threading.Lock()
+        self.stats = collections.defaultdict(EndpointStats)
+        self.breakers = {}
+        self.hedge_slots = threading.BoundedSemaphore(hedge_slots)
+        self.pool = ThreadPoolExecutor(max_workers=2 * hedge_slots, thread_name_prefix="rest-hedge") if len(self.clients) > 1 else None
+        self._next_host = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self.clients[0], name)
+        if not callable(attribute):
+            return attribute
+        if name in ORDER_METHODS:
+            return lambda *args, **kwargs: self._order(name, args, kwargs)
+        if name.startswith("get_"):
+            return lambda *args, **kwargs: self._read(name, args, kwargs)
+        return lambda *args, **kwargs: self._call(name, args, kwargs, retries=0)
+
+    # ---- Per-endpoint state ----
+
+    def _breaker(self, name):
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers.setdefault(name, CircuitBreaker(self.breaker_failures, self.breaker_seconds))
+        return breaker
+
+    def _admit(self, name):
+        with self.lock:
+            if self._breaker(name).allow(time.monotonic()):
+                return
+            self.stats[name].rejected += 1
+        raise CircuitOpenError(f"{name}: circuit open after repeated failures, failing fast")
+
+    def _settle(self, name, error):
+        with self.lock:
+            breaker = self._breaker(name)
+            if error is not None and transient(error):
+                was_open = breaker.state == "open"
+                breaker.failure(time.monotonic())
+                if breaker.state == "open" and not was_open:
+                    console.warn(None, "Circuit opened for %s after %s: %s", name, "a failed trial call" if breaker.failures < breaker.threshold else f"{breaker.failures} failures", error)
+            else:
+                breaker.success()  # The exchange answered, even if with an error
+
+    # ---- Calls ----
+
+    def _attempt(self, name, host, args, kwargs):
+        started = time.perf_counter()
+        result = getattr(self.clients[host], name)(*args, **kwargs)
+        with self.lock:
+            stats = self.stats[name]
+            stats.attempts.append(time.perf_counter() - started)
+            stats._stale += 1
+        return result
+
+    def _hedged(self, name, args, kwargs):
+        """
+        Sends the call to the primary host and, if it has not answered within the
+        endpoint's p95, to the next host as well; returns the first answer.
+        """
+        with self.lock:
+            delay = self.stats[name].hedge_delay()
+        if self.pool is None or delay is None or not self.hedge_slots.acquire(blocking=False):
+            return self._attempt(name, 0, args, kwargs)
+        try:
+            primary = self.pool.submit(self._attempt, name, 0, args, kwargs)
+            done, _ = wait([primary], timeout=delay)
+            if done:
+                return primary.result()
+            with self.lock:
+                self._next_host = self._next_host % (len(self.clients) - 1) + 1
+                hedge = self.pool.submit(self._attempt, name, self._next_host, args, kwargs)
+                self.stats[name].hedges += 1
+            pending = {primary, hedge}
+            while True:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedge:
+                            with self.lock:
+                                self.stats[name].hedge_wins += 1
+                        return future.result()
+                if not pending:
+                    raise next(iter(done)).exception()
+        finally:
+            self.hedge_slots.release()
+
+    def _call(self, name, args, kwargs, retries):
+        """One logical call: breaker check, attempts with jittered backoff, stats."""
+        with self.lock:
+            stats = self.stats[name]
+        started = time.perf_counter()
+        try:
+            for attempt in range(retries + 1):
+                self._admit(name)
+                try:
+                    result = self._hedged(name, args, kwargs) if name in HEDGED_METHODS else self._attempt(name, 0, args, kwargs)
+                except Exception as e:
+                    self._settle(name, e)
+                    if attempt == retries or not transient(e):
+                        raise
+                    with self.lock:
+                        stats.retries += 1
+                    time.sleep(random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt)))
+                    continue
+                self._settle(name, None)
+                with self.lock:
+                    stats.successes += 1
+                return result
+        finally:
+            with self.lock:
+                stats.calls += 1
+                stats.latencies.append(time.perf_counter() - started)
+
+    def _read(self, name, args, kwargs):
+        return self._call(name, args, kwargs, self.retries)
+
+    def _order(self, name, args, kwargs):
+        """
+        Places an order under a client order id of ours. If the call fails without
+        an answer, the order is looked up by that id and sent again only if the
+        exchange does not know it.
+        """
+        kwargs = dict(kwargs)
+        client_order_id = kwargs.setdefault("newClientOrderId", f"trendr-{os.urandom(11).hex()}")
+        symbol = kwargs.get("symbol")
+        for attempt in range(self.retries + 1):
+            try:
+                return self._call(name, args, kwargs, retries=0)
+            except Exception as e:
+                if attempt == self.retries or not transient(e) or symbol is None:
+                    raise
+                error = e
+            # No answer: the order may or may not have reached the exchange
+            try:
+                order = self._read("get_order", (), {"symbol": symbol, "origClientOrderId": client_order_id})
+            except Exception as lookup_error:
+                if getattr(lookup_error, "code", None) != UNKNOWN_ORDER_CODE:
+                    raise error  # Cannot tell whether it was placed; sending it again could double it
+                console.warn(None, "%s %s was not placed (%s); sending it again as %s", name, symbol, error, client_order_id)
+                continue
+            with self.lock:
+                self.stats[name].recovered_orders += 1
+            console.warn(None, "%s %s response was lost (%s); found the order by its id %s", name, symbol, error, client_order_id)
+            return order
+
+    def report(self):
+        """{endpoint: latency percentiles, success rate, retries, hedges, breaker state}."""
+        with self.lock:
+            return {name: dict(stats.report(), breaker=self._breaker(name).state, breaker_opens=self._breaker(name).opens)
+                    for name, stats in sorted(self.stats.items())}
+
+
+def resilient_client(clients, **options):
+    """Builds the process's ResilientClient over `clients` and makes it the one report() describes."""
+    global active_client
+    active_client = ResilientClient(clients, **options)
+    return active_client
+
+
+def report():
+    """Per-endpoint report of the active client ({} before it is built or when a stand-in replaced it)."""
+    return active_client.report() if active_client else {}
@@ -0,0 +1,405 @@
+"""
+Portfolio-level risk checks across every running bot.
+
+Each bot's position (base/quote quantities, starting capital, highest
+price, stop settings) lives in one slot of a set of columnar NumPy
+arrays. On every price update the engine marks all slots to market at once
+and, in a single vectorized pass, finds the bots that must exit:
+
+- per-bot stop-loss / take-profit on marked-to-market equity against the
+  starting amount, and the trailing stop below the highest price seen;
+- per-asset exposure caps: when the bots holding one base asset together
+  exceed its cap, the largest holders exit until the rest fit under it;
+- aggregate drawdown: when total equity falls more than the limit below its
+  peak, every bot holding a position exits. The check waits for every bot to
+  be priced, and a stopped bot's equity is taken off the peak.
+
+Symbols and assets are identified by their core.symbols registry ids, so
+prices and per-asset totals are arrays indexed by id. Bots only write their
+slot after trades and candle closes; the exit decision is delivered by
+setting bot_data["risk_exit"] and waking the bot's clock.
+
+With TRENDR_WORKERS the coordinator's portfolio_risk holds the bots of every
+shard: each worker replaces it with core.sharding.ShardRisk, which reports
+positions to the coordinator and receives exits and buy allowances back.
+"""
+import os
+import threading
+from config.bot_config import binance_client
+from core import console
+from core.market_data import price_board, update_price, PRICE_MAX_AGE_SECONDS
+from core.scheduler import scheduler
+from core.symbols import symbol_registry
+from core.utils import lazy_import
+
+np = lazy_import("numpy")
+
+# Seconds between evaluations (each one refreshes stale prices with one bulk ticker call)
+RISK_INTERVAL_SECONDS = float(os.getenv("TRENDR_RISK_INTERVAL", "2"))
+# Largest share of portfolio equity one base asset may take (1 disables the cap)
+MAX_ASSET_SHARE = float(os.getenv("TRENDR_MAX_ASSET_SHARE", "1"))
+# Portfolio drawdown from its equity peak that exits every bot (0 disables it)
+MAX_DRAWDOWN_PERCENTAGE = float(os.getenv("TRENDR_MAX_DRAWDOWN", "20"))
+
+# Per-bot defaults, overridable with the bot_data keys of the same name
+STOP_LOSS_PERCENTAGE = 5
+TAKE_PROFIT_PERCENTAGE = 10
+TRAILING_STOP_PERCENTAGE = 2
+
+INITIAL_CAPACITY = 64
+
+# Exit reasons, in priority order when several apply
+STOP_LOSS = "stop-loss"
+TAKE_PROFIT = "take-profit"
+TRAILING_STOP = "trailing-stop"
+EXPOSURE_CAP = "exposure-cap"
+DRAWDOWN = "portfolio-drawdown"
+
+FLOAT_COLUMNS = ("base_quantity", "quote_quantity", "starting_value", "highest_price", "stop_loss", "take_profit", "trailing_stop", "last_equity")
+INT_COLUMNS = ("symbol_id", "quote_symbol_id", "asset_id")
+# bot_data keys the engine reads, all a position needs to be checked in another process
+POSITION_KEYS = ("symbol", "base_current_currency_quantity", "quote_current_currency_quantity", "starting_trade_amount",
+                 "highest_market_price", "stop_loss_percentage", "take_profit_percentage", "trailing_stop_loss_percentage", "risk_exit")
+
+# quote_symbol_id of bots quoted in USDT, and of quotes without a <quote>USDT pair (never priced)
+USDT_QUOTE = -1
+UNPRICED_QUOTE = -2
+
+
+class PortfolioRisk:
+    """
+    Columnar store of every bot's position and the vectorized exit checks.
+    """
+    def __init__(self, capacity=INITIAL_CAPACITY, max_asset_share=MAX_ASSET_SHARE, max_drawdown=MAX_DRAWDOWN_PERCENTAGE, registry=symbol_registry):
+        self.registry = registry
+        self.lock = threading.Lock()
+        self.max_asset_share = max_asset_share
+        self.max_drawdown = max_drawdown
+        self.capacity = 0
+        self.columns = {}
+        self.active = None
+        self.names = []        # slot -> bot_name (None for free slots)
+        self.slots = {}        # bot_name -> slot
+        self.free = []
+        self.bots = {}         # bot_name -> (bot_data, on_exit)
+        self.asset_caps = {}   # base asset -> absolute cap in USDT
+        self.peak_equity = 0.0
+        self.timer = None
+        self.initial_capacity = capacity  # Arrays are allocated on the first register, keeping numpy off the import path
+
+    def _grow(self, capacity):
+        for name in FLOAT_COLUMNS:
+            column = np.zeros(capacity)
+            if name in self.columns:
+                column[:self.capacity] = self.columns[name]
+            self.columns[name] = column
+        for name in INT_COLUMNS:
+            column = np.full(capacity, -1, dtype=np.int32)
+            if name in self.columns:
+                column[:self.capacity] = self.columns[name]
+            self.columns[name] = column
+        active = np.zeros(capacity, dtype=bool)
+        if self.active is not None:
+            active[:self.capacity] = self.active
+        self.active = active
+        self.names.extend([None] * (capacity - self.capacity))
+        self.free.extend(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def _quote_symbol_id(self, quote):
+        if quote == "USDT":
+            return USDT_QUOTE
+        pair = self.registry.pair(quote, "USDT")
+        if pair is None:
+            # Not loaded yet (or listed since the last refresh): look the pair up directly
+            try:
+                pair = self.registry.get(f"{quote}USDT")
+            except ValueError:
+                return UNPRICED_QUOTE
+        return pair.id
+
+    @property
+    def symbols(self):
+        """Symbols (and quote/USDT pairs) the running bots need prices for."""
+        with self.lock:
+            if not self.slots:
+                return []
+            used = np.flatnonzero(self.active)
+            ids = np.unique(np.r_[self.columns["symbol_id"][used], self.columns["quote_symbol_id"][used]])
+        return [self.registry.by_id(symbol_id).symbol for symbol_id in ids[ids >= 0]]
+
+    def _price_array(self, prices, symbol_ids, quote_ids):
+        """Prices of the given symbols as an array indexed by registry id (NaN where unknown)."""
+        symbol_prices = np.full(len(self.registry), np.nan)
+        for symbol_id in np.unique(np.r_[symbol_ids, quote_ids[quote_ids >= 0]]):
+            price = prices.get(self.registry.by_id(symbol_id).symbol)
+            if price is not None:
+                symbol_prices[symbol_id] = float(price)
+        return symbol_prices
+
+    @staticmethod
+    def _quote_prices(symbol_prices, quote_ids):
+        return np.where(quote_ids >= 0, symbol_prices[np.maximum(quote_ids, 0)], np.where(quote_ids == USDT_QUOTE, 1.0, np.nan))
+
+    def register(self, bot_name, bot_data, on_exit=None):
+        """
+        Adds a running bot. `on_exit()` is called (from the risk thread) when
+        the bot must exit, after bot_data["risk_exit"] has been set.
+        """
+        with self.lock:
+            if bot_name not in self.slots:
+                if not self.free:
+                    self._grow(max(self.capacity * 2, self.initial_capacity))
+                slot = self.slots[bot_name] = self.free.pop()
+                self.names[slot] = bot_name
+                columns = self.columns
+                symbol_info = self.registry.get(bot_data["symbol"])
+                columns["symbol_id"][slot] = symbol_info.id
+                columns["quote_symbol_id"][slot] = self._quote_symbol_id(symbol_info.quote)
+                columns["asset_id"][slot] = symbol_info.base_id
+                columns["highest_price"][slot] = 0.0
+                columns["last_equity"][slot] = 0.0
+                self.active[slot] = True
+            self.bots[bot_name] = (bot_data, on_exit)
+        self.update(bot_name, bot_data)
+        self._start()
+
+    def unregister(self, bot_name):
+        with self.lock:
+            slot = self.slots.pop(bot_name, None)
+            self.bots.pop(bot_name, None)
+            if slot is None:
+                return
+            self.active[slot] = False
+            self.names[slot] = None
+            self.free.append(slot)
+            # The bot's equity leaves the portfolio with it, which is not a drawdown
+            self.peak_equity = max(self.peak_equity - self.columns["last_equity"][slot], 0.0)
+            if not self.slots and self.timer:
+                self.timer.cancel()
+                self.timer = None
+                self.peak_equity = 0.0
+
+    def update(self, bot_name, bot_data):
+        """
+        Writes the bot's current position and stop settings into its slot.
+        """
+        with self.lock:
+            slot = self.slots.get(bot_name)
+            if slot is None:
+                return
+            columns = self.columns
+            columns["base_quantity"][slot] = float(bot_data["base_current_currency_quantity"])
+            columns["quote_quantity"][slot] = float(bot_data["quote_current_currency_quantity"])
+            columns["starting_value"][slot] = float(bot_data["starting_trade_amount"])
+            columns["highest_price"][slot] = max(columns["highest_price"][slot], float(bot_data.get("highest_market_price") or 0))
+            columns["stop_loss"][slot] = bot_data.get("stop_loss_percentage", STOP_LOSS_PERCENTAGE)
+            columns["take_profit"][slot] = bot_data.get("take_profit_percentage", TAKE_PROFIT_PERCENTAGE)
+            columns["trailing_stop"][slot] = bot_data.get("trailing_stop_loss_percentage", TRAILING_STOP_PERCENTAGE)
+
+    def set_asset_cap(self, asset, cap):
+        """Caps the USDT value all bots together may hold in `asset` (None removes the cap)."""
+        with self.lock:
+            if cap is None:
+                self.asset_caps.pop(asset, None)
+            else:
+                self.asset_caps[asset] = float(cap)
+
+    # ---- Evaluation ----
+
+    def evaluate(self, prices, max_asset_share=None, max_drawdown=None):
+        """
+        Marks every position to `prices` and runs all exit checks in one pass.
+
+        Parameters:
+            prices (dict): symbol -> price for the symbols (and quote/USDT pairs) in use.
+                Bots whose prices are missing are skipped, and so is the drawdown check.
+            max_asset_share (float): Largest share of total equity one base asset may take
+                (defaults to the engine's setting).
+            max_drawdown (float): Portfolio drawdown (percent) from the equity peak that exits
+                every bot (defaults to the engine's setting).
+
+        Returns:
+            dict: bot_name -> exit reason for every bot that must exit.
+        """
+        max_asset_share = self.max_asset_share if max_asset_share is None else max_asset_share
+        max_drawdown = self.max_drawdown if max_drawdown is None else max_drawdown
+        with self.lock:
+            if not self.slots:
+                return {}
+            used = np.flatnonzero(self.active)
+            columns = {name: column[used] for name, column in self.columns.items()}
+            quote_ids = columns["quote_symbol_id"]
+            symbol_prices = self._price_array(prices, columns["symbol_id"], quote_ids)
+            asset_count = len(self.registry.assets)
+            caps = np.full(asset_count, np.inf)
+            for asset, cap in self.asset_caps.items():
+                if asset in self.registry.asset_ids:
+                    caps[self.registry.asset_ids[asset]] = cap
+            names = [self.names[slot] for slot in used]
+
+            price = symbol_prices[columns["symbol_id"]]
+            quote_usdt = self._quote_prices(symbol_prices, quote_ids)
+            priced = ~(np.isnan(price) | np.isnan(quote_usdt))
+
+            base = columns["base_quantity"]
+            exposure = np.where(priced, base * price * quote_usdt, 0.0)
+            equity = np.where(priced, exposure + columns["quote_quantity"] * quote_usdt, 0.0)
+            highest = np.where(priced, np.maximum(columns["highest_price"], price), columns["highest_price"])
+            self.columns["highest_price"][used] = highest
+            self.columns["last_equity"][used] = np.where(priced, equity, columns["last_equity"])
+
+            # Per-bot stops
+            starting = columns["starting_value"]
+            change = np.divide(equity - starting, starting, out=np.zeros_like(equity), where=starting > 0) * 100
+            stop_loss = priced & (change <= -columns["stop_loss"])
+            take_profit = priced & (change >= columns["take_profit"])
+            trailing = priced & (base > 0) & (price < highest * (1 - columns["trailing_stop"] / 100))
+
+            # Exposure caps: within each over-cap asset, the largest holders exit until the rest fit
+            asset_ids = columns["asset_id"]
+            total_equity = equity.sum()
+            asset_exposure = np.bincount(asset_ids, weights=exposure, minlength=asset_count)
+            limits = caps
+            if max_asset_share < 1:
+                limits = np.minimum(caps, max_asset_share * total_equity)
+            excess = asset_exposure - limits
+            over_cap = np.zeros(len(used), dtype=bool)
+            if (excess > 0).any():
+                order = np.lexsort((-exposure, asset_ids))
+                sorted_assets = asset_ids[order]
+                sorted_exposure = exposure[order]
+                cumulative = np.cumsum(sorted_exposure)
+                group_start = np.r_[0, np.flatnonzero(np.diff(sorted_assets)) + 1]
+                group_offset = np.repeat(cumulative[group_start] - sorted_exposure[group_start], np.diff(np.r_[group_start, len(order)]))
+                removed_before = cumulative - sorted_exposure - group_offset
+                over_cap[order] = (sorted_exposure > 0) & (removed_before < excess[sorted_assets])
+
+            # Aggregate drawdown, only when every bot is priced (a missing price would read as a loss)
+            drawdown = 0.0
+            if priced.all():
+                self.peak_equity = max(self.peak_equity, total_equity)
+                drawdown = (self.peak_equity - total_equity) / self.peak_equity * 100 if self.peak_equity else 0.0
+            portfolio_exit = np.zeros(len(used), dtype=bool)
+            if max_drawdown and drawdown >= max_drawdown:
+                portfolio_exit = priced & (base > 0)
+
+            exits = {}
+            for mask, reason in ((portfolio_exit, DRAWDOWN), (over_cap, EXPOSURE_CAP), (trailing, TRAILING_STOP), (take_profit, TAKE_PROFIT), (stop_loss, STOP_LOSS)):
+                for index in np.flatnonzero(mask):
+                    exits[names[index]] = reason  # Later masks take priority
+            return exits
+
+    def buy_allowance(self, asset, prices, max_asset_share=None):
+        """
+        USDT value that may still be added to `asset` before its cap is reached
+        (infinite when the asset has no cap).
+        """
+        max_asset_share = self.max_asset_share if max_asset_share is None else max_asset_share
+        with self.lock:
+            limit = self.asset_caps.get(asset, float("inf"))
+            asset_id = self.registry.asset_ids.get(asset)
+            if asset_id is None or not self.slots or (limit == float("inf") and max_asset_share >= 1):
+                return limit
+            used = np.flatnonzero(self.active)
+            symbol_ids = self.columns["symbol_id"][used]
+            quote_ids = self.columns["quote_symbol_id"][used]
+            symbol_prices = self._price_array(prices, symbol_ids, quote_ids)
+            price = np.nan_to_num(symbol_prices[symbol_ids])
+            quote_usdt = np.nan_to_num(self._quote_prices(symbol_prices, quote_ids))
+            exposure = self.columns["base_quantity"][used] * price * quote_usdt
+            total_equity = (exposure + self.columns["quote_quantity"][used] * quote_usdt).sum()
+            if max_asset_share < 1:
+                limit = min(limit, max_asset_share * total_equity)
+            return limit - exposure[self.columns["asset_id"][used] == asset_id].sum()
+
+    def allowances(self, prices, max_asset_share=None):
+        """
+        buy_allowance of every capped or held asset at once, for bots checked from another process.
+
+        Returns:
+            tuple: ({asset: USDT allowance}, allowance of any other asset).
+        """
+        max_asset_share = self.max_asset_share if max_asset_share is None else max_asset_share
+        with self.lock:
+            if not self.slots:
+                return dict(self.asset_caps), float("inf")
+            used = np.flatnonzero(self.active)
+            symbol_ids = self.columns["symbol_id"][used]
+            quote_ids = self.columns["quote_symbol_id"][used]
+            asset_ids = self.columns["asset_id"][used]
+            symbol_prices = self._price_array(prices, symbol_ids, quote_ids)
+            price = np.nan_to_num(symbol_prices[symbol_ids])
+            quote_usdt = np.nan_to_num(self._quote_prices(symbol_prices, quote_ids))
+            exposure = self.columns["base_quantity"][used] * price * quote_usdt
+            total_equity = (exposure + self.columns["quote_quantity"][used] * quote_usdt).sum()
+            share_limit = max_asset_share * total_equity if max_asset_share < 1 else float("inf")
+            asset_exposure = np.bincount(asset_ids, weights=exposure, minlength=len(self.registry.assets))
+            allowances = {asset: min(cap, share_limit) for asset, cap in self.asset_caps.items()}
+            for asset_id in np.unique(asset_ids):
+                asset = self.registry.assets[asset_id]
+                allowances[asset] = float(min(self.asset_caps.get(asset, float("inf")), share_limit) - asset_exposure[asset_id])
+            return allowances, float(share_limit)
+
+    # ---- Periodic evaluation ----
+
+    def _start(self):
+        with self.lock:
+            if self.timer is None and self.slots:
+                self.timer = scheduler.call_later(RISK_INTERVAL_SECONDS, self._tick)
+
+    def _tick(self):
+        # Runs on the scheduler thread: only hand off to a worker thread
+        threading.Thread(target=self.check, daemon=True).start()
+
+    def check(self):
+        """Refreshes prices, evaluates every bot and signals the ones that must exit."""
+        try:
+            exits = self.evaluate(current_prices(self.symbols))
+            for bot_name, reason in exits.items():
+                entry = self.bots.get(bot_name)
+                if entry is None:
+                    continue
+                bot_data, on_exit = entry
+                if bot_data.get("risk_exit"):
+                    continue
+                console.warn(bot_name, "Portfolio risk: %s, exiting", reason, color="error")
+                bot_data["risk_exit"] = reason
+                if on_exit:
+                    on_exit()
+        except Exception as e:
+            console.error(None, "Portfolio risk check failed: %s", e)
+        finally:
+            with self.lock:
+                self.timer = scheduler.call_later(RISK_INTERVAL_SECONDS, self._tick) if self.slots else None
+
+
+def current_prices(symbols):
+    """
+    Prices from the price board, refreshing stale ones with a single bulk ticker call.
+    """
+    now = scheduler.clock()
+    prices = {}
+    stale = set()
+    for symbol in symbols:
+        entry = price_board.get(symbol)
+        if entry and now - entry[0] <= PRICE_MAX_AGE_SECONDS:
+            prices[symbol] = entry[1]
+        else:
+            stale.add(symbol)
+    if stale:
+        for ticker in binance_client.get_all_tickers():
+            if ticker["symbol"] in stale:
+                update_price(ticker["symbol"], ticker["price"])
+                prices[ticker["symbol"]] = ticker["price"]
+    return prices
+
+
+portfolio_risk = PortfolioRisk()
+# Paper bots get per-bot stops only: their positions are not part of the real portfolio
+paper_risk = PortfolioRisk(max_asset_share=1, max_drawdown=0)
+
+
+def risk_engine(bot_data):
+    """The engine a bot's positions are checked by."""
+    return paper_risk if bot_data.get("paper") else portfolio_risk
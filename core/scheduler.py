@@ -0,0 +1,292 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+from config.bot_config import binance_client
+from core import console
+
+# Every kline interval Binance supports. "1M" is a calendar month and is handled separately.
+INTERVAL_TO_SECONDS = {
+    "1s": 1,
+    "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "2h": 7200, "4h": 14400, "6h": 21600, "8h": 28800, "12h": 43200,
+    "1d": 86400, "3d": 259200, "1w": 604800, "1M": 2592000,
+}
+
+# Weekly candles open on Monday 00:00 UTC; the epoch was a Thursday.
+WEEK_ANCHOR_SECONDS = 4 * 86400
+
+SERVER_TIME_RESYNC_SECONDS = 600
+
+
+def interval_seconds(interval):
+    """
+    Returns the length of a kline interval in seconds (30 days for "1M").
+    """
+    try:
+        return INTERVAL_TO_SECONDS[interval]
+    except KeyError:
+        raise ValueError(f"Unsupported interval: {interval}. Use one of {', '.join(INTERVAL_TO_SECONDS)}.")
+
+
+def candle_open_time(interval, timestamp):
+    """
+    Returns the open time (epoch seconds, UTC) of the candle containing `timestamp`.
+    """
+    if interval == "1M":
+        moment = datetime.fromtimestamp(timestamp, timezone.utc)
+        return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc).timestamp()
+    seconds = interval_seconds(interval)
+    anchor = WEEK_ANCHOR_SECONDS if interval == "1w" else 0
+    return (timestamp - anchor) // seconds * seconds + anchor
+
+
+def next_candle_close(interval, timestamp):
+    """
+    Returns the close time (epoch seconds, UTC) of the candle containing `timestamp`,
+    which is also the open time of the next candle.
+    """
+    if interval == "1M":
+        moment = datetime.fromtimestamp(timestamp, timezone.utc)
+        year, month = (moment.year + 1, 1) if moment.month == 12 else (moment.year, moment.month + 1)
+        return datetime(year, month, 1, tzinfo=timezone.utc).timestamp()
+    return candle_open_time(interval, timestamp) + interval_seconds(interval)
+
+
+class TimerHandle:
+    """A scheduled callback. `cancel()` removes it lazily from the heap."""
+    __slots__ = ("when", "callback", "cancelled")
+
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class CandleScheduler:
+    """
+    One timer heap and one thread for every bot in the process.
+
+    Times are kept on the Binance server clock (local clock plus a tracked offset
+    from `get_server_time`). Each interval in use has a single recurring entry that
+    fires exactly on candle close and fans out to all subscribed bots; trade-window
+    deadlines are ordinary one-shot entries on the same heap.
+    """
+    def __init__(self, client=binance_client, clock=time.time):
+        self.client = client
+        self.clock = clock
+        self.speed = 1.0
+        self.offset = 0.0
+        self.synced = False
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._subscribers = {}  # interval -> {token: callback}
+        self._interval_timers = {}
+        self._thread = None
+        self._resync_scheduled = False
+
+    # ---- Server clock ----
+    def sync_server_time(self):
+        """
+        Measures the offset between the local clock and Binance server time,
+        using the midpoint of the request as the local reference.
+        """
+        try:
+            sent = self.clock()
+            server_ms = self.client.get_server_time()["serverTime"]
+            received = self.clock()
+        except Exception as e:
+            console.warn(None, "Server time sync failed, keeping offset %.3fs: %s", self.offset, e)
+            return self.offset
+        self.offset = server_ms / 1000 - (sent + received) / 2
+        self.synced = True
+        console.debug(None, "Server time offset %.3fs (rtt %.0fms)", self.offset, (received - sent) * 1000)
+        return self.offset
+
+    def now(self):
+        """Current Binance server time in epoch seconds."""
+        return self.clock() + self.offset
+
+    def server_time_ms(self):
+        return int(self.now() * 1000)
+
+    def set_clock(self, clock, speed=1.0):
+        """
+        Replaces the local clock, e.g. with a replay clock running `speed` times
+        faster than wall time. Pending timers are re-evaluated against it.
+        """
+        with self._condition:
+            self.clock = clock
+            self.speed = speed
+            self._condition.notify()
+
+    # ---- Timer heap ----
+    def start(self):
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="candle-scheduler", daemon=True)
+            self._thread.start()
+            # One periodic resync chain, however many times the thread is (re)started
+            resync = not self.synced and not self._resync_scheduled
+            self._resync_scheduled = self._resync_scheduled or resync
+        if resync:
+            self.sync_server_time()
+            self.call_later(SERVER_TIME_RESYNC_SECONDS, self._resync)
+
+    def _resync(self):
+        # Runs off the scheduler thread so a slow REST call never delays candle closes
+        threading.Thread(target=self.sync_server_time, daemon=True).start()
+        self.call_later(SERVER_TIME_RESYNC_SECONDS, self._resync)
+
+    def call_at(self, when, callback):
+        """
+        Runs `callback()` on the scheduler thread at server time `when`.
+        Callbacks must be quick (set an event, flip a flag).
+        """
+        handle = TimerHandle(when, callback)
+        with self._condition:
+            heapq.heappush(self._heap, (when, next(self._sequence), handle))
+            if self._heap[0][2] is handle:
+                self._condition.notify()
+        if self._thread is None:
+            self.start()
+        return handle
+
+    def call_later(self, delay, callback):
+        return self.call_at(self.now() + delay, callback)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    timeout = self._heap[0][0] - self.now() if self._heap else None
+                    if timeout is not None and timeout <= 0:
+                        handle = heapq.heappop(self._heap)[2]
+                        break
+                    self._condition.wait(timeout / self.speed if timeout is not None else None)
+            try:
+                handle.callback()
+            except Exception as e:
+                console.error(None, "Scheduler callback failed: %s", e)
+
+    # ---- Candle subscriptions ----
+    def subscribe(self, interval, callback):
+        """
+        Calls `callback(close_time)` at every candle close of `interval`.
+        Returns a token for `unsubscribe`.
+        """
+        interval_seconds(interval)  # Validate
+        token = object()
+        with self._condition:
+            subscribers = self._subscribers.setdefault(interval, {})
+            subscribers[token] = callback
+            schedule = interval not in self._interval_timers
+            if schedule:
+                self._interval_timers[interval] = None
+        if schedule:
+            self._schedule_close(interval)
+        return interval, token
+
+    def unsubscribe(self, subscription):
+        interval, token = subscription
+        with self._condition:
+            subscribers = self._subscribers.get(interval, {})
+            subscribers.pop(token, None)
+            if not subscribers:
+                self._subscribers.pop(interval, None)
+                timer = self._interval_timers.pop(interval, None)
+                if timer:
+                    timer.cancel()
+
+    def _schedule_close(self, interval):
+        close_time = next_candle_close(interval, self.now())
+        timer = self.call_at(close_time, lambda: self._fire_close(interval, close_time))
+        with self._condition:
+            if interval in self._interval_timers:
+                self._interval_timers[interval] = timer
+            else:
+                timer.cancel()  # Last subscriber left while we were scheduling
+
+    def _fire_close(self, interval, close_time):
+        with self._condition:
+            callbacks = list(self._subscribers.get(interval, {}).values())
+            active = interval in self._interval_timers
+        for callback in callbacks:
+            try:
+                callback(close_time)
+            except Exception as e:
+                console.error(None, "Candle close callback failed: %s", e)
+        if active:
+            self._schedule_close(interval)
+
+    def clock_for(self, interval, window=None):
+        """
+        Returns a BotClock that wakes on each `interval` candle close and expires
+        after `window` (a timedelta) if one is given.
+        """
+        return BotClock(self, interval, window)
+
+
+class BotClock:
+    """
+    Per-bot view of the scheduler: an event set on candle close or on expiry.
+    """
+    def __init__(self, scheduler, interval, window=None):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.event = threading.Event()
+        self.expired = False
+        self.closed = False
+        self.interrupted = False
+        self.close_time = None
+        scheduler.start()
+        self._subscription = scheduler.subscribe(interval, self._on_close)
+        self._deadline = None
+        if window is not None:
+            self._deadline = scheduler.call_later(window.total_seconds(), self._on_deadline)
+
+    def _on_close(self, close_time):
+        self.close_time = close_time
+        self.event.set()
+
+    def _on_deadline(self):
+        self.expired = True
+        self.event.set()
+
+    def interrupt(self):
+        """Wakes the bot without waiting for the candle close; wait() returns False from then on."""
+        self.interrupted = True
+        self.event.set()
+
+    def resume(self):
+        """Clears an interrupt, so wait() blocks until the next candle close again."""
+        self.interrupted = False
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the next candle close. Returns False if the trade window
+        expired or the clock was interrupted or closed instead.
+        """
+        self.event.wait(timeout)
+        self.event.clear()
+        return not (self.expired or self.closed or self.interrupted)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.scheduler.unsubscribe(self._subscription)
+        if self._deadline:
+            self._deadline.cancel()
+        self.event.set()
+
+
+scheduler = CandleScheduler()
@@ -0,0 +1,364 @@
+"""
+Market-wide screener: ranks every USDT pair by the EMA crossover strategy's
+signals to pick symbols for new bots.
+
+Closed bars come from the local candle store for symbols a bot already
+follows, and otherwise from a compact per-(symbol, interval) NumPy store kept
+by the screener. The first screen of an interval starts watching it: its bars
+are refreshed in the background right away and then after every bar close,
+and screens rank whatever is cached without waiting. A refresh only asks the
+exchange for bars closed since the last one, on a small thread pool throttled
+to TRENDR_SCREENER_RATE requests per second so that running bots keep their
+share of the API weight.
+
+Ranking stacks the last bars of every pair into (symbols x time) matrices
+and computes, in one pass for all of them:
+
+    strength      short EMA over long EMA in percent (trend_strength in core.trader)
+    score         short EMA minus long EMA in ATRs, comparable across prices
+    atr_pct       ATR as a percent of the close (the ATR band, price-independent)
+    trend         long EMA rising over `trend_bars` bars with the close above it
+    bars_since_cross   bars since the short EMA last crossed the long one
+
+EMA and ATR are the strategy's own (calculate_ema, atr_from_klines). A pair
+passes when its strength clears crossover_threshold (the buy condition of
+check_ema_threshold), its ATR is inside the band and the trend filter holds.
+"""
+import collections
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.bot_config import binance_client
+from core import console
+from core.candles import candle_aggregator, resampled, BAR_HISTORY
+from core.scheduler import scheduler, interval_seconds
+from core.symbols import symbol_registry, TRADING
+from core.utils import lazy_import
+
+np = lazy_import("numpy")
+
+# Kline requests per second the screener may make, and how many run at once
+SCREENER_RATE = float(os.getenv("TRENDR_SCREENER_RATE", "20"))
+SCREENER_CONCURRENCY = int(os.getenv("TRENDR_SCREENER_CONCURRENCY", "8"))
+# Closed bars ranked per pair (more are kept when the windows need them)
+SCREENER_BARS = 100
+SCREEN_QUOTE = "USDT"
+# Seconds after a bar close before the watched bars are refreshed, so the exchange has closed it
+REFRESH_DELAY_SECONDS = 2
+
+# Screen parameter -> (type, default)
+SCREEN_PARAMS = {
+    "interval": (str, "1h"),
+    "short_window": (int, 5),
+    "long_window": (int, 20),
+    "atr_window": (int, 14),
+    "crossover_threshold": (float, 0.0),
+    "atr_low": (float, 0.2),
+    "atr_high": (float, 5.0),
+    "trend_bars": (int, 5),
+    "top": (int, 20),
+}
+
+
+def parse_screen_params(values):
+    """
+    Screen parameters of a request, validated, with defaults for the missing ones.
+
+    Raises:
+        ValueError: If a parameter has the wrong type or is out of range.
+    """
+    params = {}
+    for name, (kind, default) in SCREEN_PARAMS.items():
+        value = values.get(name)
+        if value is None:
+            params[name] = default
+            continue
+        try:
+            params[name] = kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be {'an integer' if kind is int else 'a number' if kind is float else 'a string'}")
+    interval_seconds(params["interval"])  # Raises ValueError for unsupported intervals
+    if not 1 <= params["short_window"] < params["long_window"]:
+        raise ValueError("short_window must be at least 1 and below long_window")
+    if params["atr_window"] < 1 or params["trend_bars"] < 1 or params["top"] < 1:
+        raise ValueError("atr_window, trend_bars and top must be at least 1")
+    if not 0 <= params["atr_low"] <= params["atr_high"]:
+        raise ValueError("atr_low and atr_high must satisfy 0 <= atr_low <= atr_high")
+    return params
+
+
+def required_bars(long_window, atr_window, trend_bars):
+    """Closed bars a pair needs before it can be ranked."""
+    return max(long_window + trend_bars, atr_window + 1)
+
+
+# ---- Matrix indicators ----
+
+def weighted_ma_matrix(closes, window):
+    """
+    calculate_ema of every prefix of every row: a (symbols x time) matrix, NaN
+    until the window is full.
+    """
+    weights = np.exp(np.linspace(-1., 0., window))
+    weights /= weights.sum()
+    out = np.full(closes.shape, np.nan)
+    # np.convolve flips the kernel: the newest price gets weights[0]
+    out[:, window - 1:] = np.lib.stride_tricks.sliding_window_view(closes, window, axis=1) @ weights[::-1]
+    return out
+
+
+def atr_matrix(highs, lows, closes, window):
+    """Latest atr_from_klines value of every row."""
+    previous = closes[:, :-1]
+    true_range = np.maximum(highs[:, 1:] - lows[:, 1:], np.maximum(np.abs(highs[:, 1:] - previous), np.abs(lows[:, 1:] - previous)))
+    return true_range[:, -window:].mean(axis=1)
+
+
+def rank(symbols, highs, lows, closes, short_window=5, long_window=20, atr_window=14,
+         crossover_threshold=0.0, atr_low=0.2, atr_high=5.0, trend_bars=5, top=20):
+    """
+    Ranks pairs from their aligned bars.
+
+    Parameters:
+        symbols (list): Pair of each row.
+        highs, lows, closes (ndarray): (symbols x time) float64 matrices, oldest bar first.
+        short_window, long_window (int): EMA windows.
+        atr_window (int): ATR window.
+        crossover_threshold (float): Minimum strength, in percent.
+        atr_low, atr_high (float): ATR band as a percent of the close.
+        trend_bars (int): Bars over which the long EMA must have risen.
+        top (int): Number of results.
+
+    Returns:
+        tuple: (result dicts with the best score first, number of pairs that passed).
+    """
+    if not len(symbols):
+        return [], 0
+    short_ema = weighted_ma_matrix(closes, short_window)
+    long_ema = weighted_ma_matrix(closes, long_window)
+    atr = atr_matrix(highs, lows, closes, atr_window)
+    last_short, last_long, last_close = short_ema[:, -1], long_ema[:, -1], closes[:, -1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strength = (last_short / last_long - 1) * 100
+        score = np.where(atr > 0, (last_short - last_long) / atr, 0.0)
+        atr_pct = atr / last_close * 100
+    trend = (last_long > long_ema[:, -1 - trend_bars]) & (last_close > last_long)
+
+    above = short_ema[:, long_window - 1:] > long_ema[:, long_window - 1:]
+    flips = above[:, 1:] != above[:, :-1]
+    # Index of the last flip counted from the end; rows without one get their whole history
+    since = np.where(flips.any(axis=1), np.argmax(flips[:, ::-1], axis=1), flips.shape[1])
+
+    passed = (strength > crossover_threshold) & (atr_pct >= atr_low) & (atr_pct <= atr_high) & trend
+    candidates = np.flatnonzero(passed)
+    order = candidates[np.argsort(-score[candidates], kind="stable")][:top]
+    results = [{
+        "symbol": symbols[row],
+        "score": float(score[row]),
+        "strength": float(strength[row]),
+        "atr_pct": float(atr_pct[row]),
+        "close": float(last_close[row]),
+        "bars_since_cross": int(since[row]),
+    } for row in order]
+    return results, len(candidates)
+
+
+# ---- Bar store ----
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, in bursts of up to `burst`."""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Screener:
+    """
+    Closed bars of every screened pair as [open time ms, high, low, close]
+    arrays, refreshed incrementally after each bar close of a watched
+    interval, and the ranking over them.
+    """
+    def __init__(self, client=binance_client, rate=SCREENER_RATE, concurrency=SCREENER_CONCURRENCY):
+        self.client = client
+        self.limiter = RateLimiter(rate)
+        self.concurrency = concurrency
+        self.bars = {}  # (symbol, interval) -> ndarray (bars x 4)
+        self.lock = threading.Lock()  # One refresh at a time, so overlapping refreshes share requests
+        self.requests = 0  # Kline requests made, for monitoring
+        self.watches = {}  # interval -> {"length", "pairs", "symbols", "subscription"}
+        self.watch_lock = threading.Lock()
+        self.refreshing = collections.Counter()  # interval -> refreshes started and not finished
+        self.last_refresh = {}  # interval -> {"failed", "refresh_seconds", "refreshed_at"}
+
+    def pairs(self, quote=SCREEN_QUOTE):
+        """Trading pairs quoted in `quote`, from the symbol registry."""
+        if not symbol_registry.loaded:
+            symbol_registry.refresh()
+        return [entry.symbol for entry in list(symbol_registry.symbols) if entry.quote == quote and entry.status == TRADING]
+
+    def _fetch(self, symbol, interval, limit, start_ms=None):
+        """Closed klines: the last `limit`, or the first `limit` from `start_ms`."""
+        self.limiter.acquire()
+        self.requests += 1
+        params = {"startTime": start_ms, "limit": limit} if start_ms is not None else {"limit": limit + 1}
+        now_ms = scheduler.server_time_ms()
+        klines = [kline for kline in self.client.get_klines(symbol=symbol, interval=interval, **params) if kline[6] < now_ms]
+        return klines if start_ms is not None else klines[-limit:]
+
+    def _refresh_symbol(self, symbol, interval, limit):
+        if symbol in candle_aggregator.symbols and resampled(interval) and limit <= BAR_HISTORY:
+            # A bot follows this symbol: its 1m stream is synced for every candle close anyway
+            klines = candle_aggregator.get_closed_klines(symbol, interval, limit)
+        else:
+            step_ms = interval_seconds(interval) * 1000
+            held = self.bars.get((symbol, interval))
+            behind = (scheduler.server_time_ms() - held[-1, 0]) // step_ms - 1 if held is not None else None
+            if held is not None and len(held) >= limit and behind < limit:
+                if behind < 1:
+                    return  # The next bar has not closed yet
+                klines = self._fetch(symbol, interval, limit, int(held[-1, 0]) + step_ms)
+                if klines:
+                    fresh = np.array([[kline[0], kline[2], kline[3], kline[4]] for kline in klines], dtype=np.float64)
+                    self.bars[(symbol, interval)] = np.concatenate([held, fresh])[-limit:]
+                return
+            klines = self._fetch(symbol, interval, limit)
+        if klines:
+            self.bars[(symbol, interval)] = np.array([[kline[0], kline[2], kline[3], kline[4]] for kline in klines], dtype=np.float64)[-limit:]
+
+    def refresh(self, symbols, interval, limit):
+        """
+        Brings the bars of `symbols` up to date, `concurrency` requests at a time.
+
+        Returns:
+            list: Symbols whose refresh failed.
+        """
+        failed = []
+
+        def refresh_one(symbol):
+            try:
+                self._refresh_symbol(symbol, interval, limit)
+            except Exception as e:
+                console.debug(None, "Screener refresh of %s failed: %s", symbol, e)
+                failed.append(symbol)
+
+        with self.lock:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                list(pool.map(refresh_one, symbols))
+        return failed
+
+    def watch(self, interval, length, symbols=None):
+        """
+        Keeps the last `length` bars of `symbols` (every USDT pair by default)
+        refreshed after each `interval` bar close, refreshing right away when
+        this asks for more than was watched so far.
+        """
+        with self.watch_lock:
+            watch = self.watches.get(interval)
+            if watch is None:
+                watch = self.watches[interval] = {"length": 0, "pairs": False, "symbols": set(), "subscription": None}
+            changed = length > watch["length"] or (not watch["pairs"] if symbols is None else not watch["symbols"].issuperset(symbols))
+            watch["length"] = max(watch["length"], length)
+            if symbols is None:
+                watch["pairs"] = True
+            else:
+                watch["symbols"].update(symbols)
+            if watch["subscription"] is None:
+                watch["subscription"] = scheduler.subscribe(interval, lambda close_time: scheduler.call_later(REFRESH_DELAY_SECONDS, lambda: self._start_refresh(interval)))
+        if changed:
+            self._start_refresh(interval)
+
+    def _start_refresh(self, interval):
+        # Runs on the scheduler thread on bar closes: only hand off to a worker thread
+        with self.watch_lock:
+            self.refreshing[interval] += 1
+        threading.Thread(target=self._refresh_watched, args=(interval,), name=f"screener-{interval}", daemon=True).start()
+
+    def _refresh_watched(self, interval):
+        try:
+            with self.watch_lock:
+                watch = self.watches[interval]
+                symbols, length, pairs = set(watch["symbols"]), watch["length"], watch["pairs"]
+            if pairs:
+                symbols.update(self.pairs())
+            started = time.perf_counter()
+            failed = self.refresh(sorted(symbols), interval, length)
+            self.last_refresh[interval] = {"failed": failed, "refresh_seconds": time.perf_counter() - started, "refreshed_at": scheduler.now()}
+        except Exception as e:
+            console.warn(None, "Screener refresh of %s bars failed: %s", interval, e)
+        finally:
+            with self.watch_lock:
+                self.refreshing[interval] -= 1
+
+    def matrices(self, symbols, interval, length):
+        """
+        Stacks the last `length` bars of every symbol that has them.
+
+        Returns:
+            tuple: (ranked symbols, highs, lows, closes).
+        """
+        ranked, rows = [], []
+        for symbol in symbols:
+            held = self.bars.get((symbol, interval))
+            if held is not None and len(held) >= length:
+                ranked.append(symbol)
+                rows.append(held[-length:])
+        if not rows:
+            empty = np.empty((0, length))
+            return ranked, empty, empty, empty
+        stacked = np.stack(rows)
+        return ranked, stacked[:, :, 1], stacked[:, :, 2], stacked[:, :, 3]
+
+    def screen(self, interval="1h", short_window=5, long_window=20, atr_window=14, crossover_threshold=0.0,
+               atr_low=0.2, atr_high=5.0, trend_bars=5, top=20, symbols=None):
+        """
+        Ranks every USDT pair (or `symbols`) on the cached bars, and watches them
+        so later screens see bars refreshed after each close. Pairs without
+        enough cached bars yet (e.g. on the first screen of an interval) are not ranked.
+
+        Returns:
+            dict: {"interval", "screened", "ranked", "passed", "refreshing", "refreshed_at",
+                "failed" and "refresh_seconds" of the last refresh, "rank_seconds",
+                "results": best first}.
+        """
+        length = max(SCREENER_BARS, required_bars(long_window, atr_window, trend_bars))
+        self.watch(interval, length, list(symbols) if symbols is not None else None)
+        symbols = list(symbols) if symbols is not None else self.pairs()
+        started = time.perf_counter()
+        ranked, highs, lows, closes = self.matrices(symbols, interval, length)
+        results, passed = rank(ranked, highs, lows, closes, short_window, long_window, atr_window,
+                               crossover_threshold, atr_low, atr_high, trend_bars, top)
+        last = self.last_refresh.get(interval, {})
+        return {
+            "interval": interval,
+            "screened": len(symbols),
+            "ranked": len(ranked),
+            "passed": passed,
+            "refreshing": self.refreshing[interval] > 0,
+            "refreshed_at": last.get("refreshed_at"),
+            "failed": last.get("failed", []),
+            "refresh_seconds": last.get("refresh_seconds"),
+            "rank_seconds": time.perf_counter() - started,
+            "results": results,
+        }
+
+
+screener = Screener()
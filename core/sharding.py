@@ -0,0 +1,503 @@
+import itertools
+import multiprocessing
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from config.bot_config import binance_client
+from core import console, risk
+from core.market_data import update_price
+from core.equity import equity_series
+from core.shared_ring import PriceRing
+
+RING_CAPACITY = 4096
+PRICE_PUMP_SECONDS = 2
+RING_POLL_SECONDS = 0.05
+COMMAND_TIMEOUT_SECONDS = 10
+
+# bot_data keys that never leave a process
+LOCAL_ONLY_KEYS = {"logger", "logger_thread"}
+
+
+def shard_for(symbol, workers):
+    """
+    Stable shard index for a symbol (Python's hash() is randomized per process).
+    """
+    return zlib.crc32(symbol.encode()) % workers
+
+
+def serializable_bot_data(bot_data):
+    return {key: value for key, value in bot_data.items() if key not in LOCAL_ONLY_KEYS}
+
+
+# ---- Worker process ----
+
+class ShardRisk:
+    """
+    Worker-side stand-in for core.risk.portfolio_risk.
+
+    Positions go to the coordinator, whose engine checks the bots of every shard
+    as one portfolio (per-asset caps and drawdown included) and sends back exits
+    and the buy allowance of each asset after every check.
+    """
+    def __init__(self, send):
+        self.send = send
+        self.bots = {}  # bot_name -> (bot_data, on_exit)
+        self.allowances = {}
+        self.default_allowance = float("inf")
+        self.symbols = []  # Prices are the coordinator's
+
+    def register(self, bot_name, bot_data, on_exit=None):
+        self.bots[bot_name] = (bot_data, on_exit)
+        self.send(("event", "risk", "register", bot_name, risk_position(bot_data)))
+
+    def update(self, bot_name, bot_data):
+        if bot_name in self.bots:
+            self.send(("event", "risk", "update", bot_name, risk_position(bot_data)))
+
+    def unregister(self, bot_name):
+        if self.bots.pop(bot_name, None):
+            self.send(("event", "risk", "unregister", bot_name, None))
+
+    def buy_allowance(self, asset, prices, max_asset_share=None):
+        """Allowance from the coordinator's last check (at most one risk interval old)."""
+        return self.allowances.get(asset, self.default_allowance)
+
+    def exit(self, bot_name, reason):
+        entry = self.bots.get(bot_name)
+        if entry is None:
+            return False
+        bot_data, on_exit = entry
+        if not bot_data.get("risk_exit"):
+            bot_data["risk_exit"] = reason
+            if on_exit:
+                on_exit()
+        return True
+
+
+def risk_position(bot_data):
+    return {key: bot_data[key] for key in risk.POSITION_KEYS if key in bot_data}
+
+
+def worker_main(shard_id, conn, ring_name, ring_capacity):
+    """
+    Entry point of a shard worker process.
+
+    Runs the bots assigned to this shard on local threads, keeps the local price
+    board in sync with the coordinator's shared-memory ring, and serves commands
+    received over `conn`: ("start", bot_name, bot_data), ("stop", bot_names, timeout),
+    ("drain", timeout), ("statuses",), ("equity", bot_name, points),
+    ("profile", bot_name, seconds, hz), ("latency",), ("log_level", level, bot_name, fmt),
+    ("risk_exit", bot_name, reason), ("risk_allowances", allowances, default) and ("shutdown",).
+    """
+    from core.trader import trading_loop
+    from core import lifecycle, rest
+    from core.profiler import sample_stacks, bot_threads
+
+    bots = {}
+    send_lock = threading.Lock()
+    stopping = threading.Event()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    shard_risk = risk.portfolio_risk = ShardRisk(send)
+
+    def read_prices():
+        ring = PriceRing.attach(ring_name, ring_capacity)
+        cursor = ring.head()
+        try:
+            while not stopping.is_set():
+                records, cursor = ring.read_since(cursor)
+                for symbol, timestamp, price in records:
+                    update_price(symbol, price, timestamp)
+                stopping.wait(RING_POLL_SECONDS)
+        finally:
+            ring.close()
+
+    def run_bot(bot_name, bot_data):
+        try:
+            trading_loop(bot_name, bot_data)
+        finally:
+            bots.pop(bot_name, None)
+            console.clear_level(bot_name)
+            send(("event", "exited", bot_name))
+
+    def stop_bots(bot_names, timeout=lifecycle.SHUTDOWN_SECONDS):
+        """Stops bots of this shard at once; returns ({bot_name: final bot_data}, [still running])."""
+        stopping = {bot_name: bots[bot_name] for bot_name in bot_names if bot_name in bots}
+        still_running = lifecycle.stop_bots(stopping, timeout)
+        for bot_name in stopping:
+            if bot_name not in still_running:
+                bots.pop(bot_name, None)
+        return {bot_name: serializable_bot_data(bot["data"]) for bot_name, bot in stopping.items()}, still_running
+
+    def profile(request_id, bot_name, seconds, hz):
+        # Runs on its own thread so the command loop keeps serving while it samples
+        try:
+            bot = bots.get(bot_name)
+            if bot_name is None:
+                result = sample_stacks(seconds, labels=bot_threads(bots), hz=hz)
+            elif bot is None:
+                result = None  # Exited: the coordinator answers 404
+            elif bot["thread"].ident is None:
+                raise RuntimeError(f"Bot {bot_name} has not started yet")
+            else:
+                result = sample_stacks(seconds, threads={bot["thread"].ident: bot_name}, hz=hz)
+            send(("reply", request_id, True, result))
+        except Exception as e:
+            send(("reply", request_id, False, repr(e)))
+
+    threading.Thread(target=read_prices, name=f"shard-{shard_id}-prices", daemon=True).start()
+    console.info(None, "Shard %s worker started", shard_id)
+
+    while True:
+        try:
+            request_id, command, *args = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            if command == "start":
+                bot_name, bot_data = args
+                thread = threading.Thread(target=run_bot, args=(bot_name, bot_data), daemon=True)
+                bots[bot_name] = {"data": bot_data, "thread": thread}
+                thread.start()
+                result = True
+            elif command == "stop":
+                result = stop_bots(*args)
+            elif command == "drain":
+                result = stop_bots(list(bots), *args)
+            elif command == "statuses":
+                result = {name: serializable_bot_data(bot["data"]) for name, bot in list(bots.items())}
+            elif command == "latency":
+                result = rest.report()
+            elif command == "log_level":
+                level, bot_name, fmt = args
+                result = console.set_level(level, bot_name)
+                if fmt is not None:
+                    console.set_format(fmt)
+            elif command == "equity":
+                result = equity_series(*args)
+            elif command == "risk_exit":
+                result = shard_risk.exit(*args)
+            elif command == "risk_allowances":
+                shard_risk.allowances, shard_risk.default_allowance = args
+                result = True
+            elif command == "profile":
+                threading.Thread(target=profile, args=(request_id, *args), name=f"shard-{shard_id}-profiler", daemon=True).start()
+                continue
+            elif command == "shutdown":
+                send(("reply", request_id, True, stop_bots(list(bots))))
+                break
+            else:
+                raise ValueError(f"Unknown shard command: {command}")
+            send(("reply", request_id, True, result))
+        except Exception as e:
+            send(("reply", request_id, False, repr(e)))
+
+    stopping.set()
+    console.flush(1)
+
+
+# ---- Coordinator ----
+
+class Shard:
+    def __init__(self, shard_id, process, conn):
+        self.shard_id = shard_id
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.pending = {}
+        self.alive = True
+
+
+class ShardedRuntime:
+    """
+    Coordinator side of the sharded runtime, owned by the Flask control plane.
+
+    Bots are assigned to one of `workers` processes by symbol hash, so every bot
+    on a symbol shares a process (and its price board). Commands and replies go
+    over one pipe per worker; market prices are published once into a shared
+    memory ring that all workers read. Workers report their bots' positions, so
+    the coordinator's portfolio_risk checks them all as one portfolio.
+    """
+    def __init__(self, workers, on_bot_exit=None):
+        self.workers = workers
+        self.on_bot_exit = on_bot_exit
+        self.ring = PriceRing.create(RING_CAPACITY)
+        self.shards = []
+        self.symbols = {}  # symbol -> number of bots using it
+        self.risk_positions = {}  # bot_name -> position mirrored into portfolio_risk
+        self._request_ids = itertools.count(1)
+        self._symbols_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        context = multiprocessing.get_context("spawn")
+        for shard_id in range(workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=worker_main,
+                args=(shard_id, child_conn, self.ring.name, RING_CAPACITY),
+                name=f"trendr-shard-{shard_id}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            shard = Shard(shard_id, process, parent_conn)
+            self.shards.append(shard)
+            threading.Thread(target=self._receive, args=(shard,), name=f"shard-{shard_id}-receiver", daemon=True).start()
+
+        self._pump = threading.Thread(target=self._pump_prices, name="price-pump", daemon=True)
+        self._pump.start()
+        threading.Thread(target=self._push_allowances, name="risk-allowances", daemon=True).start()
+
+    def shard_of(self, symbol):
+        return self.shards[shard_for(symbol, self.workers)]
+
+    def _receive(self, shard):
+        while True:
+            try:
+                message = shard.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "reply":
+                _, request_id, ok, result = message
+                future = shard.pending.pop(request_id, None)
+                if future:
+                    if ok:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(RuntimeError(result))
+            elif message[0] == "event" and message[1] == "exited":
+                if self.on_bot_exit:
+                    self.on_bot_exit(message[2])
+            elif message[0] == "event" and message[1] == "risk":
+                try:
+                    self._mirror_position(shard, *message[2:])
+                except Exception as e:
+                    console.error(message[3], "Could not add the position to the portfolio risk checks: %s", e)
+
+        shard.alive = False
+        for bot_name, (owner, _) in list(self.risk_positions.items()):
+            if owner is shard:
+                self._mirror_position(shard, "unregister", bot_name, None)
+        for future in list(shard.pending.values()):
+            future.set_exception(RuntimeError(f"Shard {shard.shard_id} exited"))
+        shard.pending.clear()
+        if not self._stopping.is_set():
+            console.error(None, "Shard %s worker exited unexpectedly", shard.shard_id)
+
+    def _mirror_position(self, shard, op, bot_name, position):
+        """Applies a worker's register/update/unregister to the coordinator's portfolio_risk."""
+        if op == "unregister":
+            self.risk_positions.pop(bot_name, None)
+            risk.portfolio_risk.unregister(bot_name)
+            return
+        entry = self.risk_positions.get(bot_name)
+        if entry is None or op == "register":
+            mirror = dict(position)
+            self.risk_positions[bot_name] = (shard, mirror)
+            risk.portfolio_risk.register(bot_name, mirror, on_exit=lambda: self._send_exit(shard, bot_name, mirror))
+        else:
+            mirror = entry[1]
+            mirror.update(position)
+            risk.portfolio_risk.update(bot_name, mirror)
+
+    def _send_exit(self, shard, bot_name, mirror):
+        # Called from the risk thread after portfolio_risk set mirror["risk_exit"]; the worker
+        # clears its own copy (and reports it) when the bot keeps a position after exiting
+        try:
+            self._request(shard, "risk_exit", bot_name, mirror["risk_exit"])
+        except Exception as e:
+            console.error(bot_name, "Could not send the risk exit to shard %s: %s", shard.shard_id, e)
+
+    def _push_allowances(self):
+        """
+        Sends every live shard the buy allowance of each asset, from the positions of all shards.
+        """
+        while not self._stopping.wait(risk.RISK_INTERVAL_SECONDS):
+            try:
+                engine = risk.portfolio_risk
+                allowances = engine.allowances(risk.current_prices(engine.symbols))
+                for shard in self.shards:
+                    if shard.alive:
+                        self._request(shard, "risk_allowances", *allowances)
+            except Exception as e:
+                console.warn(None, "Could not send buy allowances to the shards: %s", e)
+
+    def _request(self, shard, command, *args):
+        if not shard.alive:
+            raise RuntimeError(f"Shard {shard.shard_id} is not running")
+        request_id = next(self._request_ids)
+        future = Future()
+        shard.pending[request_id] = future
+        with shard.send_lock:
+            shard.conn.send((request_id, command, *args))
+        return future
+
+    def _pump_prices(self):
+        """
+        Publishes prices for every symbol in use with one bulk ticker call per tick.
+        """
+        while not self._stopping.wait(PRICE_PUMP_SECONDS):
+            with self._symbols_lock:
+                symbols = set(self.symbols)
+            if not symbols:
+                continue
+            try:
+                tickers = binance_client.get_all_tickers()
+            except Exception as e:
+                console.warn(None, "Price pump failed: %s", e)
+                continue
+            now = time.time()
+            for ticker in tickers:
+                if ticker["symbol"] in symbols:
+                    self.ring.publish(ticker["symbol"], now, float(ticker["price"]))
+                    update_price(ticker["symbol"], ticker["price"], now)
+
+    def start_bot(self, bot_name, bot_data):
+        symbol = bot_data["symbol"]
+        with self._symbols_lock:
+            self.symbols[symbol] = self.symbols.get(symbol, 0) + 1
+        shard = self.shard_of(symbol)
+        try:
+            self._request(shard, "start", bot_name, serializable_bot_data(bot_data)).result(COMMAND_TIMEOUT_SECONDS)
+        except TimeoutError:
+            # The shard may still start it after we give up: queue a stop behind the start
+            # so no bot trades there unseen by the registry
+            try:
+                self._request(shard, "stop", [bot_name], COMMAND_TIMEOUT_SECONDS)
+            except Exception as e:
+                console.error(bot_name, "Could not cancel the timed out start on shard %s: %s", shard.shard_id, e)
+            raise
+        return shard.shard_id
+
+    def release_symbol(self, symbol):
+        with self._symbols_lock:
+            count = self.symbols.get(symbol, 0) - 1
+            if count > 0:
+                self.symbols[symbol] = count
+            else:
+                self.symbols.pop(symbol, None)
+
+    def stop_bots(self, bots, timeout):
+        """
+        Stops bots with one request per shard, all waited for against one deadline.
+
+        Parameters:
+            bots (dict): bot_name -> symbol.
+            timeout (float): Longest wait for the bots' threads, on every shard at once.
+
+        Returns:
+            tuple: ({bot_name: final bot_data}, [bots still running after `timeout`],
+                {bot_name: error} for the shards that could not be asked).
+        """
+        by_shard = {}
+        for bot_name, symbol in bots.items():
+            by_shard.setdefault(self.shard_of(symbol), []).append(bot_name)
+        requests, failed = [], {}
+        for shard, bot_names in by_shard.items():
+            try:
+                requests.append((bot_names, self._request(shard, "stop", bot_names, timeout)))
+            except Exception as e:
+                failed.update(dict.fromkeys(bot_names, e))
+        deadline = time.monotonic() + timeout + COMMAND_TIMEOUT_SECONDS
+        states, still_running = {}, []
+        for bot_names, future in requests:
+            try:
+                shard_states, shard_running = future.result(max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                failed.update(dict.fromkeys(bot_names, e))
+                continue
+            states.update(shard_states)
+            still_running.extend(shard_running)
+        return states, still_running, failed
+
+    def statuses(self):
+        """
+        Gathers {bot_name: bot_data} from every live shard in parallel.
+        """
+        futures = [self._request(shard, "statuses") for shard in self.shards if shard.alive]
+        statuses = {}
+        for future in futures:
+            try:
+                statuses.update(future.result(COMMAND_TIMEOUT_SECONDS))
+            except Exception as e:
+                console.warn(None, "Shard status request failed: %s", e)
+        return statuses
+
+    def latency(self):
+        """{shard_id: per-endpoint REST report} of every live shard."""
+        futures = {shard.shard_id: self._request(shard, "latency") for shard in self.shards if shard.alive}
+        return {shard_id: future.result(COMMAND_TIMEOUT_SECONDS) for shard_id, future in futures.items()}
+
+    def set_log_level(self, level, bot_name=None, symbol=None, fmt=None):
+        """
+        Sets a bot's console level on its symbol's shard, or the default level
+        (and `fmt`, if given) on every live shard.
+        """
+        if bot_name is not None:
+            futures = [self._request(self.shard_of(symbol), "log_level", level, bot_name, fmt)]
+        else:
+            futures = [self._request(shard, "log_level", level, None, fmt) for shard in self.shards if shard.alive]
+        for future in futures:
+            future.result(COMMAND_TIMEOUT_SECONDS)
+
+    def equity(self, bot_name, symbol, points):
+        return self._request(self.shard_of(symbol), "equity", bot_name, points).result(COMMAND_TIMEOUT_SECONDS)
+
+    def profile(self, seconds, hz, bot_name=None, symbol=None):
+        """
+        Samples one bot (on its symbol's shard) or every shard at once.
+
+        Returns:
+            dict: Root prefix ("" for one bot, "shard-N/" per shard) -> profile, for merge_profiles.
+
+        Raises:
+            LookupError: If the bot is no longer running on its shard.
+            RuntimeError: If the shard could not sample it (e.g. it has not started yet).
+        """
+        if bot_name is not None:
+            profile = self._request(self.shard_of(symbol), "profile", bot_name, seconds, hz).result(seconds + COMMAND_TIMEOUT_SECONDS)
+            if profile is None:
+                raise LookupError(f"Bot {bot_name} is not running on its shard")
+            return {"": profile}
+        futures = {f"shard-{shard.shard_id}/": self._request(shard, "profile", None, seconds, hz) for shard in self.shards if shard.alive}
+        return {prefix: future.result(seconds + COMMAND_TIMEOUT_SECONDS) for prefix, future in futures.items()}
+
+    def drain(self, timeout):
+        """
+        Stops every bot on every live shard at once, keeping the shards running.
+
+        Returns:
+            tuple: ({bot_name: final bot_data}, [bots still running after `timeout`]).
+        """
+        futures = [self._request(shard, "drain", timeout) for shard in self.shards if shard.alive]
+        deadline = time.monotonic() + timeout + COMMAND_TIMEOUT_SECONDS
+        states, still_running = {}, []
+        for future in futures:
+            try:
+                shard_states, shard_running = future.result(max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                console.warn(None, "Shard drain request failed: %s", e)
+                continue
+            states.update(shard_states)
+            still_running.extend(shard_running)
+        return states, still_running
+
+    def shutdown(self, timeout=COMMAND_TIMEOUT_SECONDS):
+        self._stopping.set()
+        futures = [self._request(shard, "shutdown") for shard in self.shards if shard.alive]
+        deadline = time.monotonic() + timeout
+        for future in futures:
+            try:
+                future.result(max(deadline - time.monotonic(), 0))
+            except Exception:
+                pass
+        for shard in self.shards:
+            shard.process.join(timeout=1)
+            if shard.process.is_alive():
+                shard.process.terminate()
+        self.ring.close()
+        self.ring.unlink()
@@ -0,0 +1,84 @@
+import struct
+from multiprocessing import shared_memory
+
+# Header: sequence number of the last published record
+HEADER = struct.Struct("<Q")
+# Record: sequence, symbol (ASCII, NUL padded), timestamp, price
+RECORD = struct.Struct("<Q16sdd")
+SEQUENCE = struct.Struct("<Q")
+
+
+class PriceRing:
+    """
+    Fixed-capacity ring of (symbol, timestamp, price) records in shared memory.
+
+    There is a single writer (the shard coordinator) and any number of readers
+    (worker processes). Each slot carries the sequence number it was written
+    with; the writer zeroes it before touching the payload, so a reader that
+    sees the same sequence before and after copying a slot has a consistent
+    record, and a reader that falls more than `capacity` records behind skips
+    ahead instead of reading overwritten data.
+    """
+    def __init__(self, memory, capacity):
+        self.memory = memory
+        self.capacity = capacity
+        self.buffer = memory.buf
+
+    @classmethod
+    def create(cls, capacity=4096):
+        size = HEADER.size + RECORD.size * capacity
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        memory.buf[:size] = bytes(size)
+        return cls(memory, capacity)
+
+    @classmethod
+    def attach(cls, name, capacity):
+        return cls(shared_memory.SharedMemory(name=name), capacity)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def _offset(self, sequence):
+        return HEADER.size + (sequence % self.capacity) * RECORD.size
+
+    def head(self):
+        return HEADER.unpack_from(self.buffer, 0)[0]
+
+    def publish(self, symbol, timestamp, price):
+        sequence = self.head() + 1
+        offset = self._offset(sequence)
+        SEQUENCE.pack_into(self.buffer, offset, 0)  # Mark slot as being written
+        RECORD.pack_into(self.buffer, offset, 0, symbol.encode("ascii"), timestamp, price)
+        SEQUENCE.pack_into(self.buffer, offset, sequence)
+        HEADER.pack_into(self.buffer, 0, sequence)
+        return sequence
+
+    def read_since(self, cursor):
+        """
+        Returns ([(symbol, timestamp, price), ...], new_cursor) for every record
+        published after `cursor`.
+        """
+        head = self.head()
+        if head - cursor > self.capacity:
+            cursor = head - self.capacity  # Lapped: oldest records are gone
+        records = []
+        while cursor < head:
+            sequence = cursor + 1
+            offset = self._offset(sequence)
+            written, symbol, timestamp, price = RECORD.unpack_from(self.buffer, offset)
+            if written != sequence or SEQUENCE.unpack_from(self.buffer, offset)[0] != sequence:
+                if written > sequence:
+                    cursor = sequence  # Overwritten while we were reading; skip it
+                    continue
+                break  # Still being written; pick it up next time
+            records.append((symbol.rstrip(b"\0").decode("ascii"), timestamp, price))
+            cursor = sequence
+        return records, cursor
+
+    def close(self):
+        self.buffer = None
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
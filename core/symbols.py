@@ -0,0 +1,185 @@
+"""
+Registry of every pair listed on the exchange, built from exchangeInfo.
+
+Each symbol gets a dense integer id (and each asset one as well) the first
+time it is seen. Ids are never reused or renumbered, so per-symbol state can
+live in plain arrays indexed by id (see core.risk); a pair that is delisted
+keeps its id with a non-trading status. Lookups by symbol, by id and by
+(base, quote) are single dict/list accesses, and the exchange filters a trade
+needs (lot size, minimum notional) are parsed once per listing change
+instead of on every order.
+
+The registry is refreshed from a full exchangeInfo response at startup and
+then every TRENDR_SYMBOL_REFRESH seconds; a refresh only touches the entries
+whose listing changed. A symbol looked up before the first refresh (or listed
+since the last one) is fetched on its own.
+"""
+import collections
+import os
+import threading
+from decimal import Decimal
+from config.bot_config import binance_client
+from core import console
+from core.scheduler import scheduler
+
+# Seconds between exchangeInfo refreshes (0 disables the periodic refresh)
+SYMBOL_REFRESH_SECONDS = float(os.getenv("TRENDR_SYMBOL_REFRESH", "3600"))
+
+TRADING = "TRADING"
+# Status of a pair that disappeared from exchangeInfo
+DELISTED = "DELISTED"
+
+SymbolInfo = collections.namedtuple("SymbolInfo", ["id", "symbol", "base", "quote", "base_id", "quote_id", "status", "min_qty", "step_size", "min_notional", "info"])
+
+
+def parse_symbol_info(symbol_id, symbol_info, asset_id):
+    """
+    Builds the SymbolInfo of one exchangeInfo "symbols" entry.
+
+    Parameters:
+        symbol_id (int): Id of the symbol.
+        symbol_info (dict): The exchangeInfo entry.
+        asset_id (callable): asset -> id.
+    """
+    min_qty, step_size, min_notional = Decimal('1.0'), Decimal('1.0'), Decimal('0.0')
+    for filter in symbol_info.get("filters", []):
+        if filter["filterType"] == "LOT_SIZE":
+            min_qty, step_size = Decimal(filter["minQty"]), Decimal(filter["stepSize"])
+        elif filter["filterType"] in ("MIN_NOTIONAL", "NOTIONAL"):
+            min_notional = Decimal(filter["minNotional"])
+    base, quote = symbol_info["baseAsset"], symbol_info["quoteAsset"]
+    return SymbolInfo(
+        symbol_id, symbol_info["symbol"], base, quote, asset_id(base), asset_id(quote),
+        symbol_info.get("status", TRADING), min_qty, step_size, min_notional, symbol_info,
+    )
+
+
+class SymbolRegistry:
+    """
+    symbol -> SymbolInfo with dense, stable integer ids for symbols and assets.
+    """
+    def __init__(self, client=binance_client):
+        self.client = client
+        self.lock = threading.Lock()
+        self.symbols = []      # symbol_id -> SymbolInfo
+        self.ids = {}          # symbol -> symbol_id
+        self.pairs = {}        # (base, quote) -> symbol_id
+        self.assets = []       # asset_id -> asset
+        self.asset_ids = {}    # asset -> asset_id
+        self.loaded = False
+        self.timer = None
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.ids
+
+    def _asset_id(self, asset):
+        asset_id = self.asset_ids.get(asset)
+        if asset_id is None:
+            self.assets.append(asset)
+            asset_id = self.asset_ids[asset] = len(self.assets) - 1
+        return asset_id
+
+    def _store(self, symbol_info):
+        """Adds or updates one listing; returns True when anything changed. Caller holds the lock."""
+        symbol_id = self.ids.get(symbol_info["symbol"])
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.symbols.append(None)
+        elif self.symbols[symbol_id].info == symbol_info and self.symbols[symbol_id].status != DELISTED:
+            return False
+        entry = parse_symbol_info(symbol_id, symbol_info, self._asset_id)
+        self.symbols[symbol_id] = entry  # Published before the id so readers never see an id without its entry
+        self.ids[entry.symbol] = symbol_id
+        self.pairs[(entry.base, entry.quote)] = symbol_id
+        return True
+
+    def load(self, symbols_info):
+        """
+        Applies a full exchangeInfo "symbols" list: new pairs get the next ids,
+        changed ones are replaced in place and pairs no longer listed are
+        marked DELISTED.
+
+        Returns:
+            tuple: (added, changed, delisted) counts.
+        """
+        added = changed = delisted = 0
+        with self.lock:
+            listed = set()
+            for symbol_info in symbols_info:
+                listed.add(symbol_info["symbol"])
+                known = symbol_info["symbol"] in self.ids
+                if self._store(symbol_info):
+                    if known:
+                        changed += 1
+                    else:
+                        added += 1
+            for symbol_id, entry in enumerate(self.symbols):
+                if entry.symbol not in listed and entry.status != DELISTED:
+                    self.symbols[symbol_id] = entry._replace(status=DELISTED)
+                    delisted += 1
+            self.loaded = True
+        return added, changed, delisted
+
+    def refresh(self):
+        """Reloads exchangeInfo and schedules the next periodic refresh."""
+        added, changed, delisted = self.load(self.client.get_exchange_info().get("symbols", []))
+        if changed or delisted:
+            console.info(None, "Symbol registry: %d new, %d changed, %d delisted pairs", added, changed, delisted)
+        self._schedule()
+
+    def _schedule(self):
+        with self.lock:
+            if self.timer is None and SYMBOL_REFRESH_SECONDS > 0:
+                self.timer = scheduler.call_later(SYMBOL_REFRESH_SECONDS, self._tick)
+
+    def _tick(self):
+        # Runs on the scheduler thread: the request itself goes to a worker thread
+        with self.lock:
+            self.timer = None
+        threading.Thread(target=self._periodic_refresh, daemon=True).start()
+
+    def _periodic_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            console.error(None, "Symbol registry refresh failed: %s", e)
+            self._schedule()
+
+    def get(self, symbol):
+        """
+        Returns the SymbolInfo of `symbol`, fetching it from the exchange if it is not known yet.
+
+        Raises:
+            ValueError: If the exchange does not list the symbol.
+        """
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is not None:
+            return self.symbols[symbol_id]
+        symbol_info = self.client.get_symbol_info(symbol)
+        if symbol_info is None:
+            raise ValueError(f"Unknown symbol: {symbol}")
+        with self.lock:
+            self._store(symbol_info)
+            return self.symbols[self.ids[symbol]]
+
+    def by_id(self, symbol_id):
+        return self.symbols[symbol_id]
+
+    def id(self, symbol):
+        return self.get(symbol).id
+
+    def pair(self, base, quote):
+        """SymbolInfo of the pair trading `base` against `quote`, or None if it is not listed."""
+        symbol_id = self.pairs.get((base, quote))
+        return None if symbol_id is None else self.symbols[symbol_id]
+
+    def split(self, symbol):
+        """(base, quote) assets of a symbol."""
+        entry = self.get(symbol)
+        return entry.base, entry.quote
+
+
+symbol_registry = SymbolRegistry()
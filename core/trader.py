@@ -1,21 +1,27 @@
 from decimal import Decimal
-from core.utils import get_notional_limit, get_quantity_precision, adjust_quantity, colorize_cli_text, parse_trade_window, get_current_datetime
-from strategies.ema_strategy import calculate_ema
+from core.utils import get_notional_limit, get_quantity_precision, adjust_quantity, parse_trade_window, get_current_datetime
+from strategies.ema_strategy import required_indicators
 from config.bot_config import binance_client, COLORS
-from core.logger import start_logger, wsprint, create_message_data
+from core.logger import start_logger, stop_logger, wsprint, create_message_data
+from core import console
+from core import lifecycle
+from core.scheduler import scheduler
+from core.market_data import get_price, get_usdt_price
 import time
-from datetime import datetime
-import pytz
-import numpy as np
-import pandas as pd
+from datetime import datetime, timedelta
+# core.risk, core.orderbook, core.execution, core.paper, core.indicators, core.candles and
+# core.equity are imported where they are used, keeping them out of the control plane's startup
 
-
-sydney_tz = pytz.timezone('Australia/Sydney')
+# Most sell orders one risk exit sends before leaving the rest to the next risk check
+EXIT_ORDERS = 5
 
 def buy_crypto(symbol, bot_data):
+    from core.execution import BUY
+    from core.orderbook import limit_slippage, MAX_SLIPPAGE_BPS
+    from core.risk import risk_engine, current_prices
     try:
         min_notional = get_notional_limit(symbol)
-        price = Decimal(binance_client.get_symbol_ticker(symbol=symbol)["price"])
+        price = get_price(symbol)
         min_qty, step_size = get_quantity_precision(symbol)
         
         # Calculate trade amount using quote_current_currency_quantity
@@ -28,7 +34,25 @@ def buy_crypto(symbol, bot_data):
             adjusted_quantity = min_notional / price
             adjusted_quantity = adjust_quantity(adjusted_quantity, min_qty, step_size)
         
-        required_quote_balance = adjusted_quantity * price
+        # Cap slippage and price the order from the local book when one is live
+        adjusted_quantity, book_price = limit_slippage(symbol, BUY, adjusted_quantity, min_qty, step_size)
+        if book_price is not None:
+            price = book_price
+            if adjusted_quantity * price < min_notional:
+                raise ValueError(f"Order book too thin: {adjusted_quantity} {bot_data['base_currency']} within the slippage limit is below minimum notional {min_notional}")
+        
+        # The fill is booked at the batch price, which may come in above `price`: keep the slippage cap as headroom
+        headroom = 1 + Decimal(str(MAX_SLIPPAGE_BPS)) / Decimal('10000')
+        affordable = adjust_quantity(bot_data["quote_current_currency_quantity"] / (price * headroom), min_qty, step_size)
+        if affordable < adjusted_quantity and affordable * price >= min_notional:
+            adjusted_quantity = affordable
+        required_quote_balance = adjusted_quantity * price * headroom
+        
+        # Check the portfolio exposure cap of the base currency
+        engine = risk_engine(bot_data)
+        allowance = engine.buy_allowance(bot_data["base_currency"], current_prices(engine.symbols))
+        if float(required_quote_balance * get_usdt_price(bot_data["quote_currency"])) > allowance:
+            raise ValueError(f"Exposure cap for {bot_data['base_currency']} reached: {max(allowance, 0):.2f} USDT left")
         
         # Check for sufficient quote balance
         if bot_data["quote_current_currency_quantity"] < required_quote_balance:
@@ -36,20 +60,29 @@ def buy_crypto(symbol, bot_data):
                 f"{COLORS['error']}Insufficient {bot_data['quote_currency']} balance: required {required_quote_balance}, available {bot_data['quote_current_currency_quantity']}{COLORS['reset']}"
             )
         
-        # Place market buy order
-        order = binance_client.order_market_buy(symbol=symbol, quantity=f"{adjusted_quantity:.8f}")
+        # Place market buy order (netted with other bots on this symbol; filled in-process for paper bots)
+        fill = order_router(bot_data).submit(symbol, BUY, adjusted_quantity, price, bot_data.get("bot_name"))
+        if fill.quantity <= 0:
+            raise ValueError(f"Buy order for {adjusted_quantity} {bot_data['base_currency']} was not filled")
+        order = fill.order
+        adjusted_quantity = fill.quantity
+        price = fill.price
         
-        # Calculate fees and update bot_data
+        # Calculate fees (only the exchange-routed part pays them) and update bot_data
         fee_rate = get_fee_rate(symbol)
         total_cost = adjusted_quantity * price
-        fee = total_cost * fee_rate
+        fee = fill.exchange_quantity * price * fee_rate
         net_cost = total_cost + fee
+        if total_cost > bot_data["quote_current_currency_quantity"]:
+            console.error(bot_data.get("bot_name"), "Buy filled at %s, beyond the headroom: cost %s exceeds the %s %s balance", price, total_cost, bot_data["quote_current_currency_quantity"], bot_data["quote_currency"])
         
         bot_data["current_trade_amount"] -= net_cost
         bot_data["base_current_currency_quantity"] += adjusted_quantity
         bot_data["quote_current_currency_quantity"] -= total_cost
         
-        print(f'BUYING {bot_data["base_currency"]} WITH {bot_data["quote_currency"]}')
+        risk_engine(bot_data).update(bot_data.get("bot_name"), bot_data)
+        
+        console.info(bot_data.get("bot_name"), "BUYING %s WITH %s", bot_data["base_currency"], bot_data["quote_currency"], color="buy")
         bot_data["successful_trades"] += 1
         bot_data["total_buys"] += 1
         bot_data["total_trades"] += 1
@@ -65,35 +98,51 @@ def buy_crypto(symbol, bot_data):
         
         return order
     except Exception as e:
-        print(f"Error placing buy order: {e}")
+        console.error(bot_data.get("bot_name"), "Error placing buy order: %s", e)
         bot_data["failed_trades"] += 1
         bot_data["total_trades"] += 1
         return False
     
-def sell_crypto(symbol, bot_data):
+def sell_crypto(symbol, bot_data, quantity=None):
+    from core.execution import SELL
+    from core.orderbook import limit_slippage
+    from core.risk import risk_engine
     try:
         min_notional = get_notional_limit(symbol)
-        price = Decimal(binance_client.get_symbol_ticker(symbol=symbol)["price"])
+        price = get_price(symbol)
         min_qty, step_size = get_quantity_precision(symbol)
 
-        # Use trade allocation to determine quantity to sell
-        trade_amount = Decimal(bot_data["current_trade_amount"]) * (Decimal(bot_data["trade_allocation"]) / Decimal('100.0'))
-        quantity = min(trade_amount / price, bot_data["base_current_currency_quantity"])  # Sell only what we have
+        if quantity is None:
+            # Use trade allocation to determine quantity to sell
+            trade_amount = Decimal(bot_data["current_trade_amount"]) * (Decimal(bot_data["trade_allocation"]) / Decimal('100.0'))
+            quantity = trade_amount / price
+        quantity = min(quantity, bot_data["base_current_currency_quantity"])  # Sell only what we have
         adjusted_quantity = adjust_quantity(quantity, min_qty, step_size)
          
         if bot_data["base_current_currency_quantity"] < adjusted_quantity:
             raise ValueError(f"Insufficient base currency balance: required {adjusted_quantity}, available {bot_data['base_current_currency_quantity']}")
             return false
         
+        # Cap slippage and price the order from the local book when one is live
+        adjusted_quantity, book_price = limit_slippage(symbol, SELL, adjusted_quantity, min_qty, step_size)
+        if book_price is not None:
+            price = book_price
+
         trade_value = adjusted_quantity * price
         if trade_value < min_notional:
             raise ValueError(f"Trade value {trade_value} is below minimum notional {min_notional}")
             return false
 
-        order = binance_client.order_market_sell(symbol=symbol, quantity=f"{adjusted_quantity:.8f}")
+        fill = order_router(bot_data).submit(symbol, SELL, adjusted_quantity, price, bot_data.get("bot_name"))
+        if fill.quantity <= 0:
+            raise ValueError(f"Sell order for {adjusted_quantity} {bot_data['base_currency']} was not filled")
+        order = fill.order
+        adjusted_quantity = fill.quantity
+        price = fill.price
+        trade_value = adjusted_quantity * price
         
         fee_rate = get_fee_rate(symbol)
-        fee = trade_value * fee_rate
+        fee = fill.exchange_quantity * price * fee_rate
         net_value = trade_value - fee
 
         # Update bot_data after the sell
@@ -102,8 +151,9 @@ def sell_crypto(symbol, bot_data):
         bot_data["quote_current_currency_quantity"] += trade_value
 
         bot_data["base_current_currency_quantity"] = max(Decimal('0.0'), bot_data["base_current_currency_quantity"])
+        risk_engine(bot_data).update(bot_data.get("bot_name"), bot_data)
 
-        print(f'SELLING {bot_data["base_currency"]} FOR {bot_data["quote_currency"]}')
+        console.info(bot_data.get("bot_name"), "SELLING %s FOR %s", bot_data["base_currency"], bot_data["quote_currency"], color="sell")
         bot_data["successful_trades"] += 1
         bot_data["total_sells"] += 1
         bot_data["total_trades"] += 1
@@ -120,37 +170,51 @@ def sell_crypto(symbol, bot_data):
         return order
         # return order
     except Exception as e:
-        print(f"Error placing sell order: {e}")
-        # print(f"Error placing sell order: {e}")
+        console.error(bot_data.get("bot_name"), "Error placing sell order: %s", e)
         bot_data["failed_trades"] += 1
         bot_data["total_trades"] += 1
         return False
     
+def order_router(bot_data):
+    """Where a bot's market orders go: the netting aggregator, or in-process fills for paper bots."""
+    if bot_data.get("paper"):
+        from core.paper import paper_exchange
+        return paper_exchange
+    from core.execution import aggregator
+    return aggregator
+
 def get_historical_data(symbol, interval, limit):
-    klines = binance_client.get_klines(symbol=symbol, interval=interval, limit=limit)
+    from core.candles import get_closed_klines
+    klines = get_closed_klines(symbol, interval, limit)
     return [float(kline[4]) for kline in klines]
 
-def loss_limiter(bot_data, symbol):
-    stop_loss_percentage = 5  # Exit if loss exceeds 5%
-    take_profit_percentage = 10  # Exit if profit exceeds 10%
-
-    # Calculate the percentage change
-    percentage_change = (bot_data['current_trade_amount'] - bot_data['starting_trade_amount']) / bot_data['starting_trade_amount'] * 100
-
-    # Check for stop-loss or take-profit
-    if percentage_change <= -stop_loss_percentage:
-        action = "Sell"
-        print(f"{COLORS['error']} Stop-Loss triggered: Exiting position. {percentage_change:.2f}% loss {COLORS['reset']}")
-        order = sell_crypto(symbol, bot_data)
-        return True
+def exit_position(bot_data, symbol, reason):
+    """
+    Sells the whole position of a bot the portfolio risk engine flagged
+    (stop-loss, take-profit, trailing stop, exposure cap or portfolio drawdown),
+    in up to EXIT_ORDERS orders when the slippage cap splits it.
 
-    elif percentage_change >= take_profit_percentage:
-        action = "Sell"
-        print(f"{COLORS['profit']} Take-Profit triggered: Exiting position. {percentage_change:.2f}% profit {COLORS['reset']}")
-        order = sell_crypto(symbol, bot_data)
-        return True
-    
-    print(f'Loss limiter not trigger. All ok...')
+    Returns:
+        bool: True once the bot can stop: the position is flat (at most dust below
+            the lot size or minimum notional is left) or a sell failed. False if
+            part of it is still held, to be sold on the engine's next check.
+    """
+    from core import risk
+    bot_name = bot_data.get("bot_name")
+    if reason == risk.TAKE_PROFIT:
+        console.info(bot_name, "Take-Profit triggered: Exiting position.", color="profit")
+    else:
+        console.warn(bot_name, "%s triggered: Exiting position.", reason.capitalize(), color="error")
+    min_qty, step_size = get_quantity_precision(symbol)
+    min_notional = get_notional_limit(symbol)
+    for _ in range(EXIT_ORDERS):
+        held = bot_data["base_current_currency_quantity"]
+        if held < min_qty or held * get_price(symbol) < min_notional:
+            return True
+        if not sell_crypto(symbol, bot_data, adjust_quantity(held, min_qty, step_size)):
+            console.error(bot_name, "Exit sell failed; stopping with %s %s still held.", held, bot_data["base_currency"])
+            return True
+    console.warn(bot_name, "%s %s still held after %s exit orders; selling the rest on the next risk check.", bot_data["base_current_currency_quantity"], bot_data["base_currency"], EXIT_ORDERS)
     return False
 
 def dynamic_trade_allocation(bot_data, short_ema, long_ema, atr):
@@ -171,10 +235,10 @@ def dynamic_trade_allocation(bot_data, short_ema, long_ema, atr):
 
     # Adjust trade allocation based on trend strength
     if trend_strength > 1.1:  # Strong uptrend
-        print(f"Strong uptrend detected (trend_strength={trend_strength:.2f}). Increasing trade allocation.")
+        console.info(bot_data.get("bot_name"), "Strong uptrend detected (trend_strength=%.2f). Increasing trade allocation.", trend_strength)
         trade_allocation *= 1.5  # Increase trade size
     elif trend_strength < 0.9:  # Weak trend
-        print(f"Weak trend detected (trend_strength={trend_strength:.2f}). Decreasing trade allocation.")
+        console.info(bot_data.get("bot_name"), "Weak trend detected (trend_strength=%.2f). Decreasing trade allocation.", trend_strength)
         trade_allocation *= 0.5  # Decrease trade size
 
     # Adjust trade allocation based on ATR
@@ -182,10 +246,10 @@ def dynamic_trade_allocation(bot_data, short_ema, long_ema, atr):
     atr_threshold_low = bot_data.get('atr_threshold_low', 5)     # Example threshold, adjust as needed
 
     if atr > atr_threshold_high:
-        print(f"High volatility detected (ATR={atr:.2f}). Decreasing trade allocation.")
+        console.info(bot_data.get("bot_name"), "High volatility detected (ATR=%.2f). Decreasing trade allocation.", atr)
         trade_allocation *= Decimal('0.7')  # Decrease trade size for high volatility
     elif atr < atr_threshold_low:
-        print(f"Low volatility detected (ATR={atr:.2f}). Increasing trade allocation.")
+        console.info(bot_data.get("bot_name"), "Low volatility detected (ATR=%.2f). Increasing trade allocation.", atr)
         trade_allocation *= Decimal('1.2')  # Increase trade size for low volatility
 
     # Ensure the trade allocation is within bounds
@@ -194,7 +258,7 @@ def dynamic_trade_allocation(bot_data, short_ema, long_ema, atr):
 
 def check_ema_threshold(bot_data, short_ema, long_ema):
     # crossover_threshold = 0.3  # e.g., Min 0.2 | Max 0.5% buffer
-    crossover_threshold = 0  # e.g., Min 0.2 | Max 0.5% buffer
+    crossover_threshold = bot_data.get("crossover_threshold", 0)  # e.g., Min 0.2 | Max 0.5% buffer
     
     if bot_data["base_current_currency_quantity"] > 0 and short_ema > (long_ema * (1 + crossover_threshold / 100)) and bot_data["quote_current_currency_quantity"] > 0:
         action = "Buy"
@@ -205,16 +269,15 @@ def check_ema_threshold(bot_data, short_ema, long_ema):
     else:
         # Determine why the bot is holding
         if bot_data["base_current_currency_quantity"] <= 0 and short_ema < long_ema:
-            hold_msg = f"Cannot [SELL]: insufficient {bot_data['base_currency']} funds. Holding..."
+            hold_msg, hold_args = "Cannot [SELL]: insufficient %s funds. Holding...", (bot_data['base_currency'],)
         elif bot_data["quote_current_currency_quantity"] <= 0 and short_ema > long_ema:
-            hold_msg = f"Cannot [BUY]: insufficient {bot_data['quote_currency']} funds. Holding..."
+            hold_msg, hold_args = "Cannot [BUY]: insufficient %s funds. Holding...", (bot_data['quote_currency'],)
         else:
-            hold_msg = "Holding: Market conditions do not allow a trade."
+            hold_msg, hold_args = "Holding: Market conditions do not allow a trade.", ()
             
         action = "Hold"
         bot_data["total_holds"] += 1
-        color = COLORS['error']
-        print(f"{color}{hold_msg}{COLORS['reset']}")
+        console.info(bot_data.get("bot_name"), hold_msg, *hold_args, color="error")
         return action
             
 def risk_reward_ratio(prices, short_ema, long_ema, atr, reward_to_risk_ratio=.25):
@@ -239,57 +302,28 @@ def risk_reward_ratio(prices, short_ema, long_ema, atr, reward_to_risk_ratio=.25
 
     # Avoid division by zero
     if potential_risk == 0:
-        print(f"{COLORS['neutral']} Skipping trade: Risk is zero, invalid ratio. {COLORS['reset']}")
+        console.info(None, "Skipping trade: Risk is zero, invalid ratio.", color="neutral")
         return False
 
     # Calculate risk-to-reward ratio
     risk_reward = potential_reward / potential_risk
-    print(f"Risk/reward {risk_reward:.2f}:1 (Target: {reward_to_risk_ratio}:1)")
+    console.debug(None, "Risk/reward %.2f:1 (Target: %s:1)", risk_reward, reward_to_risk_ratio)
 
     # Evaluate if the reward outweighs the risk
     if risk_reward >= reward_to_risk_ratio:
-        print(f"{COLORS['positive']} Reward outweighs risk! Continue! {COLORS['reset']}")
+        console.info(None, "Reward outweighs risk! Continue!", color="profit")
         return True  # Favorable ratio
     else:
-        print(f"{COLORS['neutral']} Skipping trade: Unfavorable risk-to-reward ratio. {COLORS['reset']}")
+        console.info(None, "Skipping trade: Unfavorable risk-to-reward ratio.", color="neutral")
         return False  # Unfavorable ratio
 
 
 def calculate_atr(symbol, interval, limit, window):
-    # Fetch the Kline data
-    klines = binance_client.get_klines(symbol=symbol, interval=interval, limit=limit)
-    
-    # Convert the Kline data into a dictionary of high, low, close prices
-    prices = {
-        'high': [float(kline[2]) for kline in klines],  # High prices
-        'low': [float(kline[3]) for kline in klines],   # Low prices
-        'close': [float(kline[4]) for kline in klines]  # Closing prices
-    }
-    
-    # Convert to numpy arrays for efficient calculation
-    highs = np.array(prices['high'])
-    lows = np.array(prices['low'])
-    closes = np.array(prices['close'])
-    
-    # Convert closes to a pandas Series to use shift()
-    closes_series = pd.Series(closes)
-    
-    # Calculate True Range (TR)
-    tr = np.maximum(
-        highs - lows,
-        np.maximum(
-            abs(highs - np.roll(closes, shift=1)),  # Use np.roll to shift the closes array
-            abs(lows - np.roll(closes, shift=1))
-        )
-    )
-    
-    # The first TR value is undefined due to lack of a previous close, set it to 0
-    tr[0] = 0
-
-    # Calculate Average True Range (ATR) using rolling window
-    atr = pd.Series(tr).rolling(window=window).mean()
-    
-    return atr
+    from core.candles import get_closed_klines
+    from core.indicators import atr_from_klines
+    # Fetch the Kline data and compute the ATR series from high, low and close prices
+    klines = get_closed_klines(symbol, interval, limit)
+    return atr_from_klines(klines, window)
 
 def atr_filter(atr, atr_threshold_high=50, atr_threshold_low=10): # High (30-50) | Low (10-15)
     """
@@ -311,6 +345,9 @@ def atr_filter(atr, atr_threshold_high=50, atr_threshold_low=10): # High (30-50)
         return False, f"ATR ({atr}) is too low. Skipping trade due to low volatility."
     return True, "ATR is within acceptable bounds for trading."
 
+# symbol -> taker fee rate; fetched once per symbol, since every trade (and every paper fill) needs it
+fee_rates = {}
+
 def get_fee_rate(symbol):
     """
     Fetch the current trading fee rate for a given market pair.
@@ -321,25 +358,28 @@ def get_fee_rate(symbol):
     Returns:
         Decimal: The trading fee rate as a Decimal.
     """
+    fee_rate = fee_rates.get(symbol)
+    if fee_rate is not None:
+        return fee_rate
     fee_info = binance_client.get_trade_fee(symbol=symbol)
     # Binance API returns a list; fee rate is in "makerCommission" and "takerCommission".
     maker_fee = Decimal(fee_info[0]["makerCommission"])
     taker_fee = Decimal(fee_info[0]["takerCommission"])
     # Use taker fee as the default trading fee rate
-    return taker_fee / Decimal('100')  # Convert percentage to decimal
+    fee_rate = fee_rates[symbol] = taker_fee / Decimal('100')  # Convert percentage to decimal
+    return fee_rate
 
-def trailing_stop_loss(bot_data, symbol, prices, atr):
+def trailing_stop_percentage(bot_data, atr):
     """
-    Implements a trailing stop-loss mechanism with ATR adjustments.
+    Trailing stop-loss percentage with ATR adjustments. The stop itself is
+    checked by the portfolio risk engine on every price update.
 
     Parameters:
-        bot_data (dict): Contains bot-related data, including the highest market price.
-        symbol (str): The trading pair symbol (e.g., BTCUSDT).
-        prices (list of float): Historical prices, with the latest price as the last element.
+        bot_data (dict): Contains bot-related data, including the base trailing stop-loss percentage.
         atr (float): The Average True Range, used to measure market volatility.
 
     Returns:
-        bool: True if the trailing stop-loss is triggered, False otherwise.
+        float: Percentage below the highest price at which the position is exited.
     """
     # Base trailing stop-loss percentage
     base_trailing_stop_loss_percentage = bot_data.get('base_trailing_stop_loss_percentage', 2)
@@ -348,36 +388,20 @@ def trailing_stop_loss(bot_data, symbol, prices, atr):
     atr_threshold_high = bot_data.get('atr_threshold_high', 50)
     atr_threshold_low = bot_data.get('atr_threshold_low', 10)
     if atr > atr_threshold_high:
-        print(f"High volatility detected (ATR={atr:.2f}). Widening trailing stop-loss.")
-        trailing_stop_loss_percentage = base_trailing_stop_loss_percentage * 1.5  # Increase tolerance for high volatility
+        console.info(bot_data.get("bot_name"), "High volatility detected (ATR=%.2f). Widening trailing stop-loss.", atr)
+        return base_trailing_stop_loss_percentage * 1.5  # Increase tolerance for high volatility
     elif atr < atr_threshold_low:
-        print(f"Low volatility detected (ATR={atr:.2f}). Tightening trailing stop-loss.")
-        trailing_stop_loss_percentage = base_trailing_stop_loss_percentage * 0.75  # Decrease tolerance for low volatility
-    else:
-        trailing_stop_loss_percentage = base_trailing_stop_loss_percentage
-
-    # Get the highest price (from previous or current highest market price)
-    highest_market_price = max(bot_data.get('highest_market_price', 0), prices[-1])  # Use the latest price
-
-    # Calculate the trailing stop price
-    trailing_stop_price = highest_market_price * (1 - trailing_stop_loss_percentage / 100)
-    print(f"Highest Market Price: {highest_market_price:.2f}, Trailing Stop Price: {trailing_stop_price:.2f}")
-
-    # Compare the most recent price with the trailing stop price
-    if prices[-1] < trailing_stop_price:  # Compare with the latest price in the list
-        print(f"{COLORS['error']} Trailing Stop-Loss triggered: Exiting position. {COLORS['reset']}")
-        order = sell_crypto(symbol, bot_data)  # Replace with your actual sell logic
-        return True
-
-    # Update the highest market price if needed
-    bot_data['highest_market_price'] = highest_market_price
-    return False
+        console.info(bot_data.get("bot_name"), "Low volatility detected (ATR=%.2f). Tightening trailing stop-loss.", atr)
+        return base_trailing_stop_loss_percentage * 0.75  # Decrease tolerance for low volatility
+    return base_trailing_stop_loss_percentage
 
 def trading_loop(bot_name, bot_data):
-    INTERVAL_TO_SECONDS = {
-        "1m": 60, "5m": 300, "15m": 900, "1h": 3600, "4h": 14400, "1d": 86400,
-    }
-    print(f"{COLORS['neutral']} System Update: All systems operational. {bot_name}{COLORS['reset']}")
+    from core.equity import record_equity, drop_curve
+    from core.indicators import indicator_engine
+    from core.orderbook import order_books
+    from core.risk import risk_engine
+    bot_data["bot_name"] = bot_name
+    console.info(bot_name, "System Update: All systems operational.", color="neutral")
     total_profit_loss = 0
     
     # Create Bot trading window deadline
@@ -385,99 +409,121 @@ def trading_loop(bot_name, bot_data):
     if isinstance(bot_data['trade_window'], str):
         if bot_data['trade_window'] != "infinite":
             bot_data['trade_window'] = parse_trade_window(bot_data['trade_window'])
-    if bot_data['trade_window'] != "infinite":
-        bot_data['end_trade_time'] = get_current_datetime() + bot_data['trade_window']
+    window = bot_data['trade_window'] if isinstance(bot_data['trade_window'], timedelta) else None
+    if window:
+        bot_data['end_trade_time'] = get_current_datetime() + window
         
         
-    # Start the logger
-    logger = start_logger(bot_name)
+    # Start the logger (paper bots report through /pnl and /statuses, not the dashboard websocket)
+    logger = None if bot_data.get("paper") else start_logger(bot_name)
+    
+    # Wake on each candle close of the bot's interval; the trade window deadline lives on the same timer heap
+    clock = scheduler.clock_for(bot_data["interval"], window)
+    
+    # Indicators are computed once per candle close and shared with every bot that needs the same ones
+    indicators = required_indicators(bot_data["symbol"], bot_data["interval"], bot_data.get("short_window", 5), bot_data.get("long_window", 20))
+    indicator_engine.subscribe(bot_name, indicators.values())
+    
+    # Keep a local order book of the symbol for pre-trade fill estimates
+    order_books.track(bot_data["symbol"])
+    
+    # Stops, exposure caps and portfolio drawdown are checked across all bots on every price update
+    risk_engine(bot_data).register(bot_name, bot_data, on_exit=clock.interrupt)
+    
+    # A stop wakes the bot instead of waiting for the next candle close
+    lifecycle.register(bot_name, clock.interrupt)
     
     while bot_data["running"]:
-        # Stop bot if designated trade window is done.
-        if bot_data['end_trade_time'] and get_current_datetime() >= bot_data['end_trade_time']:
-            message = f"⏰ Trade window for bot {bot_name} has ended."
-            message_data = create_message_data(
-                message=message,
-                status="notify"
-            )
-            wsprint(logger, message_data)
-            print(message)
+        if not clock.wait():
+            # Exit the position if the portfolio risk engine says so.
+            if bot_data.get("risk_exit"):
+                if not exit_position(bot_data, bot_data["symbol"], bot_data["risk_exit"]) and bot_data["running"]:
+                    # Still holding: stay registered, so the engine flags (and wakes) the bot again
+                    bot_data["risk_exit"] = None
+                    risk_engine(bot_data).update(bot_name, bot_data)
+                    clock.resume()
+                    continue
+            # Stop bot if designated trade window is done.
+            elif clock.expired:
+                message = f"⏰ Trade window for bot {bot_name} has ended."
+                message_data = create_message_data(
+                    message=message,
+                    status="notify"
+                )
+                wsprint(logger, message_data)
+                console.info(bot_name, message)
+            break
+        if not bot_data["running"]:
             break
         
         try:
             symbol = bot_data["symbol"]
             interval = bot_data["interval"]
-            wait_time = INTERVAL_TO_SECONDS.get(interval, 3600)
-            prices = get_historical_data(symbol, interval, limit=50)
+            values = indicator_engine.evaluate(indicators.values(), clock.close_time)
+            prices = values[indicators["prices"]]
+            
+            # Mark the holdings to the close for the equity curve
+            close_price = Decimal(str(prices[-1]))
+            equity = (bot_data["base_current_currency_quantity"] * close_price + bot_data["quote_current_currency_quantity"]) * get_usdt_price(bot_data['quote_currency'])
+            record_equity(bot_name, clock.close_time, close_price, bot_data["base_current_currency_quantity"], bot_data["quote_current_currency_quantity"], equity)
+            
             color_option = 'loss' if total_profit_loss < 0 else 'profit'
-            print(f"{COLORS['neutral']} Starting Trade | {symbol} | {interval} |{COLORS['reset']} Profit/Loss: {colorize_cli_text(bot_data['fiat_stablecoin'])}: {colorize_cli_text(f"{total_profit_loss:.8f}", color_option)} {COLORS['reset']}")
+            console.info(bot_name, "Starting Trade | %s | %s | Profit/Loss: %s: %.8f", symbol, interval, bot_data['fiat_stablecoin'], total_profit_loss, color=color_option)
             
             #Strategies
-            short_ema = calculate_ema(prices, window=5)
-            long_ema = calculate_ema(prices, window=20)
-            
-            # Loss Limiter              >> Does the final order then should stop the bot. Log action with what the bot has done.
-            stop_trading = loss_limiter(bot_data, symbol)
-            if stop_trading: break
+            short_ema = values[indicators["short_ema"]]
+            long_ema = values[indicators["long_ema"]]
             
             #!REMOVE THIS AFTER TESTING
             preventChecks=False
             if not preventChecks:
             # calculate_atr             >> Avoid trading during highly volatile markets by using metrics like Average True Range (ATR) or Bollinger Bands.
-                atr_series = calculate_atr(symbol, interval, limit=50, window=14) # Common default for ATR calculation is 14. Adjust this depending on your strategy and market conditions.
-                # print(f"atr_series: {atr_series}")
-                # Extract the most recent ATR value
-                atr = atr_series.iloc[-1]  # Get the last value in the Series
-                print(f"Most recent ATR: {atr}")
+                atr = values[indicators["atr"]]  # Most recent ATR(14). Common default for ATR calculation is 14. Adjust this depending on your strategy and market conditions.
+                console.debug(bot_name, "Most recent ATR: %s", atr)
                 atr_ok, atr_message = atr_filter(atr)
-                print(atr_message)  # Log the decision
+                console.info(bot_name, atr_message)  # Log the decision
                 if not atr_ok:
-                    time.sleep(wait_time)  # Wait for the specified amount of time
-                    continue  # Skip to the next iteration
+                    continue  # Skip to the next candle
                 
                 # Risk/Reward Ratio         >> 2:1 Currently Reward outweights risk 2:1
                 # is_rewarding = risk_reward_ratio(prices, short_ema, long_ema, atr)
                 # print(f"[is_rewarding] Trade decision: {'Proceed' if is_rewarding else 'Skip'}")
                 # if not is_rewarding:
                 #     print("The trade is not rewarding based on risk/reward ratio. Not proceeding.")
-                #     time.sleep(wait_time)  # Wait for the specified amount of time
-                #     continue  # Skip to the next iteration
+                #     continue  # Skip to the next candle
                 
                 # Dynamic Trade Allocation  >> size of trade changes on strong or weak trends accordingly.
                 bot_data['dynamic_trade_allocation'] = dynamic_trade_allocation(bot_data, short_ema, long_ema, atr)
 
                 # trailing stop/loss        >> lock in profits by dynamically updating the exit price as the trade moves in your favor.
-                stop_loss_triggered = trailing_stop_loss(bot_data, symbol, prices, atr)
-                print(f"stop_loss_triggered: {stop_loss_triggered}")
-                if stop_loss_triggered:
-                    print("Trade exited due to trailing stop-loss.")
-                    break
+                bot_data['trailing_stop_loss_percentage'] = trailing_stop_percentage(bot_data, atr)
+                bot_data['highest_market_price'] = max(bot_data.get('highest_market_price', 0), prices[-1])
+                risk_engine(bot_data).update(bot_name, bot_data)
             
             # Check EMA Thresholds      >> OG functionality + threshold amount
             ema_result = check_ema_threshold(bot_data, short_ema, long_ema)
             # Returns "Buy", "Sell", "Hold"
             if ema_result == "Buy":
-                print("EMA signals a buy. Proceeding with the buy action.")
-                color = COLORS['buy']
+                console.info(bot_name, "EMA signals a buy. Proceeding with the buy action.")
+                color = 'buy'
                 buy_crypto(symbol, bot_data)  # Execute buy order
 
             elif ema_result == "Sell":
-                print("EMA signals a sell. Proceeding with the sell action.")
-                color = COLORS['sell']
+                console.info(bot_name, "EMA signals a sell. Proceeding with the sell action.")
+                color = 'sell'
                 sell_crypto(symbol, bot_data)  # Execute sell order
 
             elif ema_result == "Hold":
-                print("EMA signals hold. No action taken.")
-                time.sleep(wait_time)  # Wait for the specified amount of time
-                continue  # Skip to the next iteration
+                console.info(bot_name, "EMA signals hold. No action taken.")
+                continue  # Skip to the next candle
 
             # Profit/Loss Calculation
             current_market_price = Decimal(prices[-1])
             # Convert base currency to USD
-            btc_to_usd_price = Decimal(binance_client.get_symbol_ticker(symbol=f"{bot_data['base_currency']}USDT")["price"]) if bot_data["base_currency"] != "USDT" else Decimal('1.0')
+            btc_to_usd_price = get_usdt_price(bot_data['base_currency'])
             base_value_current = bot_data["base_current_currency_quantity"] * btc_to_usd_price
             # # # Convert quote currency to USD if it's not USDT
-            quote_to_usd_price = Decimal('1.0') if bot_data["quote_currency"] == "USDT" else Decimal(binance_client.get_symbol_ticker(symbol=f"{bot_data['quote_currency']}USDT")["price"])
+            quote_to_usd_price = get_usdt_price(bot_data['quote_currency'])
             quote_value_current = bot_data["quote_current_currency_quantity"] * quote_to_usd_price
             total_current_value_usd = base_value_current + quote_value_current
             if (ema_result != "Hold"): 
@@ -486,9 +532,8 @@ def trading_loop(bot_name, bot_data):
                 bot_data['total_profit_loss'] = total_profit_loss
             
           
-            timestamp = get_current_datetime().strftime("%d-%m-%Y %I:%M:%S%p")
-            print(f"{color}{timestamp} | [{ema_result.upper()}] | {symbol} | {interval} | S-EMA: {short_ema:.6f} | L-EMA: {long_ema:.6f} | Total: {bot_data['fiat_stablecoin']}{total_current_value_usd}{COLORS['reset']}")
-            print(f"{color}{timestamp} | [{ema_result.upper()}] | {symbol} | {interval} | Start {bot_data['base_currency']}: {bot_data['base_starting_currency_quantity']:.8f} | {bot_data['base_currency']}: {bot_data['base_current_currency_quantity']:.8f} | {bot_data['quote_currency']}: {bot_data['quote_current_currency_quantity']:.8f} | Total Profit/Loss: {bot_data['fiat_stablecoin']}{total_profit_loss:.8f}{COLORS['reset']}")
+            console.info(bot_name, "[%s] | %s | %s | S-EMA: %.6f | L-EMA: %.6f | Total: %s%s", ema_result.upper(), symbol, interval, short_ema, long_ema, bot_data['fiat_stablecoin'], total_current_value_usd, color=color)
+            console.info(bot_name, "[%s] | %s | %s | Start %s: %.8f | %s: %.8f | %s: %.8f | Total Profit/Loss: %s%.8f", ema_result.upper(), symbol, interval, bot_data['base_currency'], bot_data['base_starting_currency_quantity'], bot_data['base_currency'], bot_data['base_current_currency_quantity'], bot_data['quote_currency'], bot_data['quote_current_currency_quantity'], bot_data['fiat_stablecoin'], total_profit_loss, color=color)
             
             # Update previous market price for next iteration
             bot_data["previous_market_price"] = current_market_price
@@ -501,6 +546,21 @@ def trading_loop(bot_name, bot_data):
             wsprint(logger, message_data)
 
         except Exception as e:
-            print(f"Error in trading loop: {e}")
-
-        time.sleep(wait_time)
+            console.error(bot_name, "Error in trading loop: %s", e)
+
+    lifecycle.unregister(bot_name)
+    clock.close()
+    indicator_engine.unsubscribe(bot_name)
+    risk_engine(bot_data).unregister(bot_name)
+    order_books.untrack(bot_data["symbol"])
+    drop_curve(bot_name)
+    
+    if logger:
+        # Last state for the dashboard, then send whatever is still queued (bounded by TRENDR_LOG_DRAIN)
+        message_data = create_message_data(
+            message=f"[STORE] {bot_name} data",
+            status="log",
+            data=bot_data
+        )
+        wsprint(logger, message_data)
+        stop_logger(bot_name)
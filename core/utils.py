@@ -1,37 +1,53 @@
-import numpy as np
-from config.bot_config import known_currencies, binance_client, COLORS
+from config.bot_config import binance_client, COLORS
 from decimal import Decimal
 from datetime import datetime, timedelta
+import importlib
+import importlib.util
+import sys
 import pytz
+from core.symbols import symbol_registry
 
 
-def split_market_pair(market_pair):
-    for i in range(3, len(market_pair) + 1):
-        base = market_pair[:i]
-        quote = market_pair[i:]
-        if base in known_currencies and quote in known_currencies:
-            return base, quote
-    return market_pair, 'Unknown'
+class LazyModule:
+    """
+    Stand-in for a module that is imported the first time one of its attributes is used.
+
+    The import goes through importlib.import_module, so concurrent first use from
+    several bot threads is serialized by the import lock.
+    """
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self.__name), attribute)
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name}'>"
+
+
+def lazy_import(name):
+    """
+    Returns a module whose import is deferred until one of its attributes is used.
+
+    Heavy dependencies (numpy, websockets, ...) are bound at module level with this
+    so that importing `main` stays fast and network-free.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    return LazyModule(name)
 
 def convert_usd_to_quantity(symbol, amount_in_usd):
     price = Decimal(binance_client.get_symbol_ticker(symbol=symbol)["price"])
     return amount_in_usd / price
 
 def get_notional_limit(symbol):
-    symbol_info = binance_client.get_symbol_info(symbol)
-    for filter in symbol_info['filters']:
-        if filter['filterType'] == 'MIN_NOTIONAL':
-            return Decimal(filter['minNotional'])
-    return Decimal('0.0')
+    return symbol_registry.get(symbol).min_notional
 
 def get_quantity_precision(symbol):
-    symbol_info = binance_client.get_symbol_info(symbol)
-    for filter in symbol_info['filters']:
-        if filter['filterType'] == 'LOT_SIZE':
-            min_qty = Decimal(filter['minQty'])
-            step_size = Decimal(filter['stepSize'])
-            return min_qty, step_size
-    return Decimal('1.0'), Decimal('1.0')
+    symbol_info = symbol_registry.get(symbol)
+    return symbol_info.min_qty, symbol_info.step_size
 
 def adjust_quantity(quantity, min_qty, step_size):
     adjusted = max(min_qty, quantity)
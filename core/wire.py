@@ -0,0 +1,236 @@
+"""
+Framing of bot log messages on the dashboard websocket.
+
+The logger offers SUBPROTOCOLS when it connects and the server picks one:
+
+- "trendr.msgpack.v1": one binary MessagePack frame per message,
+  {"bot_id": ..., "log": {...}}, with Decimals as ext type 1 (a scaled integer:
+  int8 exponent followed by the big-endian two's complement coefficient), so
+  balances survive exactly. Uses the msgpack package when installed and an
+  equivalent pure-Python packer otherwise; both produce the same bytes.
+- no subprotocol (servers predating negotiation): the legacy text frame, the
+  message JSON-encoded and then wrapped in {"bot_id", "log"} as a string.
+
+Frames are compressed by permessage-deflate on the connection.
+"""
+import json
+import struct
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+MSGPACK = "trendr.msgpack.v1"
+SUBPROTOCOLS = [MSGPACK]
+
+DECIMAL_EXT = 1
+
+_msgpack = None  # msgpack module once resolved, False when it is not installed
+_packers = threading.local()  # msgpack.Packer instances are not thread-safe
+
+
+def msgpack_module():
+    global _msgpack
+    if _msgpack is None:
+        try:
+            import msgpack
+            _msgpack = msgpack
+        except ImportError:
+            _msgpack = False
+    return _msgpack
+
+
+# ---- Decimal <-> scaled integer ----
+
+def pack_decimal(value):
+    text = str(value)
+    point = text.find(".")
+    if "E" not in text and text[-1].isdigit():
+        # Plain notation (the common case) parses faster from the string than via as_tuple()
+        if point < 0:
+            exponent, coefficient = 0, int(text)
+        else:
+            exponent, coefficient = point + 1 - len(text), int(text[:point] + text[point + 1:])
+    else:
+        sign, digits, exponent = value.as_tuple()
+        if not isinstance(exponent, int):
+            raise ValueError(f"Cannot encode non-finite Decimal {value}")
+        coefficient = int("".join(map(str, digits)))
+        if sign:
+            coefficient = -coefficient
+    # Keep the exponent in int8 range by moving trailing digits into the coefficient
+    while exponent > 127:
+        coefficient *= 10
+        exponent -= 1
+    if exponent < -128:
+        raise ValueError(f"Decimal {value} has too many fractional digits to encode")
+    length = max(1, (coefficient.bit_length() + 8) // 8)
+    return struct.pack(">b", exponent) + coefficient.to_bytes(length, "big", signed=True)
+
+
+def unpack_decimal(payload):
+    exponent = struct.unpack_from(">b", payload)[0]
+    coefficient = int.from_bytes(payload[1:], "big", signed=True)
+    return Decimal(f"{coefficient}E{exponent}")  # String construction is exact (scaleb rounds to the context)
+
+
+def _default(obj):
+    """Types MessagePack has no native form for (same choices as CustomJSONEncoder otherwise)."""
+    if isinstance(obj, Decimal):
+        return _ext(DECIMAL_EXT, pack_decimal(obj))
+    if isinstance(obj, timedelta):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "item"):  # NumPy scalars
+        return obj.item()
+    return str(obj)
+
+
+def _ext(code, payload):
+    msgpack = msgpack_module()
+    return msgpack.ExtType(code, payload) if msgpack else (code, payload)
+
+
+# ---- Pure-Python MessagePack packer ----
+
+def _pack_into(out, obj):
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True:
+        out.append(0xc3)
+    elif obj is False:
+        out.append(0xc2)
+    elif isinstance(obj, int):
+        _pack_int(out, obj)
+    elif isinstance(obj, float):
+        out += struct.pack(">Bd", 0xcb, obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        size = len(data)
+        if size < 32:
+            out.append(0xa0 | size)
+        elif size < 0x100:
+            out += struct.pack(">BB", 0xd9, size)
+        elif size < 0x10000:
+            out += struct.pack(">BH", 0xda, size)
+        else:
+            out += struct.pack(">BI", 0xdb, size)
+        out += data
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(obj)
+        size = len(data)
+        if size < 0x100:
+            out += struct.pack(">BB", 0xc4, size)
+        elif size < 0x10000:
+            out += struct.pack(">BH", 0xc5, size)
+        else:
+            out += struct.pack(">BI", 0xc6, size)
+        out += data
+    elif isinstance(obj, dict):
+        _pack_header(out, len(obj), 0x80, 0xde, 0xdf)
+        for key, value in obj.items():
+            _pack_into(out, key)
+            _pack_into(out, value)
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(out, len(obj), 0x90, 0xdc, 0xdd)
+        for value in obj:
+            _pack_into(out, value)
+    else:
+        converted = _default(obj)
+        if isinstance(converted, tuple):
+            _pack_ext(out, *converted)
+        else:
+            _pack_into(out, converted)
+
+
+def _pack_header(out, size, fix, code16, code32):
+    if size < 16:
+        out.append(fix | size)
+    elif size < 0x10000:
+        out += struct.pack(">BH", code16, size)
+    else:
+        out += struct.pack(">BI", code32, size)
+
+
+def _pack_int(out, value):
+    if 0 <= value < 0x80:
+        out.append(value)
+    elif -32 <= value < 0:
+        out += struct.pack(">b", value)
+    elif value >= 0:
+        for code, fmt, limit in ((0xcc, ">BB", 0x100), (0xcd, ">BH", 0x10000), (0xce, ">BI", 0x100000000), (0xcf, ">BQ", 0x10000000000000000)):
+            if value < limit:
+                out += struct.pack(fmt, code, value)
+                return
+        raise OverflowError(f"Integer {value} is too large to encode")
+    else:
+        for code, fmt, limit in ((0xd0, ">Bb", 0x80), (0xd1, ">Bh", 0x8000), (0xd2, ">Bi", 0x80000000), (0xd3, ">Bq", 0x8000000000000000)):
+            if value >= -limit:
+                out += struct.pack(fmt, code, value)
+                return
+        raise OverflowError(f"Integer {value} is too small to encode")
+
+
+def _pack_ext(out, code, payload):
+    size = len(payload)
+    fixed = {1: 0xd4, 2: 0xd5, 4: 0xd6, 8: 0xd7, 16: 0xd8}
+    if size in fixed:
+        out += struct.pack(">Bb", fixed[size], code)
+    elif size < 0x100:
+        out += struct.pack(">BBb", 0xc7, size, code)
+    elif size < 0x10000:
+        out += struct.pack(">BHb", 0xc8, size, code)
+    else:
+        out += struct.pack(">BIb", 0xc9, size, code)
+    out += payload
+
+
+def packb(obj):
+    """Serializes `obj` to MessagePack bytes."""
+    msgpack = msgpack_module()
+    if msgpack:
+        packer = getattr(_packers, "packer", None)
+        if packer is None:
+            packer = _packers.packer = msgpack.Packer(default=_default, use_bin_type=True)
+        return packer.pack(obj)
+    out = bytearray()
+    _pack_into(out, obj)
+    return bytes(out)
+
+
+def unpackb(data):
+    """
+    Decodes a MessagePack frame produced by packb (needs the msgpack package).
+    """
+    import msgpack
+
+    def ext_hook(code, payload):
+        if code == DECIMAL_EXT:
+            return unpack_decimal(payload)
+        return msgpack.ExtType(code, payload)
+
+    return msgpack.unpackb(data, ext_hook=ext_hook, raw=False)
+
+
+# ---- Frames ----
+
+def encode(bot_id, message):
+    """Encodes one log message as a MessagePack frame, in a single pass."""
+    return packb({"bot_id": bot_id, "log": message})
+
+
+def decode(frame):
+    """
+    Decodes a frame of either protocol back to {"bot_id", "log"}, with the
+    legacy string payload parsed as JSON when possible.
+    """
+    if isinstance(frame, (bytes, bytearray)):
+        return unpackb(frame)
+    envelope = json.loads(frame)
+    try:
+        envelope["log"] = json.loads(envelope["log"])
+    except (TypeError, ValueError):
+        pass
+    return envelope
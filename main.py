@@ -1,17 +1,46 @@
 from flask import Flask, jsonify, request, Response
 from core.trader import trading_loop
-from config.bot_config import bot_data, binance_client
-from core.utils import split_market_pair, adjust_quantity, get_quantity_precision, get_notional_limit, colorize_cli_text, parse_trade_window
-from decimal import Decimal, getcontext
 import json
+import os
 import threading
-from core.logger import stop_logger, CustomJSONEncoder
+import time
+from core.logger import CustomJSONEncoder
+from core import console
+from core import lifecycle
+from core.bot import BotRegistry, build_bot_data, next_bot_name, duplicate_key, prefetch_market_data, prefetch_exchange_info
 
 
 app = Flask(__name__)
 
 # Global bot registry
-bot_registry = {}
+bot_registry = BotRegistry()
+
+# Number of worker processes bots are sharded across (0 runs every bot in this process)
+WORKERS = int(os.getenv("TRENDR_WORKERS", "0"))
+runtime = None
+runtime_lock = threading.Lock()
+
+def get_runtime():
+    """
+    Starts the sharded runtime on first use so importing main never spawns processes.
+    """
+    global runtime
+    with runtime_lock:
+        if runtime is None:
+            from core.sharding import ShardedRuntime
+            runtime = ShardedRuntime(WORKERS, on_bot_exit=on_shard_bot_exit)
+            # Shards start with the console defaults: carry over any /log-level change made before
+            try:
+                runtime.set_log_level(console.get_level(), fmt=console.get_format())
+            except Exception as e:
+                console.warn(None, "Could not apply the console settings to the shards: %s", e)
+        return runtime
+
+def on_shard_bot_exit(bot_name):
+    bot = bot_registry.pop(bot_name, None)
+    if bot:
+        runtime.release_symbol(bot["data"]["symbol"])
+        console.clear_level(bot_name)
 
 @app.route("/")
 def home():
@@ -19,70 +48,65 @@ def home():
 
 @app.route("/start", methods=["POST"])
 def start_bot():
+    from core import recorder
 
     data = request.json
-    bot_data_instance = bot_data.copy()
-    bot_data_instance["symbol"] = data.get("symbol")
-    bot_data_instance["trade_allocation"] = Decimal(data.get("trade_allocation", 0))
-    base, quote = split_market_pair(bot_data_instance["symbol"])
-    split_funds = True
-    bot_data_instance["base_currency"] = base
-    bot_data_instance["quote_currency"] = quote
-    bot_data_instance["interval"] = data.get("interval", "1h")
-    bot_data_instance["starting_trade_amount"] = Decimal(data.get("starting_trade_amount", 0.0))
-    bot_data_instance["current_trade_amount"] = bot_data_instance["starting_trade_amount"]
-    
-    # Check for duplicate bot
-    for bot_name, bot in bot_registry.items():
-        if (
-            bot["data"]["symbol"] == bot_data_instance["symbol"] and
-            bot["data"]["interval"] == bot_data_instance["interval"] and
-            bot["data"]["starting_trade_amount"] == bot_data_instance["starting_trade_amount"] and
-            bot["data"]["trade_allocation"] == bot_data_instance["trade_allocation"]
-        ):
+    recorder.record_event("start", data)
+    try:
+        # Loads the symbol registry (and starts its refresh) on the first start
+        prefetch_exchange_info()
+    except Exception as e:
+        console.warn(None, "Symbol registry load failed, falling back to per-symbol requests: %s", e)
+    try:
+        bot_data_instance = build_bot_data(data)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    with bot_registry.lock:
+        # Check for duplicate bot
+        bot_name = bot_registry.find_duplicate(bot_data_instance)
+        if bot_name:
             return jsonify({
                 "message": f"A bot ({bot_name}) for {bot_data_instance['symbol']} with interval {bot_data_instance['interval']} is already running!",
                 "status": "On",
                 "bot_name": bot_name  # Include the bot_name in the response
             }), 400
 
-    # Create unique bot name for user listing
-    bot_name = f"bot-{len(bot_registry)+1:03d}-{bot_data_instance['symbol']}-{bot_data_instance['interval']}-S:{bot_data_instance["starting_trade_amount"]}-{bot_data_instance["trade_allocation"]}%"
-
-    # Fetch price and calculate initial quantity
-    current_price = Decimal(binance_client.get_symbol_ticker(symbol=bot_data_instance["symbol"])["price"])
-    min_qty, step_size = get_quantity_precision(bot_data_instance["symbol"])
-    min_notional = get_notional_limit(bot_data_instance["symbol"])
-
-    # Ensure the trade meets the minimum notional value
-    required_quantity = max(min_qty, min_notional / current_price)
-    starting_trade_amount = bot_data_instance["starting_trade_amount"]
-    if (split_funds): 
-        starting_trade_amount = starting_trade_amount / 2
-         # Calculate the quantity of the base currency
-        bot_data_instance["base_starting_currency_quantity"] = adjust_quantity(starting_trade_amount / current_price, min_qty, step_size)
-        bot_data_instance["base_current_currency_quantity"] = bot_data_instance["base_starting_currency_quantity"]
-        
-        if quote == "USDT":
-            # If the quote currency is USDT, we can directly assign the value
-            bot_data_instance["quote_current_currency_quantity"] = adjust_quantity(starting_trade_amount, min_qty, step_size)
-        else:
-            # Fetch the price of the quote currency in terms of USDT
-            quote_price = Decimal(binance_client.get_symbol_ticker(symbol=f"{quote}USDT")["price"])
-            bot_data_instance["quote_current_currency_quantity"] = adjust_quantity(starting_trade_amount / quote_price, min_qty, step_size)
-        
-    else:
-        # If not splitting funds, use the entire amount for base currency
-        bot_data_instance["base_starting_currency_quantity"] = adjust_quantity(starting_trade_amount / current_price, min_qty, step_size)
-        bot_data_instance["base_current_currency_quantity"] = bot_data_instance["base_starting_currency_quantity"]
-        
-    bot_data_instance["currency_quantity_precision"] = step_size
-    bot_data_instance["previous_market_price"] = current_price
+        # Create unique bot name for user listing
+        bot_name = next_bot_name(bot_data_instance)
+        bot_registry[bot_name] = {"data": bot_data_instance, "thread": None}
+
+    try:
+        launch_bot(bot_name, bot_data_instance)
+    except Exception as e:
+        return jsonify({"message": f"Bot {bot_name} failed to start: {e}"}), 500
+    return jsonify({"message": f"Bot {bot_name} started successfully!", "bot_name": bot_name})
+
 
+def launch_bot(bot_name, bot_data_instance):
+    """
+    Starts a bot already entered in bot_registry, on a local thread or on its shard.
+    Removes it from the registry again and raises if it cannot be started; once
+    started, a local bot leaves the registry when its thread exits.
+    """
     bot_data_instance["running"] = True
-    
-    trade_window = data.get('trade_window')
-    bot_data_instance["trade_window"] = parse_trade_window(trade_window)    
+    bot_data_instance["bot_name"] = bot_name
+
+    if WORKERS:
+        try:
+            shard_runtime = get_runtime()
+        except Exception:
+            bot_registry.pop(bot_name, None)
+            raise
+        try:
+            shard_id = shard_runtime.start_bot(bot_name, bot_data_instance)
+        except Exception:
+            bot_registry.pop(bot_name, None)
+            shard_runtime.release_symbol(bot_data_instance["symbol"])
+            raise
+        bot_registry[bot_name]["shard"] = shard_id
+        console.info(bot_name, "🚀 Trendr started on shard %s with %s | Interval: %s", shard_id, bot_data_instance['symbol'], bot_data_instance['interval'])
+        return
     
     # Thread target function
     def bot_thread(bot_name, bot_data_instance):
@@ -90,16 +114,116 @@ def start_bot():
             trading_loop(bot_name, bot_data_instance)
         finally:
             bot_registry.pop(bot_name, None)  # Clean up when thread exits
+            console.clear_level(bot_name)
 
     thread = threading.Thread(target=bot_thread, args=(bot_name, bot_data_instance), daemon=True)
-    thread.start()
+    bot_registry[bot_name]["thread"] = thread
+    try:
+        thread.start()
+    except Exception:
+        bot_registry.pop(bot_name, None)
+        raise
+    console.info(bot_name, "🚀 Trendr started with %s | Interval: %s | Starting %s: %s | Starting %s: %s", bot_data_instance['symbol'], bot_data_instance['interval'], bot_data_instance['base_currency'], bot_data_instance['base_starting_currency_quantity'], bot_data_instance['quote_currency'], bot_data_instance['quote_current_currency_quantity'])
 
-    bot_registry[bot_name] = {
-        "data": bot_data_instance,
-        "thread": thread,
-    }
-    print(f"{colorize_cli_text('🚀 Trendr','botname')} started with {colorize_cli_text(bot_data_instance['symbol'], 'symbol')} | Interval: {bot_data['interval']} | Starting {colorize_cli_text(bot_data['base_currency'],bot_data['base_currency'])}: {bot_data['base_starting_currency_quantity']} | Starting {colorize_cli_text(bot_data['quote_currency'])}: {bot_data['quote_current_currency_quantity']}")
-    return jsonify({"message": f"Bot {bot_name} started successfully!", "bot_name": bot_name})
+
+def validate_bot_specs(specs):
+    """
+    Builds bot_data for every spec of a bulk start.
+
+    Returns:
+        tuple: (list of bot_data, list of {"index", "message"} errors).
+    """
+    instances, errors = [], []
+    for index, spec in enumerate(specs):
+        try:
+            instances.append(build_bot_data(spec))
+        except Exception as e:
+            errors.append({"index": index, "message": str(e)})
+    return instances, errors
+
+
+def start_validated_bots(instances):
+    """
+    Registers and starts a batch of validated bots, all or none.
+
+    Duplicates (against running bots or within the batch) reject the whole
+    batch; if a bot fails to launch, the ones already started are stopped.
+
+    Returns:
+        tuple: (list of started bot names, list of {"index", "message"} errors).
+    """
+    with bot_registry.lock:
+        errors = []
+        seen = {}
+        for index, bot_data_instance in enumerate(instances):
+            key = duplicate_key(bot_data_instance)
+            running = bot_registry.find_duplicate(bot_data_instance)
+            if running:
+                errors.append({"index": index, "message": f"A bot ({running}) with this configuration is already running!", "bot_name": running})
+            elif key in seen:
+                errors.append({"index": index, "message": f"Same configuration as bot spec {seen[key]}"})
+            seen.setdefault(key, index)
+        if errors:
+            return [], errors
+
+        bot_names = []
+        for bot_data_instance in instances:
+            bot_name = next_bot_name(bot_data_instance)
+            bot_registry[bot_name] = {"data": bot_data_instance, "thread": None}
+            bot_names.append(bot_name)
+
+    for index, (bot_name, bot_data_instance) in enumerate(zip(bot_names, instances)):
+        try:
+            launch_bot(bot_name, bot_data_instance)
+        except Exception as e:
+            for started in bot_names[:index]:
+                stop_bot_by_name(started)
+            for pending in bot_names[index:]:
+                bot_registry.pop(pending, None)
+            return [], [{"index": index, "message": f"Bot {bot_name} failed to start: {e}"}]
+    return bot_names, []
+
+
+def bulk_start_response(started, errors):
+    if errors:
+        return {"message": "No bots were started.", "errors": errors}, 400
+    return {"message": f"Started {len(started)} bots.", "bot_names": started}, 200
+
+
+@app.route("/bots", methods=["POST"])
+def start_bots():
+    """
+    Starts many bots at once from {"bots": [spec, ...]} (specs as for /start).
+    Market metadata and prices are fetched with one bulk call each.
+    """
+    from core import recorder
+    data = request.json or {}
+    specs = data.get("bots") if isinstance(data, dict) else None
+    if not specs or not isinstance(specs, list):
+        return jsonify({"message": "bots must be a non-empty list of bot specs"}), 400
+    for spec in specs:
+        recorder.record_event("start", spec)
+
+    try:
+        prefetch_market_data(specs)
+    except Exception as e:
+        console.warn(None, "Bulk market data prefetch failed, falling back to per-symbol requests: %s", e)
+    instances, errors = validate_bot_specs(specs)
+    if errors:
+        payload, status = bulk_start_response([], errors)
+    else:
+        payload, status = bulk_start_response(*start_validated_bots(instances))
+    return jsonify(payload), status
+
+
+def stop_bot_by_name(bot_name):
+    """
+    Stops a running bot.
+
+    Returns:
+        tuple: (HTTP status, message).
+    """
+    return stop_bots_by_name([bot_name])[bot_name]
 
 
 @app.route("/stop", methods=["POST"])
@@ -110,31 +234,144 @@ def stop_bot():
     if not bot_name:
         return jsonify({"message": "Bot name is required to stop the bot!"}), 400
 
-    # Check if the bot exists in the registry
-    bot = bot_registry.get(bot_name)
-    if not bot:
+    status, message = stop_bot_by_name(bot_name)
+    return jsonify({"message": message}), status
+
+
+def stop_bots_by_name(bot_names):
+    """
+    Stops several bots concurrently; returns {bot_name: (status, message)}.
+
+    Bots are all woken at once and waited for against one deadline
+    (TRENDR_SHUTDOWN_SECONDS), with one request per shard under TRENDR_WORKERS;
+    a bot still finishing a step then gets a 202 and leaves the registry when
+    its thread exits.
+    """
+    if not bot_names:
+        return {}
+    bots = {bot_name: bot_registry.get(bot_name) for bot_name in bot_names}
+    running = {bot_name: bot for bot_name, bot in bots.items() if bot}
+    failed = {}
+    if not WORKERS:
+        still_running = set(lifecycle.stop_bots(running))
+    elif runtime:
+        _, still_running, failed = runtime.stop_bots({bot_name: bot["data"]["symbol"] for bot_name, bot in running.items()}, lifecycle.SHUTDOWN_SECONDS)
+        still_running = set(still_running)
+    else:
+        still_running, failed = set(), dict.fromkeys(running, "the sharded runtime is not running")
+
+    results = {}
+    for bot_name, bot in bots.items():
+        if not bot:
+            results[bot_name] = (404, f"Bot with name {bot_name} does not exist or is not running!")
+        elif bot_name in failed:
+            results[bot_name] = (500, f"Bot {bot_name} failed to stop: {failed[bot_name]}")
+        elif bot_name in still_running:
+            results[bot_name] = (202, f"Bot {bot_name} is finishing its current step and will stop shortly.")
+        else:
+            if bot_registry.pop(bot_name, None) and WORKERS:
+                runtime.release_symbol(bot["data"]["symbol"])
+            results[bot_name] = (200, f"Bot {bot_name} has stopped successfully!")
+    return results
+
+
+def shutdown_bots(timeout=lifecycle.SHUTDOWN_SECONDS):
+    """
+    Stops every bot at once, within `timeout` seconds whatever their number or
+    interval, and writes their final state to TRENDR_STATE_FILE.
+
+    Returns:
+        dict: {"stopped", "still_running", "state_file", "seconds"}.
+    """
+    started = time.monotonic()
+    if WORKERS:
+        states, still_running = runtime.drain(timeout) if runtime else ({}, [])
+    else:
+        bots = dict(list(bot_registry.items()))
+        still_running = lifecycle.stop_bots(bots, timeout)
+        states = {bot_name: bot["data"] for bot_name, bot in bots.items()}
+    stopped = [bot_name for bot_name in states if bot_name not in still_running]
+    for bot_name in stopped:
+        bot = bot_registry.pop(bot_name, None)
+        if bot and WORKERS:
+            runtime.release_symbol(bot["data"]["symbol"])
+    try:
+        state_file = lifecycle.save_state(states)
+    except OSError as e:
+        console.error(None, "Could not write the final bot state: %s", e)
+        state_file = None
+    seconds = time.monotonic() - started
+    console.info(None, "Shutdown: %s bots stopped, %s still running after %.2fs", len(stopped), len(still_running), seconds)
+    return {"stopped": stopped, "still_running": still_running, "state_file": state_file, "seconds": seconds}
+
+
+@app.route("/bots", methods=["DELETE"])
+def stop_bots():
+    """
+    Stops many bots at once from {"bot_names": [...]}, or every bot with {"all": true}.
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({"message": "Request body must be a JSON object"}), 400
+    bot_names = list(bot_registry) if data.get("all") else data.get("bot_names") or []
+    if not isinstance(bot_names, list):
+        return jsonify({"message": "bot_names must be a list of bot names"}), 400
+    results = stop_bots_by_name(bot_names)
+    return jsonify({"results": {name: {"status": status, "message": message} for name, (status, message) in results.items()}})
+
+@app.route("/shutdown", methods=["POST"])
+def shutdown():
+    """
+    Stops every bot concurrently within {"timeout": seconds} (default
+    TRENDR_SHUTDOWN_SECONDS) and persists their final state. The API keeps serving.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        timeout = float(data.get("timeout", lifecycle.SHUTDOWN_SECONDS))
+    except (TypeError, ValueError):
+        return jsonify({"message": "timeout must be a number of seconds"}), 400
+    if timeout < 0:
+        return jsonify({"message": "timeout must be a number of seconds"}), 400
+    return jsonify(shutdown_bots(timeout))
+
+@app.route("/log-level", methods=["POST"])
+def set_log_level():
+    """
+    Changes the console log level at runtime, for one bot (`bot_name`) or as the default.
+    With TRENDR_WORKERS, a bot's level goes to its shard and the default to every shard.
+    """
+    data = request.json
+    bot_name = data.get("bot_name")
+    bot = bot_registry.get(bot_name) if bot_name else None
+    if bot_name and not bot:
         return jsonify({"message": f"Bot with name {bot_name} does not exist or is not running!"}), 404
-    
-    logger = bot["data"].get("logger")
-    if logger and logger.connection_successful:  # Only stop the logger if the connection was successful
-        stop_logger(bot["data"])
-    # Mark the bot as not running
-    bot["data"]["running"] = False
-
-    # Wait for the thread to exit gracefully
-    bot["thread"].join(timeout=5)
-    
-    # Remove the bot from the registry
-    bot_registry.pop(bot_name, None)
 
-    return jsonify({"message": f"Bot {bot_name} has stopped successfully!"})
+    try:
+        level = console.set_level(data.get("level", "info"), bot_name)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if "format" in data:
+        try:
+            console.set_format(data["format"])
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+    if WORKERS and runtime:
+        try:
+            runtime.set_log_level(level, bot_name, bot["data"]["symbol"] if bot else None, data.get("format"))
+        except Exception as e:
+            return jsonify({"message": f"Log level set here but not on every shard: {e}"}), 502
+
+    return jsonify({"message": f"Log level set to {console.LEVEL_NAMES.get(level, level)} for {bot_name or 'all bots'}."})
 
 @app.route("/statuses", methods=["GET"])
 def get_bot_statuses():
     # Prepare a list of all currently running bots
     running_bots = []
-    for bot_name, bot in bot_registry.items():
-        bot_data_serializable = {
+    shard_statuses = runtime.statuses() if WORKERS and runtime else {}
+    for bot_name, bot in list(bot_registry.items()):
+        bot_data_serializable = shard_statuses.get(bot_name) or {
             key: value for key, value in bot["data"].items()
             if key not in ["logger", "logger_thread"]  # Exclude non-serializable fields
         }
@@ -148,5 +385,169 @@ def get_bot_statuses():
     response_json = json.dumps(response_data, cls=CustomJSONEncoder)
     return Response(response_json, content_type="application/json", status=200)
 
+@app.route("/pnl", methods=["GET"])
+def get_pnl():
+    """
+    Marked-to-market P&L of every running bot, paper variants next to the live
+    bots on the same market and interval. `?symbol=` narrows it to one market.
+    """
+    from core.paper import pnl_report
+    shard_statuses = runtime.statuses() if WORKERS and runtime else {}
+    symbol = request.args.get("symbol")
+    bots = {}
+    for bot_name, bot in list(bot_registry.items()):
+        if symbol and bot["data"]["symbol"] != symbol:
+            continue
+        bots[bot_name] = shard_statuses.get(bot_name) or bot["data"]
+    response_json = json.dumps({"markets": pnl_report(bots)}, cls=CustomJSONEncoder)
+    return Response(response_json, content_type="application/json", status=200)
+
+@app.route("/bots/<bot_name>/equity", methods=["GET"])
+def get_bot_equity(bot_name):
+    """
+    Equity curve of a running bot, LTTB-downsampled to `?points=` rows (default 500).
+    """
+    from core.equity import equity_series, COLUMNS, DEFAULT_POINTS
+    bot = bot_registry.get(bot_name)
+    if not bot:
+        return jsonify({"message": f"Bot with name {bot_name} does not exist or is not running!"}), 404
+    try:
+        points = int(request.args.get("points", DEFAULT_POINTS))
+    except ValueError:
+        return jsonify({"message": "points must be an integer"}), 400
+    if points < 2:
+        return jsonify({"message": "points must be at least 2"}), 400
+
+    if WORKERS:
+        series = runtime.equity(bot_name, bot["data"]["symbol"], points)
+    else:
+        series = equity_series(bot_name, points)
+    return jsonify({"bot_name": bot_name, "columns": COLUMNS, "points": series or []})
+
+@app.route("/latency", methods=["GET"])
+def get_latency():
+    """
+    Per-endpoint REST report of this process (and of every shard): latency
+    percentiles, success rate, retries, hedges and circuit breaker state.
+    """
+    from core import rest
+    report = {"endpoints": rest.report()}
+    if WORKERS and runtime:
+        report["shards"] = runtime.latency()
+    return jsonify(report)
+
+@app.route("/profile", methods=["GET"])
+def profile_bots():
+    """
+    Samples the stacks of one bot (`?bot_name=`) or of the whole process for
+    `?seconds=` (default 5, at most MAX_PROFILE_SECONDS), with bot stacks
+    attributed to trading_loop phases. Returns collapsed stacks, or speedscope
+    JSON with `?format=speedscope`.
+    """
+    from core.profiler import sample_stacks, bot_threads, merge_profiles, collapsed, speedscope, profile_lock, PROFILE_HZ, MAX_PROFILE_SECONDS
+    bot_name = request.args.get("bot_name")
+    output_format = request.args.get("format", "collapsed")
+    try:
+        seconds = float(request.args.get("seconds", 5))
+        hz = float(request.args.get("hz", PROFILE_HZ))
+    except ValueError:
+        return jsonify({"message": "seconds and hz must be numbers"}), 400
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or hz <= 0:
+        return jsonify({"message": f"seconds must be in (0, {MAX_PROFILE_SECONDS}] and hz positive"}), 400
+    if output_format not in ("collapsed", "speedscope"):
+        return jsonify({"message": "format must be collapsed or speedscope"}), 400
+    bot = bot_registry.get(bot_name) if bot_name else None
+    if bot_name and not bot:
+        return jsonify({"message": f"Bot with name {bot_name} does not exist or is not running!"}), 404
+    if bot and not WORKERS and not (bot.get("thread") and bot["thread"].ident):
+        return jsonify({"message": f"Bot {bot_name} has not started yet"}), 409
+
+    try:
+        if WORKERS:
+            if not profile_lock.acquire(blocking=False):
+                raise RuntimeError("A profile is already running")
+            try:
+                profile = merge_profiles(get_runtime().profile(seconds, hz, bot_name, bot["data"]["symbol"] if bot else None))
+            finally:
+                profile_lock.release()
+        elif bot:
+            profile = sample_stacks(seconds, threads={bot["thread"].ident: bot_name}, hz=hz)
+        else:
+            profile = sample_stacks(seconds, labels=bot_threads(bot_registry), hz=hz)
+    except LookupError:
+        return jsonify({"message": f"Bot with name {bot_name} does not exist or is not running!"}), 404
+    except RuntimeError as e:
+        return jsonify({"message": str(e)}), 409
+
+    headers = {"X-Profile-Samples": str(profile["samples"]), "X-Profile-Overhead": f"{profile['overhead']:.4f}"}
+    if output_format == "speedscope":
+        return Response(json.dumps(speedscope(profile, bot_name or "trendr")), content_type="application/json", headers=headers)
+    return Response(collapsed(profile), content_type="text/plain", headers=headers)
+
+@app.route("/screener", methods=["GET", "POST"])
+def screen_market():
+    """
+    Ranks every USDT pair by the EMA crossover signals (core.screener), with
+    parameters from the query string or the JSON body. A POST with
+    {"start": N, "bot": spec} also starts bots (spec as for /start, without
+    symbol and interval) on the N best pairs not already traded with that
+    configuration.
+    """
+    from core import recorder
+    from core.screener import screener, parse_screen_params
+    data = request.args.to_dict() if request.method == "GET" else (request.json or {})
+    try:
+        params = parse_screen_params(data)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    try:
+        start = int(data.get("start", 0)) if request.method == "POST" else 0
+    except (TypeError, ValueError):
+        return jsonify({"message": "start must be an integer"}), 400
+    template = data.get("bot") or {}
+    if start and not isinstance(template, dict):
+        return jsonify({"message": "bot must be a bot spec"}), 400
+
+    try:
+        report = screener.screen(**params)
+    except Exception as e:
+        return jsonify({"message": f"Screen failed: {e}"}), 502
+    if start <= 0:
+        return jsonify(report)
+
+    specs = [dict(template, symbol=result["symbol"], interval=params["interval"], short_window=params["short_window"],
+                  long_window=params["long_window"], crossover_threshold=params["crossover_threshold"])
+             for result in report["results"]]
+    try:
+        prefetch_market_data(specs)
+    except Exception as e:
+        console.warn(None, "Bulk market data prefetch failed, falling back to per-symbol requests: %s", e)
+    instances, skipped = [], []
+    for spec in specs:
+        if len(instances) == start:
+            break
+        try:
+            bot_data_instance = build_bot_data(spec)
+        except Exception as e:
+            skipped.append({"symbol": spec["symbol"], "message": str(e)})
+            continue
+        running = bot_registry.find_duplicate(bot_data_instance)
+        if running:
+            skipped.append({"symbol": spec["symbol"], "message": f"Already traded by {running}"})
+        else:
+            instances.append(bot_data_instance)
+            recorder.record_event("start", spec)
+    payload, status = bulk_start_response(*start_validated_bots(instances))
+    report.update(payload, skipped=skipped)
+    return jsonify(report), status
+
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5001)
\ No newline at end of file
+    if os.getenv("TRENDR_RECORD"):
+        from core import recorder
+        recorder.start_recording(os.getenv("TRENDR_RECORD"))
+    try:
+        app.run(host="127.0.0.1", port=5001)
+    finally:
+        shutdown_bots()
+        if runtime:
+            runtime.shutdown()
\ No newline at end of file
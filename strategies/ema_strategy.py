@@ -1,5 +1,32 @@
-import numpy as np
 from decimal import Decimal
+from core.utils import lazy_import
+
+np = lazy_import("numpy")
+
+# ---- Indicator declaration ----
+def required_indicators(symbol, interval, short_window=5, long_window=20):
+    """
+    Indicators the EMA crossover strategy reads on every candle close.
+
+    Each value is a (symbol, interval, indicator, params) key; the indicator
+    engine computes each unique key once per close and shares it between bots.
+
+    Parameters:
+        symbol (str): Market pair.
+        interval (str): Candle interval.
+        short_window (int): Periods of the short EMA.
+        long_window (int): Periods of the long EMA.
+
+    Returns:
+        dict: Role in the strategy -> indicator key.
+    """
+    return {
+        "prices": (symbol, interval, "close", ()),
+        "short_ema": (symbol, interval, "ema", (("window", short_window),)),
+        "long_ema": (symbol, interval, "ema", (("window", long_window),)),
+        "atr": (symbol, interval, "atr", (("window", 14),)),
+    }
+
 
 # ---- Exponential Moving Average (EMA) ----
 def calculate_ema(prices, window):